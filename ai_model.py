@@ -1,67 +1,173 @@
 import pandas as pd
 import numpy as np
-import joblib
 import os
-from sklearn.model_selection import train_test_split, GridSearchCV
+import time
+from concurrent.futures import ThreadPoolExecutor
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401 (mengaktifkan HalvingGridSearchCV)
+from sklearn.model_selection import HalvingGridSearchCV, TimeSeriesSplit
+from sklearn.metrics import mean_absolute_error
 from sklearn.ensemble import RandomForestRegressor
 from api_utils import IndodaxAPI
-import logging
-import ta  # Library untuk perhitungan indikator teknikal
+from history_store import open_store
+from bars import BarBuilder
+from feature_pipeline import FEATURE_NAMES, FEATURE_VERSION, INDICATOR_COLUMNS, FeaturePipeline, compute_features
+from model_artifact import ModelArtifact, convert_pickle, read_header, save_forest
+from model_registry import REGISTRY
+from online_model import OnlineLearner
+from retrainer import get_scheduler
+from log_config import get_logger, setup_logging
+
+log = get_logger("model")
+
+RAW_COLUMNS = ["date", "tid", "price", "amount"]
+# Jumlah minimum baris uji di luar jendela latih model lama untuk perbandingan
+MIN_COMPARE_ROWS = 100
 
-# Konfigurasi Logging
-logging.basicConfig(filename='ai_model_log.log', level=logging.INFO,
-                    format='%(asctime)s - %(levelname)s - %(message)s')
 
 class PricePredictor:
-    def __init__(self, api, pair="btcidr"):
+    def __init__(self, api, pair="btcidr", online=False):
         self.api = api
         self.pair = pair
-        self.model_file = f"price_predictor_{self.pair}.pkl"
-        self.data_file = f"historical_data_{self.pair}.csv"
+        self.model_file = f"price_predictor_{self.pair}.model"
+        self.legacy_model_file = f"price_predictor_{self.pair}.pkl"
+        self._store = None
+        self._features = None
+        self._bars = None
+        self.last_prediction = None
+        self.page_limit = 1000
+        self.max_pages = 50
         self.model = RandomForestRegressor(n_estimators=100, random_state=42)
-        self.feature_names = ["price", "RSI", "SMA", "BB_Upper", "BB_Lower", "price_change_3d", "price_change_7d", "price_change_30d"]
+        self.feature_names = list(FEATURE_NAMES)
+        # Mode online: forest yang belajar dari fitur baru di loop live (lihat online_model)
+        self.online = OnlineLearner(self) if online else None
 
     def is_model_trained(self):
+        if not os.path.exists(self.model_file) and os.path.exists(self.legacy_model_file):
+            self.migrate_legacy_model()
         return os.path.exists(self.model_file)
 
-    def update_historical_data(self):
-        """Mengupdate data historis dengan harga terbaru dan indikator teknikal"""
-        df_new = self.api.get_ticker(self.pair)
-        if df_new is None or df_new.empty:
-            print(f"[⚠️] Tidak bisa mendapatkan data pasar untuk {self.pair}.")
+    def migrate_legacy_model(self):
+        """Mengubah model .pkl lama (joblib) ke format artefak sekali saja"""
+        tmp_file = f"{self.model_file}.tmp-{os.getpid()}"
+        # Model lama tidak mungkin melihat trade setelah konversi: jendela latihnya berakhir di trade
+        # terakhir store (atau sekarang), supaya retrain berikutnya dibandingkan pada baris baru
+        last = self.store.last()
+        end_date = int(last["date"]) if last is not None else int(time.time())
+        try:
+            convert_pickle(self.legacy_model_file, tmp_file, metadata={
+                "pair": self.pair, "training_window": {"start_date": None, "end_date": end_date, "rows": None}})
+        except Exception as e:
+            log.warning("Model lama %s tidak bisa dikonversi: %s", self.legacy_model_file, e, extra={"pair": self.pair})
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
             return
-        
-        df_new = df_new.sort_values(by=['date']).reset_index(drop=True)
+        os.replace(tmp_file, self.model_file)
+        print(f"✅ Model `{self.legacy_model_file}` dikonversi ke `{self.model_file}`")
+
+    def model_info(self):
+        """Header model (feature names, jendela data latih, score, versi, hash) tanpa memuat pohon"""
+        if not self.is_model_trained():
+            return None
+        return read_header(self.model_file)
+
+    @property
+    def store(self):
+        if self._store is None:
+            self._store = open_store(self.pair)
+        return self._store
+
+    @property
+    def features(self):
+        """FeaturePipeline pair ini; sumber fitur untuk training, backtest, dan prediksi live"""
+        if self._features is None:
+            self._features = FeaturePipeline(self.store)
+        return self._features
 
-        if os.path.exists(self.data_file):
-            df_old = pd.read_csv(self.data_file)
-            df = pd.concat([df_old, df_new]).drop_duplicates().reset_index(drop=True)
+    @property
+    def bars(self):
+        """Bar OHLCV 1m/5m/1h/1d yang dibangun dari store pair ini"""
+        if self._bars is None:
+            self._bars = BarBuilder(self.store)
+        return self._bars
+
+    def load_watermark(self):
+        """Mengambil tid dan date trade terakhir yang sudah tersimpan"""
+        last = self.store.last()
+        if last is None:
+            return None
+        # Data hasil migrasi CSV lama tidak punya tid, hanya date yang bisa dipakai
+        return {"tid": last['tid'] if last['tid'] >= 0 else None, "date": last['date']}
+
+    def fetch_new_trades(self, watermark):
+        """Mengambil halaman trade berurutan sejak watermark sampai tidak ada trade baru"""
+        since = watermark["tid"] if watermark else None
+        frames = []
+        for _ in range(self.max_pages):
+            trades = self.api.get_trades(self.pair, since=since, limit=self.page_limit)
+            if not trades:
+                break
+            df = pd.DataFrame(trades)[['date', 'tid', 'price', 'amount']].astype(
+                {'date': 'int64', 'tid': 'int64', 'price': 'float64', 'amount': 'float64'})
+            if since is not None:
+                df = df[df['tid'] > since]
+            elif watermark:
+                df = df[df['date'] > watermark['date']]
+            if df.empty:
+                break
+            frames.append(df)
+            since = int(df['tid'].max())
+            if len(trades) < self.page_limit:
+                break
+        if not frames:
+            return None
+        return pd.concat(frames).drop_duplicates(subset=['tid']).sort_values(by=['tid']).reset_index(drop=True)
+
+    def update_historical_data(self, quiet=False):
+        """Menambahkan trade baru sejak watermark ke store, lalu memperbarui cache fitur"""
+        watermark = self.load_watermark()
+        df_new = self.fetch_new_trades(watermark)
+        if df_new is None or df_new.empty:
+            if not quiet:
+                print(f"[⚠️] Tidak ada data pasar baru untuk {self.pair}.")
+            return 0
+
+        sebelum = len(self.features)
+        # key="tid": trade yang sudah ditulis proses lain (mis. daemon dan `main.py train`) tidak digandakan
+        baru = self.store.append(df_new[RAW_COLUMNS], key="tid")
+        # Fitur dan bar hanya dihitung untuk baris baru, sekali untuk semua konsumen
+        self.features.refresh()
+        self.bars.refresh()
+        if self.online is None:
+            # Mode online mencatat galatnya sendiri (prediksi forest online sebelum belajar)
+            self.record_errors(sebelum)
+        if not quiet:
+            print(f"[📊] Data historis untuk {self.pair} diperbarui ({baru} trade baru).")
+        return baru
+
+    def latest_features(self):
+        """Menarik trade terbaru lalu mengembalikan vektor fitur terkini dari cache fitur"""
+        if self.online is not None:
+            # Lewat lock yang sama dengan refresh latar dari on_tick
+            self.online.refresh()
         else:
-            df = df_new
-        
-        df = self.calculate_indicators(df)  # Tambahkan indikator teknikal
-        df.to_csv(self.data_file, index=False)
-        print(f"[📊] Data historis untuk {self.pair} diperbarui.")
-
-    def calculate_indicators(self, df):
-        """Menghitung indikator teknikal seperti RSI, SMA, dan Bollinger Bands"""
-        df['RSI'] = ta.momentum.RSIIndicator(df['price'], window=14).rsi()
-        df['SMA'] = ta.trend.SMAIndicator(df['price'], window=20).sma_indicator()
-        df['BB_Upper'] = ta.volatility.BollingerBands(df['price'], window=20).bollinger_hband()
-        df['BB_Lower'] = ta.volatility.BollingerBands(df['price'], window=20).bollinger_lband()
-
-        # Tambahkan indikator perubahan harga
-        df['price_change_3d'] = df['price'].pct_change(periods=3)
-        df['price_change_7d'] = df['price'].pct_change(periods=7)
-        df['price_change_30d'] = df['price'].pct_change(periods=30)
-
-        df.dropna(inplace=True)  # Hapus baris dengan nilai NaN akibat perhitungan indikator
+            self.update_historical_data(quiet=True)
+        return self.features.latest()
+
+    def calculate_indicators(self, df, dropna=True):
+        """Menambahkan kolom fitur ke DataFrame berisi kolom price (lihat feature_pipeline)"""
+        fitur = compute_features(df['price'])
+        for name in INDICATOR_COLUMNS:
+            df[name] = fitur[name].to_numpy()
+
+        if dropna:
+            kolom = [c for c in INDICATOR_COLUMNS + ['target'] if c in df.columns]
+            df.dropna(subset=kolom, inplace=True)  # Hapus baris dengan nilai NaN akibat perhitungan indikator
         return df
 
     def get_market_data(self):
         """Menggunakan data historis untuk pelatihan AI"""
-        if os.path.exists(self.data_file):
-            df = pd.read_csv(self.data_file)
+        if len(self.store) > 0:
+            df = self.features.frame(dropna=False)
         else:
             print(f"[⚠️] Data historis belum tersedia untuk {self.pair}. Menggunakan data API terbaru...")
             df = self.api.get_ticker(self.pair)
@@ -73,51 +179,203 @@ class PricePredictor:
         df = df.sort_values(by=['date']).reset_index(drop=True)
         df['target'] = df['price'].shift(-1)
 
-        df = self.calculate_indicators(df)  # Pastikan indikator teknikal sudah dihitung
+        if 'RSI' in df.columns:
+            df.dropna(subset=INDICATOR_COLUMNS + ['target'], inplace=True)  # Fitur dari cache fitur
+        else:
+            df = self.calculate_indicators(df)  # Pastikan indikator teknikal sudah dihitung
         return df
 
-    def train_model(self):
+    def train_model(self, min_score=None):
+        """Melatih model dan menukarnya ke model_file secara atomik.
+
+        Model baru ditulis ke file sementara, dimuat ulang dan divalidasi pada
+        data uji, lalu di-rename ke model_file. Pembaca lain tetap memakai
+        model lama sampai rename selesai. Tanpa min_score, model baru harus
+        minimal sebaik model yang sedang dipakai. Mengembalikan score atau None.
+        """
         df = self.get_market_data()
         if df is None:
-            return
+            return None
 
         X = df[self.feature_names]  # Pastikan hanya menggunakan fitur yang sesuai
         y = df['target']
 
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+        # Data tick berurutan waktu: 20% terakhir dipakai sebagai data uji out-of-sample
+        # dan validasi silang memakai walk-forward agar harga masa depan tidak bocor
+        split = int(len(df) * 0.8)
+        X_train, X_test = X.iloc[:split], X.iloc[split:]
+        y_train, y_test = y.iloc[:split], y.iloc[split:]
 
+        # Successive halving: semua kandidat mulai dengan 50 pohon, hanya yang
+        # terbaik yang dilanjutkan sampai 200 pohon
         param_grid = {
-            "n_estimators": [50, 100, 200],
             "max_depth": [None, 10, 20, 30]
         }
-        grid_search = GridSearchCV(RandomForestRegressor(random_state=42), param_grid, cv=3)
-        grid_search.fit(X_train, y_train)
+        mulai = time.perf_counter()
+        search = HalvingGridSearchCV(RandomForestRegressor(random_state=42), param_grid,
+                                     resource="n_estimators", min_resources=50, max_resources=200, factor=2,
+                                     cv=TimeSeriesSplit(n_splits=3), n_jobs=-1, random_state=42)
+        search.fit(X_train, y_train)
+        durasi = time.perf_counter() - mulai
 
-        self.model = grid_search.best_estimator_
+        self.model = search.best_estimator_
+        score = self.model.score(X_test, y_test)
+        mae = mean_absolute_error(y_test, self.model.predict(X_test))
 
-        print(f"📊 Model training complete untuk {self.pair}. Score: {self.model.score(X_test, y_test)}")
-        logging.info(f"Model AI dilatih untuk {self.pair} dengan score: {self.model.score(X_test, y_test)}")
+        print(f"📊 Model training complete untuk {self.pair}. Score: {score} | MAE: {mae:.2f} | Waktu: {durasi:.1f} detik")
+        log.info("Model AI dilatih untuk %s dengan score: %s | MAE out-of-sample: %.2f | "
+                 "waktu training: %.1f detik | parameter: %s", self.pair, score, mae, durasi, search.best_params_,
+                 extra={"pair": self.pair})
 
         # Simpan model bersama dengan feature names yang digunakan
-        joblib.dump((self.model, self.feature_names), self.model_file)
+        tmp_file = f"{self.model_file}.tmp-{os.getpid()}"
+        save_forest(self.model, self.feature_names, tmp_file, metadata={
+            "pair": self.pair,
+            "training_window": {"start_date": int(df['date'].iloc[0]), "end_date": int(df['date'].iloc[-1]),
+                                "rows": len(df)},
+            "feature_version": FEATURE_VERSION,
+            "score": score,
+            "mae": mae,
+            "params": search.best_params_
+        })
+        if not self.validate_model_file(tmp_file, X_test, y_test, min_score, dates=df['date'].iloc[split:]):
+            os.remove(tmp_file)
+            print(f"[❌] Model baru untuk {self.pair} gagal validasi, model lama tetap dipakai.")
+            log.error("Model baru untuk %s gagal validasi out-of-sample, model lama tetap dipakai.", self.pair,
+                      extra={"pair": self.pair})
+            return None
+        os.replace(tmp_file, self.model_file)
         print(f"✅ Model telah disimpan sebagai `{self.model_file}`")
+        return score
+
+    def validate_model_file(self, model_file, X_test, y_test, min_score=None, dates=None):
+        """Memastikan file model bisa dimuat, prediksinya valid, dan score-nya cukup.
+
+        Tanpa min_score, model baru dibandingkan dengan model yang sedang
+        dipakai hanya pada baris uji setelah training_window.end_date model
+        lama (dates), karena baris yang pernah dilihat model lama membuat
+        score-nya terlalu tinggi. Jika model lama tidak punya jendela latih
+        atau baris baru terlalu sedikit, model baru harus menyamai atau
+        mengalahkan prediksi naif (harga berikutnya = harga sekarang) dalam
+        MAE pada seluruh data uji; R² absolut pada holdout kronologis sering
+        negatif untuk data harga, jadi tidak dipakai sebagai batas. Model
+        pertama (belum ada model lama) selalu lolos.
+        """
+        try:
+            model = ModelArtifact(model_file)
+            prediksi = model.predict(X_test[model.feature_names].to_numpy())
+        except Exception as e:
+            log.error("Model %s tidak bisa dimuat: %s", model_file, e, extra={"pair": self.pair})
+            return False
+        if not np.isfinite(prediksi).all():
+            return False
+        if min_score is None and self.is_model_trained():
+            current = REGISTRY.get(self.model_file)
+            window = current.header.get("training_window")
+            if window is not None and dates is not None:
+                baru = np.asarray(dates) > window["end_date"]
+                if baru.sum() >= MIN_COMPARE_ROWS:
+                    X_baru, y_baru = X_test[baru], y_test[baru]
+                    return model.score(X_baru, y_baru) >= current.score(X_baru, y_baru)
+            return mean_absolute_error(y_test, prediksi) <= mean_absolute_error(y_test, X_test["price"])
+        return min_score is None or model.score(X_test, y_test) >= min_score
 
     def predict_price(self, current_price, rsi, sma, bb_upper, bb_lower, change_3d, change_7d, change_30d):
+        if self.online is not None and self.online.ready:
+            self.last_prediction = self.online.predict([current_price, rsi, sma, bb_upper, bb_lower, change_3d,
+                                                        change_7d, change_30d])
+            return self.last_prediction
+        if not self.is_model_trained():
+            # Pelatihan berjalan di proses lain; trading tidak menunggu
+            get_scheduler(self.pair).request("model belum tersedia")
+            return None
+
+        # Model diambil dari cache dan hanya dimuat ulang jika file-nya berubah
+        loaded = REGISTRY.get(self.model_file)
+        if loaded.header.get("feature_version", FEATURE_VERSION) != FEATURE_VERSION:
+            # Model dilatih dengan definisi fitur lain; jangan dipakai untuk fitur versi sekarang
+            get_scheduler(self.pair).request("versi fitur berubah")
+            return None
+        self.model, self.feature_names = loaded, loaded.feature_names
+
+        # Urutan fitur sama dengan feature_names yang disimpan bersama model
+        self.last_prediction = loaded.predict([[current_price, rsi, sma, bb_upper, bb_lower, change_3d, change_7d, change_30d]])[0]
+        return self.last_prediction
+
+    def record_errors(self, start):
+        """Mencatat galat model untuk baris fitur start.. (fitur[i-1] -> harga[i]) ke deteksi drift.
+
+        Horizon sama dengan target training, dan setiap baris fitur baru
+        memberi satu sampel, sehingga jendela galat scheduler terisi
+        sesuai aliran trade, bukan sesuai seberapa sering bot memprediksi.
+        Hanya baris terakhir sebanyak jendela galat yang dihitung.
+        """
         if not self.is_model_trained():
-            self.train_model()
-            if not self.is_model_trained():
-                return None
+            return 0
+        loaded = REGISTRY.get(self.model_file)
+        if loaded is None or loaded.header.get("feature_version", FEATURE_VERSION) != FEATURE_VERSION:
+            return 0
+        scheduler = get_scheduler(self.pair)
+        total = len(self.features)
+        start = max(start, total - scheduler.errors.maxlen, 1)
+        if start >= total:
+            return 0
+        matrix = self.features.matrix
+        kolom = [self.features.names.index(name) for name in loaded.feature_names]
+        X = np.array(matrix[start - 1:total - 1])[:, kolom]
+        y = np.array(matrix[start:total, self.features.names.index("price")])
+        valid = ~np.isnan(X).any(axis=1) & ~np.isnan(y)
+        if valid.any():
+            scheduler.record_errors(loaded.predict(X[valid]), y[valid])
+        return int(valid.sum())
 
-        # Load model beserta feature names yang digunakan
-        self.model, self.feature_names = joblib.load(self.model_file)
+    def observe_price(self, actual_price):
+        """Mencatat harga aktual setelah prediksi terakhir untuk deteksi drift.
 
-        # Pastikan hanya menggunakan fitur yang sesuai dengan model
-        df = pd.DataFrame([[current_price, rsi, sma, bb_upper, bb_lower, change_3d, change_7d, change_30d]],
-                          columns=self.feature_names)
-        
-        return self.model.predict(df)[0]
+        Di mode online, tick juga menjadwalkan pembaruan forest online di
+        thread latar (lihat OnlineLearner.on_tick).
+        """
+        if self.online is not None:
+            self.online.on_tick()
+        if self.last_prediction is None:
+            return
+        get_scheduler(self.pair).record_error(self.last_prediction, actual_price)
+        self.last_prediction = None
+
+    def predict_batch(self, features, n_jobs=None, chunk_size=4096):
+        """Prediksi vektor untuk banyak baris fitur sekaligus.
+
+        features berupa array 2-D (urutan kolom = feature_names) atau DataFrame
+        yang memuat kolom feature_names, baris boleh berasal dari banyak pair.
+        DataFrame menghasilkan Series dengan index yang sama, array menghasilkan
+        array. Baris dengan fitur NaN menghasilkan NaN. n_jobs > 1 membagi chunk
+        baris ke beberapa thread; penelusuran pohon berupa operasi NumPy biasa,
+        jadi percepatannya tidak dijamin dan default-nya satu thread.
+        """
+        loaded = REGISTRY.get(self.model_file)
+        if loaded is None:
+            return None
+        index = None
+        if isinstance(features, pd.DataFrame):
+            index = features.index
+            features = features[loaded.feature_names].to_numpy(dtype=np.float64)
+        X = np.atleast_2d(np.asarray(features, dtype=np.float64))
+        hasil = np.full(len(X), np.nan)
+        valid = ~np.isnan(X).any(axis=1)
+        rows = np.flatnonzero(valid)
+        chunks = [rows[i:i + chunk_size] for i in range(0, len(rows), chunk_size)]
+        if n_jobs is not None and n_jobs != 1 and len(chunks) > 1:
+            workers = os.cpu_count() if n_jobs == -1 else n_jobs
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                for chunk, pred in zip(chunks, pool.map(lambda c: loaded.predict(X[c]), chunks)):
+                    hasil[chunk] = pred
+        else:
+            for chunk in chunks:
+                hasil[chunk] = loaded.predict(X[chunk])
+        return pd.Series(hasil, index=index, name="prediction") if index is not None else hasil
 
 if __name__ == "__main__":
+    setup_logging("ai_model.log")
     api = IndodaxAPI()
     predictor = PricePredictor(api)
     predictor.update_historical_data()
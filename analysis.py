@@ -1,18 +1,42 @@
+import numpy as np
 import pandas as pd
-import ta
 from api_utils import IndodaxAPI
+from indicators import IndicatorState
 
 class TechnicalAnalysis:
-    def __init__(self, api, pair="btcidr"):
+    def __init__(self, api, pair="btcidr", warmup=500):
         self.api = api
         self.pair = pair
+        self.warmup = warmup
+        self.state = IndicatorState()
+        self.last_tid = None
+
+    def update(self):
+        """Memasukkan trade baru sejak tid terakhir ke state indikator"""
+        if self.last_tid is None:
+            trades = self.api.get_trades(self.pair, limit=self.warmup)
+        else:
+            trades = self.api.get_trades(self.pair, since=self.last_tid)
+        baru = sorted((int(t['tid']), float(t['price'])) for t in trades)
+        for tid, price in baru:
+            if self.last_tid is None or tid > self.last_tid:
+                self.state.update(price)
+                self.last_tid = tid
+        return self.state
 
     def analyze(self):
-        df = self.api.get_ticker(self.pair)
-        df = df.sort_values(by=['date']).reset_index(drop=True)
-        df['RSI'] = ta.momentum.RSIIndicator(df['price'], window=14).rsi()
-        df['SMA'] = ta.trend.SMAIndicator(df['price'], window=20).sma_indicator()
-        bb = ta.volatility.BollingerBands(df['price'], window=20)
-        df['BB_Upper'] = bb.bollinger_hband()
-        df['BB_Lower'] = bb.bollinger_lband()
-        return df.iloc[-1]
+        self.update()
+        return pd.Series(self.state.values(), name=self.pair)
+
+
+def entry_signal(prediksi, harga, rsi, sma, rsi_low=40, rsi_high=50):
+    """Sinyal entry TradingBotAI untuk skalar maupun array NumPy.
+
+    -1: AI memprediksi turun dengan RSI rendah, tidak membeli
+     1: AI memprediksi naik dengan RSI dan SMA mengonfirmasi tren
+     0: selain itu (bot tetap membeli tanpa konfirmasi tren)
+    """
+    prediksi, harga, rsi, sma = (np.asarray(x, dtype=float) for x in (prediksi, harga, rsi, sma))
+    turun = (prediksi < harga) & (rsi < rsi_low)
+    naik = (prediksi > harga) & (rsi > rsi_high) & (sma > harga)
+    return np.where(turun, -1, np.where(naik, 1, 0))
@@ -3,175 +3,313 @@ import time
 import hashlib
 import hmac
 import os
-from dotenv import load_dotenv
-import pandas as pd
+import threading
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from metrics import inc, timer
 
-load_dotenv()
-API_URL = os.getenv("API_URL")
-API_KEY = os.getenv("API_KEY")
-SECRET_KEY = os.getenv("SECRET_KEY")
+PUBLIC_URL = "https://indodax.com/api"
 
-class IndodaxAPI:
+# Batas default (jumlah request, periode detik). Indodax membatasi API publik
+# dan private secara terpisah, jadi masing-masing punya token bucket sendiri.
+PUBLIC_RATE_LIMIT = (180, 60)
+PRIVATE_RATE_LIMIT = (180, 60)
+# Umur maksimum (detik) quote ticker yang dipakai bersama dalam satu proses
+QUOTE_TTL = 1.0
+# Toleransi (ms) selisih timestamp request private terhadap jam server Indodax
+RECV_WINDOW = 5000
+QUOTE_CURRENCIES = ("idr", "usdt")
+
+
+_env_loaded = False
+
+
+def load_env():
+    """Membaca .env sekali, saat klien API pertama dibuat (bukan saat modul diimpor)"""
+    global _env_loaded
+    if not _env_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _env_loaded = True
+
+
+class IndodaxAPIError(Exception):
+    """Respons API private dengan success != 1"""
+    def __init__(self, method, error, code=None):
+        super().__init__(f"{method}: {error}")
+        self.method = method
+        self.error = error
+        self.code = code
+
+
+def split_pair(pair):
+    """'btcidr' atau 'btc_idr' -> ('btc', 'idr')"""
+    if "_" in pair:
+        coin, quote = pair.split("_", 1)
+        return coin, quote
+    for quote in QUOTE_CURRENCIES:
+        if pair.endswith(quote) and len(pair) > len(quote):
+            return pair[:-len(quote)], quote
+    raise ValueError(f"Pair tidak dikenal: {pair}")
+
+
+class NonceManager:
+    """Timestamp milidetik untuk request private yang selalu naik dan tidak pernah sama.
+
+    Beberapa request bertanda tangan yang dibuat bersamaan di milidetik
+    yang sama akan mendapat nilai berbeda (last + 1), sehingga tidak ada
+    yang ditolak sebagai duplikat. Urutan tiba di server boleh berbeda
+    karena Indodax memeriksa timestamp terhadap recvWindow, bukan urutan.
+    """
     def __init__(self):
-        self.api_key = API_KEY
-        self.secret_key = SECRET_KEY
+        self.last = 0
+        self.lock = threading.Lock()
+
+    def next(self):
+        with self.lock:
+            self.last = max(self.last + 1, int(time.time() * 1000))
+            return self.last
+
+
+class TokenBucket:
+    """Penjadwal request token bucket yang thread-safe"""
+    def __init__(self, jumlah, periode):
+        self.capacity = float(jumlah)
+        self.rate = jumlah / periode
+        self.tokens = self.capacity
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Menunggu sampai satu token tersedia lalu memakainya"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+                self.last = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                tunggu = (1 - self.tokens) / self.rate
+            time.sleep(tunggu)
+
+
+class CountingRetry(Retry):
+    """Retry urllib3 yang mencatat setiap percobaan ulang ke counter api_retries_total"""
+    def increment(self, method=None, url=None, response=None, error=None, *args, **kwargs):
+        retry = super().increment(method, url, response, error, *args, **kwargs)
+        # Dicatat setelah super(): percobaan terakhir yang melempar MaxRetryError bukan retry
+        alasan = f"status_{response.status}" if response is not None and response.status else type(error).__name__
+        inc("api_retries_total", method=method or "", reason=alasan)
+        return retry
+
+
+class QuoteCache:
+    """Cache quote ticker dengan TTL pendek yang dipakai bersama dalam satu proses.
+
+    Beberapa konsumen yang meminta pair yang sama dalam rentang TTL hanya
+    memicu satu request; request yang sedang berjalan ditunggu, bukan
+    diulang. ETag disimpan supaya request berikutnya bisa bersyarat.
+    """
+    def __init__(self, ttl=QUOTE_TTL):
+        self.ttl = ttl
+        self.entries = {}
+        self.locks = {}
+        self.lock = threading.Lock()
+
+    def key_lock(self, key):
+        with self.lock:
+            if key not in self.locks:
+                self.locks[key] = threading.Lock()
+            return self.locks[key]
+
+    def get(self, key, fetch):
+        """Mengembalikan quote untuk key; fetch(etag, quote_lama) dipanggil jika sudah kedaluwarsa"""
+        entry = self.entries.get(key)
+        if entry is not None and time.monotonic() < entry[0]:
+            return entry[2]
+        with self.key_lock(key):
+            # Konsumen lain mungkin sudah memperbarui entri selama kita menunggu
+            entry = self.entries.get(key)
+            if entry is not None and time.monotonic() < entry[0]:
+                return entry[2]
+            etag, quote = fetch(*(entry[1:] if entry else (None, None)))
+            self.entries[key] = (time.monotonic() + self.ttl, etag, quote)
+            return quote
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+QUOTE_CACHE = QuoteCache()
+
+
+class IndodaxAPI:
+    def __init__(self, api_url=None, public_url=PUBLIC_URL, timeout=(3.05, 10), retries=3, backoff_factor=0.3,
+                 pool_size=10, public_rate_limit=PUBLIC_RATE_LIMIT, private_rate_limit=PRIVATE_RATE_LIMIT,
+                 quote_cache=QUOTE_CACHE, recv_window=RECV_WINDOW):
+        load_env()
+        self.api_key = os.getenv("API_KEY")
+        self.secret_key = os.getenv("SECRET_KEY")
+        self.api_url = api_url or os.getenv("API_URL")
+        self.public_url = public_url.rstrip("/")
+        self.timeout = timeout
+        self.public_limiter = TokenBucket(*public_rate_limit)
+        self.private_limiter = TokenBucket(*private_rate_limit)
+        self.session = self._create_session(retries, backoff_factor, pool_size)
+        self.quote_cache = quote_cache
+        self.recv_window = recv_window
+        self.nonce = NonceManager()
+
+    def _create_session(self, retries, backoff_factor, pool_size):
+        """Membuat session keep-alive dengan connection pool dan retry/backoff"""
+        # POST hanya diulang untuk gagal koneksi, supaya order tidak terkirim dua kali
+        retry = CountingRetry(total=retries, backoff_factor=backoff_factor,
+                      status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=frozenset(["GET"]), respect_retry_after_header=True)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def close(self):
+        self.session.close()
 
     def generate_signature(self, payload):
         query_string = "&".join([f"{key}={value}" for key, value in payload.items()])
         return hmac.new(self.secret_key.encode(), query_string.encode(), hashlib.sha512).hexdigest()
 
-    def get_balance(self):
-        payload = {
-            "method": "getInfo",
-            "timestamp": int(time.time() * 1000)
-        }
+    def public_response(self, path, params=None, headers=None):
+        """GET mentah ke API publik melalui session yang dipakai bersama"""
+        endpoint = path.split("/")[0]
+        self.public_limiter.acquire()
+        try:
+            with timer("api_request_seconds", endpoint=endpoint):
+                response = self.session.get(f"{self.public_url}/{path}", params=params, headers=headers,
+                                            timeout=self.timeout)
+                response.raise_for_status()
+        except requests.RequestException as e:
+            inc("api_errors_total", endpoint=endpoint, error=type(e).__name__)
+            raise
+        return response
+
+    def get_public(self, path, params=None):
+        return self.public_response(path, params).json()
+
+    def send_request(self, payload, headers):
+        """POST ke API private dengan payload dan header yang sudah ditandatangani"""
+        endpoint = payload.get("method", "tapi")
+        self.private_limiter.acquire()
+        try:
+            with timer("api_request_seconds", endpoint=endpoint):
+                return self.session.post(self.api_url, data=payload, headers=headers, timeout=self.timeout)
+        except requests.RequestException as e:
+            inc("api_errors_total", endpoint=endpoint, error=type(e).__name__)
+            raise
+
+    def private(self, method, **params):
+        """Request private bertanda tangan; mengembalikan field "return" atau melempar IndodaxAPIError"""
+        payload = {"method": method, **params, "timestamp": self.nonce.next(), "recvWindow": self.recv_window}
         headers = {
             "Key": self.api_key,
             "Sign": self.generate_signature(payload)
         }
-        response = requests.post(API_URL, data=payload, headers=headers)
-        data = response.json()
-        return data["return"]["balance"] if data["success"] == 1 else None
+        data = self.send_request(payload, headers).json()
+        if data.get("success") != 1:
+            inc("api_errors_total", endpoint=method, error=data.get("error_code") or "rejected")
+            raise IndodaxAPIError(method, data.get("error", "unknown error"), data.get("error_code"))
+        return data["return"]
+
+    def get_balance(self):
+        try:
+            return self.private("getInfo")["balance"]
+        except IndodaxAPIError:
+            return None
+
+    def create_order(self, pair, side, price, amount, client_order_id=None):
+        """Order limit; amount dalam satuan koin. Mengembalikan respons "return" (berisi order_id)"""
+        coin, quote = split_pair(pair)
+        params = {"pair": f"{coin}_{quote}", "type": side, "price": price, coin: f"{amount:.8f}",
+                  "order_type": "limit"}
+        if client_order_id:
+            params["client_order_id"] = client_order_id
+        return self.private("trade", **params)
+
+    def cancel_order(self, pair, order_id, side):
+        coin, quote = split_pair(pair)
+        return self.private("cancelOrder", pair=f"{coin}_{quote}", order_id=order_id, type=side)
+
+    def open_orders(self, pair):
+        """Daftar order terbuka pair (list dict mentah dari openOrders)"""
+        coin, quote = split_pair(pair)
+        return self.private("openOrders", pair=f"{coin}_{quote}").get("orders") or []
+
+    def get_order(self, pair, order_id):
+        coin, quote = split_pair(pair)
+        return self.private("getOrder", pair=f"{coin}_{quote}", order_id=order_id)["order"]
+
+    def order_history(self, pair, count=100):
+        coin, quote = split_pair(pair)
+        return self.private("orderHistory", pair=f"{coin}_{quote}", count=count).get("orders") or []
+
+    def get_trades(self, pair="btcidr", since=None, limit=1000):
+        """Mengambil daftar trade mentah; since (tid) membatasi ke trade yang lebih baru"""
+        params = {"limit": limit}
+        if since is not None:
+            params["since"] = since
+        return self.get_public(f"trades/{pair}", params=params)
 
     def get_ticker(self, pair="btcidr"):
-        url = f"https://indodax.com/api/trades/{pair}?limit=200"
-        response = requests.get(url)
-        data = response.json()
+        import pandas as pd
+
+        data = self.get_public(f"trades/{pair}", params={"limit": 200})
         df = pd.DataFrame(data)
         df['price'] = df['price'].astype(float)
         return df[['price', 'date']]
 
-# Fungsi untuk eksekusi trading
-# Fungsi untuk eksekusi trading dengan manajemen risiko
-def execute_trade(pair="btcidr", modal=20000, stop_loss_pct=0.02, take_profit_pct=0.05):
-    harga_beli = get_ticker(pair)['price'].iloc[-1]  # Ambil harga terakhir
-    jumlah_crypto = modal / harga_beli
-    stop_loss = harga_beli * (1 - stop_loss_pct)  # Stop Loss 2% di bawah harga beli
-    take_profit = harga_beli * (1 + take_profit_pct)  # Take Profit 5% di atas harga beli
-
-    print(f"Harga Beli: {harga_beli}")
-    print(f"Stop Loss: {stop_loss}")
-    print(f"Take Profit: {take_profit}")
-
-    # Order pembelian
-    order_payload = {
-        "method": "trade",
-        "pair": pair,
-        "type": "buy",
-        "price": harga_beli,
-        "btc": jumlah_crypto,
-        "timestamp": int(time.time() * 1000)
-    }
-    encoded_payload = urllib.parse.urlencode(order_payload)
-    headers = {
-        "Key": API_KEY,
-        "Sign": generate_signature(order_payload, SECRET_KEY)
-    }
-    response = requests.post(API_URL, data=encoded_payload, headers=headers)
-    result = response.json()
-
-    if result["success"] == 1:
-        print("Order Berhasil! Menunggu kondisi Take Profit atau Stop Loss...")
-        while True:
-            harga_sekarang = get_ticker(pair)['price'].iloc[-1]  # Cek harga terbaru
-            print(f"Harga Sekarang: {harga_sekarang}")
-
-            if harga_sekarang >= take_profit:
-                print("Take Profit Tercapai! Menjual aset...")
-                sell_trade(pair, harga_sekarang, jumlah_crypto)
-                break
-            elif harga_sekarang <= stop_loss:
-                print("Stop Loss Terpenuhi! Menjual aset untuk meminimalkan kerugian...")
-                sell_trade(pair, harga_sekarang, jumlah_crypto)
-                break
-            time.sleep(5)  # Cek harga setiap 5 detik
-    else:
-        print("Order Gagal!")
-
-# Fungsi untuk menjual aset
-def sell_trade(pair, harga_jual, jumlah_crypto):
-    order_payload = {
-        "method": "trade",
-        "pair": pair,
-        "type": "sell",
-        "price": harga_jual,
-        "btc": jumlah_crypto,
-        "timestamp": int(time.time() * 1000)
-    }
-    encoded_payload = urllib.parse.urlencode(order_payload)
-    headers = {
-        "Key": API_KEY,
-        "Sign": generate_signature(order_payload, SECRET_KEY)
-    }
-    response = requests.post(API_URL, data=encoded_payload, headers=headers)
-    result = response.json()
-    print("Order Jual Berhasil!" if result["success"] == 1 else "Order Jual Gagal!")
-
-
-
-# Fungsi untuk eksekusi trading
-# Fungsi untuk eksekusi trading dengan manajemen risiko
-def execute_trade(pair="btcidr", modal=20000, stop_loss_pct=0.02, take_profit_pct=0.05):
-    harga_beli = get_ticker(pair)['price'].iloc[-1]  # Ambil harga terakhir
-    jumlah_crypto = modal / harga_beli
-    stop_loss = harga_beli * (1 - stop_loss_pct)  # Stop Loss 2% di bawah harga beli
-    take_profit = harga_beli * (1 + take_profit_pct)  # Take Profit 5% di atas harga beli
-
-    print(f"Harga Beli: {harga_beli}")
-    print(f"Stop Loss: {stop_loss}")
-    print(f"Take Profit: {take_profit}")
-
-    # Order pembelian
-    order_payload = {
-        "method": "trade",
-        "pair": pair,
-        "type": "buy",
-        "price": harga_beli,
-        "btc": jumlah_crypto,
-        "timestamp": int(time.time() * 1000)
-    }
-    encoded_payload = urllib.parse.urlencode(order_payload)
-    headers = {
-        "Key": API_KEY,
-        "Sign": generate_signature(order_payload, SECRET_KEY)
-    }
-    response = requests.post(API_URL, data=encoded_payload, headers=headers)
-    result = response.json()
-
-    if result["success"] == 1:
-        print("Order Berhasil! Menunggu kondisi Take Profit atau Stop Loss...")
-        while True:
-            harga_sekarang = get_ticker(pair)['price'].iloc[-1]  # Cek harga terbaru
-            print(f"Harga Sekarang: {harga_sekarang}")
-
-            if harga_sekarang >= take_profit:
-                print("Take Profit Tercapai! Menjual aset...")
-                sell_trade(pair, harga_sekarang, jumlah_crypto)
-                break
-            elif harga_sekarang <= stop_loss:
-                print("Stop Loss Terpenuhi! Menjual aset untuk meminimalkan kerugian...")
-                sell_trade(pair, harga_sekarang, jumlah_crypto)
-                break
-            time.sleep(5)  # Cek harga setiap 5 detik
-    else:
-        print("Order Gagal!")
-
-# Fungsi untuk menjual aset
-def sell_trade(pair, harga_jual, jumlah_crypto):
-    order_payload = {
-        "method": "trade",
-        "pair": pair,
-        "type": "sell",
-        "price": harga_jual,
-        "btc": jumlah_crypto,
-        "timestamp": int(time.time() * 1000)
-    }
-    encoded_payload = urllib.parse.urlencode(order_payload)
-    headers = {
-        "Key": API_KEY,
-        "Sign": generate_signature(order_payload, SECRET_KEY)
-    }
-    response = requests.post(API_URL, data=encoded_payload, headers=headers)
-    result = response.json()
-    print("Order Jual Berhasil!" if result["success"] == 1 else "Order Jual Gagal!")
+    def fetch_quote(self, pair, etag=None, quote=None):
+        """Request ticker bersyarat; mengembalikan (etag, quote)"""
+        headers = {"If-None-Match": etag} if etag and quote is not None else None
+        response = self.public_response(f"ticker/{pair}", headers=headers)
+        if response.status_code == 304:
+            return etag, quote
+        ticker = response.json()["ticker"]
+        quote = {
+            "last": float(ticker["last"]),
+            "buy": float(ticker["buy"]),
+            "sell": float(ticker["sell"]),
+            "server_time": int(ticker["server_time"])
+        }
+        return response.headers.get("ETag"), quote
+
+    def get_quote(self, pair="btcidr"):
+        """Quote ringan (last, buy, sell, server_time) dari endpoint ticker tanpa pandas"""
+        if self.quote_cache is None:
+            return self.fetch_quote(pair)[1]
+        return self.quote_cache.get((self.public_url, pair), lambda etag, quote: self.fetch_quote(pair, etag, quote))
+
+    def get_price(self, pair="btcidr"):
+        """Harga terakhir pair, untuk loop pemantauan harga"""
+        return self.get_quote(pair)["last"]
+
+    def get_tickers(self):
+        """Ticker semua pair dalam satu request (/api/ticker_all).
 
+        Mengembalikan {pair: {last, buy, sell, high, low, vol_idr, server_time}}
+        dengan nama pair tanpa garis bawah (btc_idr -> btcidr).
+        """
+        tickers = self.get_public("ticker_all")["tickers"]
+        hasil = {}
+        for name, ticker in tickers.items():
+            hasil[name.replace("_", "")] = {
+                "last": float(ticker["last"]),
+                "buy": float(ticker["buy"]),
+                "sell": float(ticker["sell"]),
+                "high": float(ticker.get("high", ticker["last"])),
+                "low": float(ticker.get("low", ticker["last"])),
+                "vol_idr": float(ticker.get("vol_idr", 0)),
+                "server_time": int(ticker.get("server_time", 0))
+            }
+        return hasil
@@ -0,0 +1,128 @@
+import numpy as np
+from analysis import entry_signal
+
+
+def find_exit(price, start, take_profit, stop_loss, chunk=1024):
+    """Indeks pertama setelah start di mana harga menyentuh TP atau SL, atau -1.
+
+    Dipindai per blok yang makin besar sehingga posisi singkat tidak perlu
+    membuat mask untuk seluruh sisa data.
+    """
+    n = len(price)
+    i = start + 1
+    while i < n:
+        blok = price[i:i + chunk]
+        hit = (blok >= take_profit) | (blok <= stop_loss)
+        if hit.any():
+            return i + int(np.argmax(hit))
+        i += chunk
+        chunk *= 2
+    return -1
+
+
+def run_arrays(price, date, signal, modal=20000, stop_loss_pct=0.007, take_profit_pct=0.001,
+               fee_pct=0.003, slippage_pct=0.0005, min_signal=0):
+    """Backtest berbasis array: masuk saat signal >= min_signal, keluar di TP/SL.
+
+    Hanya satu posisi terbuka pada satu waktu, seperti TradingBotAI.
+    Posisi yang belum menyentuh TP/SL ditutup di harga terakhir.
+    """
+    kandidat = np.flatnonzero(signal >= min_signal)
+    trades = []
+    i = 0
+    while i < len(kandidat):
+        masuk = int(kandidat[i])
+        harga_beli = price[masuk]
+        keluar = find_exit(price, masuk, harga_beli * (1 + take_profit_pct), harga_beli * (1 - stop_loss_pct))
+        terbuka = keluar == -1
+        if terbuka:
+            keluar = len(price) - 1
+        harga_isi_beli = harga_beli * (1 + slippage_pct)
+        harga_isi_jual = price[keluar] * (1 - slippage_pct)
+        jumlah_crypto = modal * (1 - fee_pct) / harga_isi_beli
+        hasil_jual = jumlah_crypto * harga_isi_jual * (1 - fee_pct)
+        trades.append((masuk, keluar, harga_isi_beli, harga_isi_jual, hasil_jual - modal, terbuka))
+        if terbuka:
+            break
+        i = int(np.searchsorted(kandidat, keluar, side="right"))
+    return summarize(trades, date, modal)
+
+
+def summarize(trades, date, modal):
+    if not trades:
+        return {"trades": 0, "pnl": 0.0, "return_pct": 0.0, "max_drawdown_pct": 0.0,
+                "hit_rate": 0.0, "exposure": 0.0, "detail": []}
+    masuk, keluar, _, _, pnl, _ = (np.array(kolom) for kolom in zip(*trades))
+    equity = modal + np.concatenate([[0.0], np.cumsum(pnl)])
+    puncak = np.maximum.accumulate(equity)
+    durasi_total = max(date[-1] - date[0], 1)
+    return {
+        "trades": len(trades),
+        "pnl": float(pnl.sum()),
+        "return_pct": float(pnl.sum() / modal * 100),
+        "max_drawdown_pct": float(((puncak - equity) / puncak).max() * 100),
+        "hit_rate": float((pnl > 0).mean()),
+        "exposure": float(np.sum(date[keluar] - date[masuk]) / durasi_total),
+        "detail": trades
+    }
+
+
+class Backtester:
+    """Memutar ulang trade dari HistoryStore dengan logika sinyal TradingBotAI"""
+    def __init__(self, predictor, modal=20000, stop_loss_pct=0.007, take_profit_pct=0.001,
+                 fee_pct=0.003, slippage_pct=0.0005, rsi_low=40, rsi_high=50, min_signal=0, n_jobs=None):
+        self.predictor = predictor
+        self.modal = modal
+        self.stop_loss_pct = stop_loss_pct
+        self.take_profit_pct = take_profit_pct
+        self.fee_pct = fee_pct
+        self.slippage_pct = slippage_pct
+        self.rsi_low = rsi_low
+        self.rsi_high = rsi_high
+        self.min_signal = min_signal
+        self.n_jobs = n_jobs
+
+    def prepare(self, start_date=None, end_date=None):
+        """Membaca fitur dari cache fitur dan menghitung prediksi model untuk semua baris sekaligus"""
+        if not self.predictor.is_model_trained():
+            print(f"[❌] Model untuk {self.predictor.pair} belum tersedia untuk backtest.")
+            return None
+        df = self.predictor.features.frame(start_date, end_date)
+        if df.empty:
+            print(f"[❌] Tidak ada data historis untuk backtest {self.predictor.pair}.")
+            return None
+        return {
+            "price": df['price'].to_numpy(),
+            "date": df['date'].to_numpy(),
+            "prediction": self.predictor.predict_batch(df, n_jobs=self.n_jobs).to_numpy(),
+            "RSI": df['RSI'].to_numpy(),
+            "SMA": df['SMA'].to_numpy()
+        }
+
+    def run(self, start_date=None, end_date=None):
+        data = self.prepare(start_date, end_date)
+        if data is None:
+            return None
+        signal = entry_signal(data['prediction'], data['price'], data['RSI'], data['SMA'],
+                              self.rsi_low, self.rsi_high)
+        return run_arrays(data['price'], data['date'], signal, self.modal, self.stop_loss_pct,
+                          self.take_profit_pct, self.fee_pct, self.slippage_pct, self.min_signal)
+
+
+def print_report(report, pair="btcidr"):
+    print(f"\n📊 Hasil backtest {pair}")
+    print(f"Jumlah trade : {report['trades']}")
+    print(f"PnL          : {report['pnl']:.2f} IDR ({report['return_pct']:.2f}%)")
+    print(f"Max drawdown : {report['max_drawdown_pct']:.2f}%")
+    print(f"Hit rate     : {report['hit_rate'] * 100:.1f}%")
+    print(f"Exposure     : {report['exposure'] * 100:.1f}% dari waktu")
+
+
+if __name__ == "__main__":
+    from api_utils import IndodaxAPI
+    from ai_model import PricePredictor
+
+    predictor = PricePredictor(IndodaxAPI())
+    report = Backtester(predictor).run()
+    if report:
+        print_report(report, predictor.pair)
@@ -0,0 +1,213 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+from feature_pipeline import compute_features
+from history_store import HistoryStore
+
+TIMEFRAMES = {"1m": 60, "5m": 300, "1h": 3600, "1d": 86400}
+BAR_SCHEMA = {
+    "start": "int64",
+    "open": "float64",
+    "high": "float64",
+    "low": "float64",
+    "close": "float64",
+    "volume": "float64",
+    "trades": "int64"
+}
+BAR_FIELDS = list(BAR_SCHEMA)
+
+
+def aggregate(date, price, amount, seconds):
+    """Mengelompokkan trade (urut waktu) ke bar `seconds` detik; hanya bucket yang berisi trade"""
+    bucket = date // seconds * seconds
+    awal = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    akhir = np.r_[awal[1:], len(date)] - 1
+    return {
+        "start": bucket[awal],
+        "open": price[awal],
+        "high": np.maximum.reduceat(price, awal),
+        "low": np.minimum.reduceat(price, awal),
+        "close": price[akhir],
+        "volume": np.add.reduceat(amount, awal),
+        "trades": np.diff(np.r_[awal, len(date)])
+    }
+
+
+def densify(bars, seconds, prev_close=None, first_start=None):
+    """Mengisi menit/jam tanpa trade dengan bar datar (OHLC = close sebelumnya, volume 0)"""
+    s0 = bars["start"][0] if first_start is None else first_start
+    n = int((bars["start"][-1] - s0) // seconds) + 1
+    idx = ((bars["start"] - s0) // seconds).astype(np.int64)
+    ada = np.zeros(n, dtype=bool)
+    ada[idx] = True
+    close = np.full(n, np.nan)
+    close[idx] = bars["close"]
+    # Forward-fill close untuk bar kosong
+    posisi = np.where(ada, np.arange(n), -1)
+    np.maximum.accumulate(posisi, out=posisi)
+    isi = np.where(posisi >= 0, close[np.maximum(posisi, 0)], np.nan if prev_close is None else prev_close)
+    prev = np.r_[np.nan if prev_close is None else prev_close, isi[:-1]]
+    dense = {"start": s0 + np.arange(n, dtype=np.int64) * seconds}
+    for name in ("open", "high", "low"):
+        dense[name] = prev.copy()
+        dense[name][idx] = bars[name]
+    dense["close"] = isi
+    dense["volume"] = np.zeros(n)
+    dense["volume"][idx] = bars["volume"]
+    dense["trades"] = np.zeros(n, dtype=np.int64)
+    dense["trades"][idx] = bars["trades"]
+    return dense
+
+
+class BarBuilder:
+    """Bar OHLCV multi-timeframe yang dibangun inkremental dari HistoryStore.
+
+    Bar yang sudah tertutup disimpan sebagai HistoryStore kolom di
+    `<store>/bars_<tf>/`, rapat tanpa lubang (interval tanpa trade diisi
+    bar datar), sehingga bar untuk waktu t berada di indeks
+    (t - start_pertama) // detik dan bisa diambil dalam O(1). Bar yang
+    masih berjalan disimpan di meta bersama jumlah baris mentah yang
+    sudah diproses, jadi refresh() hanya membaca trade baru. refresh()
+    memakai kunci store pair dan membaca ulang meta di bawahnya.
+    """
+    def __init__(self, store, timeframes=TIMEFRAMES):
+        self.store = store
+        self.timeframes = dict(timeframes)
+        self.bars = {tf: HistoryStore(f"bars_{tf}", store.path, BAR_SCHEMA) for tf in self.timeframes}
+        self.meta_file = os.path.join(store.path, "bars.json")
+        self.meta = self._read_meta()
+
+    def _read_meta(self):
+        if os.path.exists(self.meta_file):
+            with open(self.meta_file) as f:
+                return json.load(f)
+        return {"raw_rows": 0, "last_date": None, "current": {}}
+
+    def _write_meta(self):
+        tmp_file = f"{self.meta_file}.tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(self.meta, f)
+        os.replace(tmp_file, self.meta_file)
+
+    def refresh(self):
+        """Memproses trade mentah yang belum masuk bar; mengembalikan jumlah trade yang diproses"""
+        if len(self.store) <= self.meta["raw_rows"]:
+            return 0
+        with self.store.lock():
+            # Bar yang sudah dibangun proses lain sejak meta terakhir dibaca tidak diproses ulang
+            self.meta = self._read_meta()
+            return self._refresh_locked()
+
+    def _refresh_locked(self):
+        mulai, total = self.meta["raw_rows"], len(self.store)
+        if total <= mulai:
+            return 0
+        # Waktu trade dibuat tidak pernah mundur supaya bar selalu berurutan
+        date = np.array(self.store.column("date")[mulai:total])
+        if self.meta.get("last_date") is not None:
+            date = np.maximum(date, self.meta["last_date"])
+        date = np.maximum.accumulate(date)
+        price = np.array(self.store.column("price")[mulai:total])
+        amount = np.nan_to_num(np.array(self.store.column("amount")[mulai:total]))
+        for tf, seconds in self.timeframes.items():
+            self._refresh_timeframe(tf, seconds, date, price, amount)
+        self.meta["raw_rows"] = total
+        self.meta["last_date"] = int(date[-1])
+        self._write_meta()
+        return total - mulai
+
+    def _refresh_timeframe(self, tf, seconds, date, price, amount):
+        store = self.bars[tf]
+        baru = aggregate(date, price, amount, seconds)
+        current = self.meta["current"].get(tf)
+        if current is not None:
+            current = dict(zip(BAR_FIELDS, current))
+            if baru["start"][0] == current["start"]:
+                # Trade baru melanjutkan bar yang sedang berjalan
+                baru["open"][0] = current["open"]
+                baru["high"][0] = max(baru["high"][0], current["high"])
+                baru["low"][0] = min(baru["low"][0], current["low"])
+                baru["volume"][0] += current["volume"]
+                baru["trades"][0] += current["trades"]
+            else:
+                baru = {name: np.r_[current[name], baru[name]] for name in BAR_FIELDS}
+
+        prev_close, first_start = None, None
+        if len(store) > 0:
+            prev_close = float(store.column("close")[-1])
+            first_start = int(store.column("start")[-1]) + seconds
+        dense = densify(baru, seconds, prev_close, first_start)
+        # Bar terakhir masih berjalan; sisanya tertutup. Bar yang sudah tersimpan
+        # (refresh sebelumnya terputus sebelum meta ditulis) tidak ditambahkan lagi.
+        tertutup = pd.DataFrame({name: values[:-1] for name, values in dense.items()})
+        if len(store) > 0:
+            tertutup = tertutup[tertutup["start"] > int(store.column("start")[-1])]
+        store.append(tertutup)
+        self.meta["current"][tf] = [dense[name][-1].item() for name in BAR_FIELDS]
+
+    def current(self, tf):
+        """Bar yang sedang berjalan sebagai dict, atau None"""
+        current = self.meta["current"].get(tf)
+        return dict(zip(BAR_FIELDS, current)) if current is not None else None
+
+    def count(self, tf, include_current=True):
+        return len(self.bars[tf]) + (1 if include_current and self.current(tf) else 0)
+
+    def bar_at(self, tf, ts):
+        """Bar yang memuat waktu ts (detik epoch) dalam O(1), atau None jika di luar data"""
+        seconds = self.timeframes[tf]
+        store = self.bars[tf]
+        start = int(ts) // seconds * seconds
+        current = self.current(tf)
+        if current is not None and start == current["start"]:
+            return current
+        if len(store) == 0:
+            return None
+        idx = (start - int(store.column("start")[0])) // seconds
+        if 0 <= idx < len(store):
+            return {name: store.column(name)[idx].item() for name in BAR_FIELDS}
+        return None
+
+    def latest(self, tf, n=1, include_current=True):
+        """n bar terakhir sebagai DataFrame (terlama lebih dulu)"""
+        df = self.bars[tf].tail(n)
+        current = self.current(tf)
+        if include_current and current is not None:
+            df = pd.concat([df, pd.DataFrame([current])], ignore_index=True).tail(n).reset_index(drop=True)
+        return df
+
+    def read(self, tf, start=None, end=None, include_current=False):
+        """Bar dengan start <= waktu < end; slicing lewat indeks, tanpa pencarian"""
+        seconds = self.timeframes[tf]
+        store = self.bars[tf]
+        if len(store) == 0:
+            df = pd.DataFrame(columns=BAR_FIELDS)
+        else:
+            s0 = int(store.column("start")[0])
+            i = 0 if start is None else max(0, -(-(int(start) - s0) // seconds))
+            j = len(store) if end is None else min(len(store), max(0, -(-(int(end) - s0) // seconds)))
+            df = pd.DataFrame({name: np.array(store.column(name)[i:j]) for name in BAR_FIELDS})
+        current = self.current(tf)
+        if include_current and current is not None and (end is None or current["start"] < end):
+            df = pd.concat([df, pd.DataFrame([current])], ignore_index=True)
+        return df
+
+    def change(self, tf, periods, ts=None):
+        """Perubahan close sebenarnya selama `periods` bar (mis. 3 bar 1d = 3 hari) sampai ts"""
+        if ts is None:
+            ts = self.current(tf)["start"] if self.current(tf) else None
+        if ts is None:
+            return None
+        sekarang = self.bar_at(tf, ts)
+        dulu = self.bar_at(tf, int(ts) - periods * self.timeframes[tf])
+        if sekarang is None or dulu is None or not dulu["close"]:
+            return None
+        return sekarang["close"] / dulu["close"] - 1
+
+    def features(self, tf, include_current=True):
+        """Fitur standar (compute_features) yang dihitung di atas close bar, bukan per trade"""
+        df = self.read(tf, include_current=include_current)
+        fitur = compute_features(df["close"])
+        fitur.insert(0, "start", df["start"].to_numpy())
+        return fitur
@@ -0,0 +1,825 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+import requests
+from api_utils import IndodaxAPI
+from mock_server import MockIndodaxHandler, buat_trades, start_mock_server
+
+
+def ringkas_latensi(latensi):
+    """Mengembalikan p50 dan p99 latensi dalam milidetik"""
+    ms = np.array(latensi) * 1000
+    return {"p50_ms": round(float(np.percentile(ms, 50)), 3), "p99_ms": round(float(np.percentile(ms, 99)), 3)}
+
+
+def ukur(fungsi, jumlah):
+    latensi = []
+    for _ in range(jumlah):
+        mulai = time.perf_counter()
+        fungsi()
+        latensi.append(time.perf_counter() - mulai)
+    return ringkas_latensi(latensi)
+
+
+def tick_tanpa_pool(base_url, pair="btcidr"):
+    """Jalur lama get_ticker: requests.get tanpa session (koneksi baru tiap tick)"""
+    response = requests.get(f"{base_url}/api/trades/{pair}?limit=200")
+    df = pd.DataFrame(response.json())
+    df['price'] = df['price'].astype(float)
+    return df[['price', 'date']]['price'].iloc[-1]
+
+
+def bench_tick(jumlah=300):
+    """Membandingkan latensi satu tick sebelum dan sesudah connection pool"""
+    server, base_url = start_mock_server()
+    api = IndodaxAPI(api_url=f"{base_url}/tapi", public_url=f"{base_url}/api",
+                     public_rate_limit=(10000, 1), private_rate_limit=(10000, 1))
+    try:
+        return {
+            "tanpa_pool": ukur(lambda: tick_tanpa_pool(base_url), jumlah),
+            "session_pool": ukur(lambda: api.get_ticker()['price'].iloc[-1], jumlah)
+        }
+    finally:
+        api.close()
+        server.shutdown()
+
+
+def bench_quote(jumlah=300, konsumen=8):
+    """Membandingkan get_ticker (200 trade + DataFrame) dengan get_quote dari endpoint ticker"""
+    from concurrent.futures import ThreadPoolExecutor
+    from api_utils import QuoteCache
+
+    server, base_url = start_mock_server()
+    batas = dict(public_rate_limit=(10000, 1), private_rate_limit=(10000, 1))
+    tanpa_cache = IndodaxAPI(public_url=f"{base_url}/api", quote_cache=None, **batas)
+    # TTL 0: setiap panggilan ke server, tetapi memakai If-None-Match (304)
+    etag = IndodaxAPI(public_url=f"{base_url}/api", quote_cache=QuoteCache(ttl=0), **batas)
+    cache = QuoteCache(ttl=1.0)
+    bersama = IndodaxAPI(public_url=f"{base_url}/api", quote_cache=cache, **batas)
+    ukuran = {
+        "get_ticker": len(tanpa_cache.public_response("trades/btcidr", {"limit": 200}).content),
+        "get_quote": len(tanpa_cache.public_response("ticker/btcidr").content)
+    }
+    try:
+        hasil = {
+            "get_ticker": ukur(lambda: tanpa_cache.get_ticker()['price'].iloc[-1], jumlah),
+            "get_quote": ukur(lambda: tanpa_cache.get_price(), jumlah),
+            "get_quote_etag": ukur(lambda: etag.get_price(), jumlah),
+            "get_quote_cache": ukur(lambda: bersama.get_price(), jumlah)
+        }
+        # Beberapa konsumen meminta harga bersamaan: hanya satu request ke server
+        cache.clear()
+        hitung = {"request": 0}
+        fetch_asli = bersama.fetch_quote
+
+        def fetch_dihitung(*args):
+            hitung["request"] += 1
+            return fetch_asli(*args)
+
+        bersama.fetch_quote = fetch_dihitung
+        with ThreadPoolExecutor(konsumen) as pool:
+            list(pool.map(lambda _: bersama.get_price(), range(konsumen)))
+        hasil["bytes_per_respons"] = ukuran
+        hasil["request_untuk_konsumen_bersamaan"] = {"konsumen": konsumen, "request": hitung["request"]}
+        return hasil
+    finally:
+        for api in (tanpa_cache, etag, bersama):
+            api.close()
+        server.shutdown()
+
+
+def log_csv_lama(filename, pair, action, price, jumlah_crypto):
+    """Jalur lama log_transaction: DataFrame satu baris lalu append ke CSV"""
+    df = pd.DataFrame([{"timestamp": pd.Timestamp.now(), "pair": pair, "action": action, "price": price,
+                        "jumlah_crypto": jumlah_crypto, "profit_loss": None, "profit_loss_pct": None}])
+    if not os.path.exists(filename):
+        df.to_csv(filename, index=False)
+    else:
+        df.to_csv(filename, mode='a', header=False, index=False)
+
+
+# Proses anak mencatat event terus-menerus sampai dibunuh dengan SIGKILL
+JOURNAL_CRASH_SCRIPT = """
+import sys, time
+sys.path.insert(0, {repo!r})
+from trade_journal import TradeJournal
+journal = TradeJournal({path!r}, flush_interval={interval})
+i = 0
+while True:
+    journal.record("btcidr", "SIMULATED_BUY", 1585000000.0 + i, 0.0001)
+    i += 1
+    if i % 1000 == 0:
+        print(i, flush=True)
+    time.sleep(0.0001)
+"""
+
+
+def bench_journal(jumlah=2000, interval=0.5):
+    """Latensi per event log_transaction lama (CSV) vs TradeJournal, dan uji crash SIGKILL"""
+    from trade_journal import TradeJournal, read_journal
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_file = os.path.join(tmp, "historical_data_bench.csv")
+        journal = TradeJournal(os.path.join(tmp, "bench.jsonl"), flush_interval=interval)
+        hasil = {
+            "csv_per_event": ukur(lambda: log_csv_lama(csv_file, "btcidr", "BUY", 1585000000.0, 0.0001), jumlah),
+            "journal_record": ukur(lambda: journal.record("btcidr", "BUY", 1585000000.0, 0.0001), jumlah)
+        }
+        mulai = time.perf_counter()
+        journal.close()
+        hasil["journal_close_ms"] = round((time.perf_counter() - mulai) * 1000, 3)
+        hasil["journal_rows"] = len(read_journal(journal.path))
+
+        path = os.path.join(tmp, "crash.jsonl")
+        script = JOURNAL_CRASH_SCRIPT.format(repo=os.path.dirname(os.path.abspath(__file__)), path=path,
+                                             interval=interval)
+        proses = subprocess.Popen([sys.executable, "-c", script], stdout=subprocess.PIPE, text=True)
+        for _ in range(5):
+            dicatat = int(proses.stdout.readline())
+        proses.kill()
+        proses.wait()
+        # Baris terpotong (jika ada) dibuang saat jurnal dibuka ulang
+        TradeJournal(path).close()
+        tersimpan = read_journal(path)
+        hasil["crash"] = {"dicatat_minimal": dicatat, "tersimpan": len(tersimpan),
+                          "seq_berurutan": bool((tersimpan["seq"].diff().dropna() == 1).all())}
+    return hasil
+
+
+def buat_history(jumlah):
+    """Data historis sintetis dengan skema yang sama seperti HistoryStore"""
+    from history_store import SCHEMA
+
+    rng = np.random.default_rng(42)
+    df = pd.DataFrame({
+        "date": 1700000000 + np.arange(jumlah, dtype="int64"),
+        "tid": np.arange(1, jumlah + 1, dtype="int64"),
+        "price": 1.5e9 * np.exp(np.cumsum(rng.normal(0, 5e-4, jumlah))),
+        "amount": rng.uniform(0.0001, 0.05, jumlah)
+    })
+    for name in list(SCHEMA)[4:]:
+        df[name] = rng.normal(0, 1, jumlah)
+    return df
+
+
+# Dijalankan di proses terpisah supaya RSS tiap jalur tidak saling tercampur
+LOAD_SCRIPT = """
+import sys, time
+import pandas as pd
+sys.path.insert(0, {repo!r})
+from history_store import HistoryStore
+mulai = time.perf_counter()
+if {mode!r} == "csv":
+    df = pd.read_csv({csv!r})
+    harga = df["price"].iloc[-31:]
+elif {mode!r} == "store_full":
+    df = HistoryStore("bench", {root!r}).read()
+    harga = df["price"].iloc[-31:]
+else:
+    harga = HistoryStore("bench", {root!r}).tail(31, columns=["date", "price"])["price"]
+durasi = time.perf_counter() - mulai
+# VmHWM dibaca dari /proc karena ru_maxrss ikut mewarisi RSS proses induk saat fork
+with open("/proc/self/status") as f:
+    rss_kb = next(line.split()[1] for line in f if line.startswith("VmHWM"))
+print(durasi, rss_kb)
+"""
+
+
+def bench_history_store(jumlah=10_000_000):
+    """Membandingkan waktu muat dan RSS CSV dengan HistoryStore (memmap)"""
+    from history_store import HistoryStore
+
+    hasil = {"rows": jumlah}
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_file = os.path.join(tmp, "historical_data_bench.csv")
+        df = buat_history(jumlah)
+        df.to_csv(csv_file, index=False)
+        HistoryStore("bench", tmp).append(df)
+        del df
+        hasil["csv_mb"] = round(os.path.getsize(csv_file) / 2**20, 1)
+        hasil["store_mb"] = round(sum(os.path.getsize(os.path.join(tmp, "bench", f))
+                                      for f in os.listdir(os.path.join(tmp, "bench"))) / 2**20, 1)
+        repo = os.path.dirname(os.path.abspath(__file__))
+        for mode in ("csv", "store_full", "store_tail"):
+            script = LOAD_SCRIPT.format(repo=repo, mode=mode, csv=csv_file, root=tmp)
+            output = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True)
+            durasi, rss_kb = output.stdout.split()
+            hasil[mode] = {"load_s": round(float(durasi), 4), "max_rss_mb": round(int(rss_kb) / 1024, 1)}
+    return hasil
+
+
+def buat_model(model_file, jumlah=20000):
+    """Melatih RandomForest kecil pada data sintetis untuk benchmark prediksi"""
+    import joblib
+    from sklearn.ensemble import RandomForestRegressor
+    from ai_model import PricePredictor
+
+    predictor = PricePredictor(None)
+    df = predictor.calculate_indicators(buat_history(jumlah)[["date", "tid", "price", "amount"]])
+    model = RandomForestRegressor(n_estimators=100, random_state=42)
+    model.fit(df[predictor.feature_names], df["price"].shift(-1).ffill())
+    joblib.dump((model, predictor.feature_names), model_file)
+    return df[predictor.feature_names].iloc[-1].tolist()
+
+
+def bench_predict(jumlah=200):
+    """predict_price lama (joblib.load + DataFrame tiap panggilan) vs ModelRegistry"""
+    import joblib
+    from model_artifact import convert_pickle
+    from model_registry import ModelRegistry
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pkl_file = os.path.join(tmp, "model.pkl")
+        model_file = os.path.join(tmp, "model.model")
+        fitur = buat_model(pkl_file)
+        convert_pickle(pkl_file, model_file)
+        registry = ModelRegistry()
+
+        def lama():
+            model, feature_names = joblib.load(pkl_file)
+            return model.predict(pd.DataFrame([fitur], columns=feature_names))[0]
+
+        return {
+            "joblib_load_per_call": ukur(lama, jumlah),
+            "registry_fast_path": ukur(lambda: registry.get(model_file).predict([fitur])[0], jumlah)
+        }
+
+
+def bench_artifact(jumlah=20):
+    """Ukuran file dan waktu cold start .pkl (joblib) vs artefak model"""
+    import joblib
+    from model_artifact import ModelArtifact, convert_pickle, read_header
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pkl_file = os.path.join(tmp, "model.pkl")
+        model_file = os.path.join(tmp, "model.model")
+        fitur = buat_model(pkl_file)
+        convert_pickle(pkl_file, model_file)
+        return {
+            "pkl_mb": round(os.path.getsize(pkl_file) / 2**20, 2),
+            "artifact_mb": round(os.path.getsize(model_file) / 2**20, 2),
+            "pkl_load_and_predict": ukur(lambda: joblib.load(pkl_file)[0].predict(
+                pd.DataFrame([fitur], columns=joblib.load(pkl_file)[1])), jumlah),
+            "pkl_load": ukur(lambda: joblib.load(pkl_file), jumlah),
+            "artifact_header": ukur(lambda: read_header(model_file), jumlah),
+            "artifact_open_and_predict": ukur(lambda: ModelArtifact(model_file).predict([fitur]), jumlah)
+        }
+
+
+def bench_bars(jumlah=1_000_000, batch=10_000):
+    """Membangun bar 1m/5m/1h/1d secara inkremental, lookup O(1), dan fitur per tick vs per bar"""
+    from bars import BarBuilder
+    from feature_pipeline import compute_features
+    from history_store import HistoryStore
+
+    raw = buat_history(jumlah)[["date", "tid", "price", "amount"]]
+    # Rata-rata satu trade per 20 detik supaya ada menit tanpa trade
+    raw["date"] = 1700000000 + np.cumsum(np.random.default_rng(1).exponential(20, jumlah).astype("int64"))
+    with tempfile.TemporaryDirectory() as tmp:
+        store = HistoryStore("bench", tmp)
+        builder = BarBuilder(store)
+        durasi = []
+        for i in range(0, jumlah, batch):
+            store.append(raw.iloc[i:i + batch])
+            mulai = time.perf_counter()
+            builder.refresh()
+            durasi.append(time.perf_counter() - mulai)
+        ts = int(raw["date"].iloc[jumlah // 2])
+        hasil = {
+            "trades": jumlah,
+            "bars": {tf: builder.count(tf) for tf in builder.timeframes},
+            "refresh_per_batch": ringkas_latensi(durasi),
+            "bar_at_1m": ukur(lambda: builder.bar_at("1m", ts), 1000),
+            "features_ticks": ukur(lambda: compute_features(store.column("price")), 5),
+            "features_1m_bars": ukur(lambda: builder.features("1m"), 5),
+            "features_1h_bars": ukur(lambda: builder.features("1h"), 5)
+        }
+    return hasil
+
+
+def bench_scan(jumlah_pair=150, dengan_model=20, siklus=50):
+    """Satu siklus scanner (ticker_all + fitur vektor + prediksi batch) vs fitur per pair"""
+    from feature_pipeline import compute_features
+    from model_artifact import convert_pickle
+    from mock_server import PasarPalsu
+    from scanner import MarketScanner
+
+    class Handler(MockIndodaxHandler):
+        pasar = PasarPalsu(jumlah_pair)
+
+    server, base_url = start_mock_server(Handler)
+    api = IndodaxAPI(public_url=f"{base_url}/api", public_rate_limit=(10000, 1))
+    rng = np.random.default_rng(3)
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            buat_model(os.path.join(tmp, "model.pkl"))
+            pola = os.path.join(tmp, "price_predictor_{pair}.model")
+            scanner = MarketScanner(api, model_pattern=pola, min_volume_idr=0)
+            scanner.update(api.get_tickers())
+            for i, pair in enumerate(scanner.pairs):
+                harga = scanner.tickers.loc[pair, "last"]
+                scanner.seed(pair, harga * np.exp(np.cumsum(rng.normal(0, 1e-3, scanner.window))))
+                if i < dengan_model:
+                    convert_pickle(os.path.join(tmp, "model.pkl"), pola.format(pair=pair))
+            scanner.scan()
+            durasi, tahap = [], {"fetch": [], "update": [], "score": []}
+            for _ in range(siklus):
+                mulai = time.perf_counter()
+                tickers = api.get_tickers()
+                tahap["fetch"].append(time.perf_counter() - mulai)
+                t = time.perf_counter()
+                scanner.update(tickers)
+                tahap["update"].append(time.perf_counter() - t)
+                t = time.perf_counter()
+                ranked = scanner.score()
+                scanner.candidates(ranked)
+                tahap["score"].append(time.perf_counter() - t)
+                durasi.append(time.perf_counter() - mulai)
+            harga = pd.DataFrame(scanner.history.T, columns=scanner.pairs)
+            return {
+                "pairs": len(scanner),
+                "pairs_with_model": int(ranked["model"].sum()),
+                "scan_cycle": ringkas_latensi(durasi),
+                "stages": {nama: ringkas_latensi(nilai) for nama, nilai in tahap.items()},
+                "features_wide": ukur(lambda: scanner.features(), 20),
+                "features_per_pair": ukur(lambda: [compute_features(harga[p].dropna()).iloc[-1]
+                                                   for p in scanner.pairs], 5)
+            }
+    finally:
+        api.close()
+        server.shutdown()
+
+
+def bench_triggers(jumlah_posisi=(10, 100, 1000, 10_000, 100_000), ticks=5000):
+    """Biaya per tick TriggerBook vs pemeriksaan linear per posisi saat jumlah posisi bertambah.
+
+    Posisi yang terpicu langsung diganti posisi baru di harga sekarang,
+    jadi jumlah posisi terbuka tetap selama pengukuran.
+    """
+    import random
+    from trigger_book import TriggerBook
+
+    hasil = {}
+    for n in jumlah_posisi:
+        rng = random.Random(n)
+        harga = 1.5e9
+
+        def level(harga):
+            stop = harga * (1 - rng.uniform(0.005, 0.2))
+            target = harga * (1 + rng.uniform(0.005, 0.2))
+            trail = 0.01 if rng.random() < 0.3 else None
+            return stop, target, trail
+
+        book = TriggerBook("btcidr")
+        for key in range(n):
+            book.add(key, *level(harga), price=harga)
+        berikut = n
+        durasi, terpicu = [], 0
+        for _ in range(ticks):
+            harga *= 1 + rng.gauss(0, 5e-4)
+            mulai = time.perf_counter()
+            fired = book.on_price(harga)
+            durasi.append(time.perf_counter() - mulai)
+            terpicu += len(fired)
+            for _ in fired:
+                book.add(berikut, *level(harga), price=harga)
+                berikut += 1
+
+        # Jalur lama: setiap posisi membandingkan harga dengan stop/target-nya sendiri
+        posisi = [(s_, t_) for s_, t_, _ in (level(harga) for _ in range(n))]
+        linear = []
+        for _ in range(min(ticks, max(20, 2_000_000 // n))):
+            harga *= 1 + rng.gauss(0, 5e-4)
+            mulai = time.perf_counter()
+            [i for i, (stop, target) in enumerate(posisi) if harga <= stop or harga >= target]
+            linear.append(time.perf_counter() - mulai)
+        hasil[n] = {"trigger_book": ringkas_latensi(durasi), "linear_scan": ringkas_latensi(linear),
+                    "fired_per_tick": round(terpicu / ticks, 3)}
+    return hasil
+
+
+def bench_orders(jumlah=200, latency=0.005, workers=4):
+    """Round-trip order (submit sampai ack) dan submit sampai fill lewat OrderEngine ke bursa mock"""
+    import asyncio
+    from mock_exchange import MockExchange, start_mock_exchange
+    from order_engine import OrderEngine
+
+    server, base_url, exchange = start_mock_exchange(MockExchange(latency=latency))
+    api = IndodaxAPI(api_url=f"{base_url}/tapi", public_url=f"{base_url}/api", quote_cache=None,
+                     public_rate_limit=(10000, 1), private_rate_limit=(10000, 1))
+    api.api_key, api.secret_key = exchange.api_key, exchange.secret_key
+    harga = exchange.prices["btcidr"]
+
+    async def jalankan():
+        async with OrderEngine(api, workers=workers, poll_interval=0.05) as engine:
+            orders = [engine.submit("btcidr", "buy", harga * 2, 0.0001) for _ in range(jumlah)]
+            await asyncio.gather(*(engine.wait(o, 30) for o in orders))
+            return orders, engine.latency_stats()
+
+    try:
+        orders, roundtrip = asyncio.run(jalankan())
+    finally:
+        api.close()
+        server.shutdown()
+    return {
+        "orders": jumlah,
+        "exchange_latency_ms": latency * 1000,
+        "filled": sum(o.status == "filled" for o in orders),
+        "order_roundtrip": roundtrip,
+        "order_fill": ringkas_latensi([o.closed - o.created for o in orders]),
+        "private_requests": exchange.requests
+    }
+
+
+def _importtime(modul, folder):
+    """Parse stderr `python -X importtime -c "import modul"` -> {nama: (self_us, cumulative_us)}"""
+    proses = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {modul}"], cwd=folder,
+                            capture_output=True, text=True, check=True)
+    hasil = {}
+    for baris in proses.stderr.splitlines():
+        if not baris.startswith("import time:") or "[us]" in baris:
+            continue
+        sendiri, kumulatif, nama = baris[len("import time:"):].split("|")
+        hasil[nama.strip()] = (int(sendiri), int(kumulatif))
+    return hasil
+
+
+def bench_importtime(modul=("main", "api_utils", "scanner", "simulation"), ulang=5, top=5):
+    """Waktu impor cold start per modul (`-X importtime`, median dari beberapa proses baru).
+
+    Juga mengukur wall time `main.py --help`, yaitu biaya minimum setiap
+    perintah CLI sebelum subcommand mengimpor modul beratnya sendiri.
+    """
+    folder = os.path.dirname(os.path.abspath(__file__))
+    hasil = {}
+    for nama in modul:
+        runs = [_importtime(nama, folder) for _ in range(ulang)]
+        terberat = sorted(runs[-1].items(), key=lambda item: item[1][0], reverse=True)[:top]
+        hasil[nama] = {"import_ms": round(float(np.median([r[nama][1] for r in runs])) / 1000, 2),
+                       "modules": len(runs[-1]),
+                       "top_self_ms": {m: round(t[0] / 1000, 2) for m, t in terberat}}
+    wall = []
+    for _ in range(ulang):
+        mulai = time.perf_counter()
+        subprocess.run([sys.executable, "main.py", "--help"], cwd=folder, capture_output=True, check=True)
+        wall.append(time.perf_counter() - mulai)
+    hasil["cli_help_wall_ms"] = round(float(np.median(wall)) * 1000, 2)
+    return hasil
+
+
+def bench_online(jumlah=40_000, latih=20_000, drift_di=30_000):
+    """Model statis vs forest online pada deret harga sintetis yang pindah regime.
+
+    Model statis dilatih sekali pada `latih` baris pertama; forest online
+    di-seed dari artefaknya lalu belajar satu baris per tick. Mulai
+    `drift_di` harga berbalik ke level rata-rata baru (5% lebih tinggi). Mengukur biaya update per
+    tick, MAE sebelum/sesudah drift, kapan refit penuh diminta, dan biaya
+    satu refit penuh sebagai pembanding.
+    """
+    from sklearn.ensemble import RandomForestRegressor
+    from feature_pipeline import FEATURE_NAMES, compute_features
+    from model_artifact import ModelArtifact, save_forest
+    from online_model import OnlineForest
+    from retrainer import RetrainScheduler
+
+    class Scheduler(RetrainScheduler):
+        # Hanya mencatat permintaan refit, tanpa proses training sungguhan
+        def request(self, reason):
+            self.requests.append(reason)
+            self.errors.clear()
+            self.baseline_error = None
+            return True
+
+    # Log harga mean-reverting (OU) di sekitar level yang naik 5% mulai drift_di
+    rng = np.random.default_rng(7)
+    level = np.where(np.arange(jumlah) < drift_di, 0.0, 0.05)
+    x = np.empty(jumlah)
+    x[0] = 0.0
+    kejutan = rng.normal(0, 1e-3, jumlah)
+    for i in range(1, jumlah):
+        x[i] = x[i - 1] + 0.01 * (level[i] - x[i - 1]) + kejutan[i]
+    harga = 1.5e9 * np.exp(x)
+    fitur = compute_features(harga)[FEATURE_NAMES].to_numpy()
+    X, y = fitur[:-1], harga[1:]
+    valid = ~np.isnan(X).any(axis=1)
+    X, y = X[valid], y[valid]
+    # Indeks drift dalam baris X (baris awal tanpa fitur lengkap sudah dibuang)
+    drift_di = int(np.searchsorted(np.flatnonzero(valid), drift_di))
+
+    mulai = time.perf_counter()
+    model = RandomForestRegressor(n_estimators=100, max_depth=12, random_state=42, n_jobs=1)
+    model.fit(X[:latih], y[:latih])
+    refit_s = time.perf_counter() - mulai
+
+    hasil = {"rows": len(X), "full_refit_s": round(refit_s, 3)}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "model.model")
+        save_forest(model, FEATURE_NAMES, path)
+        statis = ModelArtifact(path)
+        forest = OnlineForest(n_trees=100, window=5000, update_every=100)
+        forest.seed(statis)
+        pred_statis = statis.predict(X[latih:])
+
+        scheduler = Scheduler(interval=None, error_window=500)
+        scheduler.requests = []
+        pred_online, durasi, refit_di = [], [], []
+        for i in range(latih, len(X)):
+            mulai = time.perf_counter()
+            prediksi = forest.predict(X[i:i + 1])[0]
+            if scheduler.record_errors([prediksi], [y[i]]):
+                refit_di.append(i)
+            forest.learn(X[i:i + 1], y[i:i + 1])
+            durasi.append(time.perf_counter() - mulai)
+            pred_online.append(prediksi)
+
+    pred_online = np.array(pred_online)
+    aktual = y[latih:]
+    sebelum = slice(0, drift_di - latih)
+    sesudah = slice(drift_di - latih, None)
+    hasil["static"] = {"mae_before_drift": round(float(np.abs(pred_statis - aktual)[sebelum].mean()), 1),
+                       "mae_after_drift": round(float(np.abs(pred_statis - aktual)[sesudah].mean()), 1)}
+    hasil["online"] = {"mae_before_drift": round(float(np.abs(pred_online - aktual)[sebelum].mean()), 1),
+                       "mae_after_drift": round(float(np.abs(pred_online - aktual)[sesudah].mean()), 1),
+                       "tick": {**ringkas_latensi(durasi), "max_ms": round(max(durasi) * 1000, 3)},
+                       "trees_fitted": forest.fits,
+                       "refit_requests_before_drift": sum(i < drift_di for i in refit_di),
+                       "first_refit_after_drift_rows": next((i - drift_di for i in refit_di if i >= drift_di), None)}
+    return hasil
+
+
+def bench_online_session(jumlah=2000, per_tick=40, naik_setelah=8, pair="btcidr"):
+    """Sesi SimulationBotAI --online terhadap server mock yang terus menerima trade.
+
+    Setiap request ticker menambah `per_tick` trade baru; setelah
+    `naik_setelah` tick harga melompat ke take profit dan sesi selesai.
+    Mengukur baris dan pohon yang dipelajari forest online selama posisi
+    terbuka (setelah evaluate_entry), yaitu dari jalur tick bot.
+    """
+    import contextlib
+    import io
+    import random
+    import threading
+    from sklearn.ensemble import RandomForestRegressor
+    from ai_model import PricePredictor
+    from model_artifact import save_forest
+    from simulation import SimulationBotAI
+
+    class Handler(MockIndodaxHandler):
+        trades = buat_trades(jumlah, seed=3)
+        rng = random.Random(3)
+        lock = threading.Lock()
+        ticks = 0
+
+        def kirim_ticker(self):
+            cls = type(self)
+            with cls.lock:
+                cls.ticks += 1
+                harga, tid = float(cls.trades[0]["price"]), int(cls.trades[0]["tid"])
+                baru = []
+                for i in range(per_tick):
+                    harga *= 1.2 if cls.ticks > naik_setelah and i == per_tick - 1 else 1 + cls.rng.gauss(0, 5e-4)
+                    baru.append({"date": str(int(time.time())), "price": str(round(harga)),
+                                 "amount": "0.001", "tid": str(tid + i + 1), "type": "buy"})
+                cls.trades = baru[::-1] + cls.trades
+            super().kirim_ticker()
+
+    server, base_url = start_mock_server(Handler)
+    api = IndodaxAPI(api_url=f"{base_url}/tapi", public_url=f"{base_url}/api", quote_cache=None,
+                     public_rate_limit=(10000, 1), private_rate_limit=(10000, 1))
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+        os.chdir(tmp)
+        try:
+            # Model penuh dari data awal, supaya sesi tidak memicu training di proses lain
+            predictor = PricePredictor(api, pair)
+            predictor.update_historical_data()
+            df = predictor.get_market_data()
+            model = RandomForestRegressor(n_estimators=20, max_depth=8, random_state=0, n_jobs=1)
+            model.fit(df[predictor.feature_names], df["target"])
+            save_forest(model, predictor.feature_names, predictor.model_file, metadata={"pair": pair})
+
+            bot = SimulationBotAI(api, pair, stop_loss_pct=0.5, take_profit_pct=0.1, online=True)
+            learner = bot.model.online
+            learner.refresh_interval = 0.0
+            learner.scheduler.drift_ratio = float("inf")
+            # Prediksi turun berarti tidak ada posisi: entry dipaksa, tapi fitur dan forest tetap lewat bot
+            awal = {}
+            evaluate_entry = bot.evaluate_entry
+
+            def entry_paksa():
+                evaluate_entry()
+                awal.update(fits=learner.forest.fits, rows=learner.rows)
+                harga = bot.model.features.latest()["price"]
+                return harga, bot.modal / harga, harga * (1 - bot.stop_loss_pct), harga * (1 + bot.take_profit_pct)
+
+            bot.evaluate_entry = entry_paksa
+            mulai = time.perf_counter()
+            bot.simulate_trade()
+            durasi = time.perf_counter() - mulai
+            if learner._thread is not None:
+                learner._thread.join()
+            bot.collector.journal.close()
+        finally:
+            os.chdir(cwd)
+            api.close()
+            server.shutdown()
+    return {"wall_s": round(durasi, 3), "ticks": Handler.ticks, "status": bot.status,
+            "rows_learned": learner.rows - awal["rows"], "trees_fitted": learner.forest.fits - awal["fits"],
+            "trees": len(learner.forest.trees)}
+
+
+def buat_fixture(fixture_file, jumlah=5000):
+    """Merekam fixture replay dari server mock, deterministik dan tanpa jaringan"""
+    from replay import RecordingAPI, record_session
+
+    class Handler(MockIndodaxHandler):
+        trades = buat_trades(jumlah, seed=7)
+
+    server, base_url = start_mock_server(Handler)
+    api = RecordingAPI(fixture_file, api_url=f"{base_url}/tapi", public_url=f"{base_url}/api",
+                       public_rate_limit=(10000, 1), private_rate_limit=(10000, 1))
+    api.api_key = api.secret_key = "bench"
+    try:
+        # Tanpa quote ticker: jalur harga replay disusun dari trade terekam
+        record_session(fixture_file, trades_limit=jumlah, ticks=0, api=api)
+    finally:
+        server.shutdown()
+    return fixture_file
+
+
+def bench_suite(fixture_file=None, jumlah=200, pair="btcidr"):
+    """Micro dan end-to-end benchmark yang memutar ulang fixture pasar lewat ReplayAPI.
+
+    Dijalankan di direktori sementara supaya store, model, dan jurnal
+    benchmark tidak bercampur dengan data bot.
+    """
+    import asyncio
+    import contextlib
+    import io
+    from sklearn.ensemble import RandomForestRegressor
+    from ai_model import PricePredictor
+    from backtest import Backtester
+    from market_engine import MarketEngine
+    from metrics import METRICS
+    from model_artifact import save_forest
+    from replay import ReplayAPI
+    from simulation import SimulationBotAI
+
+    fixture_file = os.path.abspath(fixture_file) if fixture_file else None
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+        os.chdir(tmp)
+        try:
+            fixture_file = fixture_file or buat_fixture(os.path.join(tmp, "fixture.jsonl"))
+            api = ReplayAPI(fixture_file)
+            hasil = {"fixture": {"file": os.path.basename(fixture_file), "trades": len(api.trades[pair])}}
+
+            mulai = time.perf_counter()
+            predictor = PricePredictor(api, pair)
+            predictor.update_historical_data()
+            hasil["ingest_s"] = round(time.perf_counter() - mulai, 4)
+
+            df = predictor.get_market_data()
+            model = RandomForestRegressor(n_estimators=50, max_depth=12, random_state=42, n_jobs=1)
+            model.fit(df[predictor.feature_names], df["target"])
+            save_forest(model, predictor.feature_names, predictor.model_file, metadata={"pair": pair})
+
+            raw = predictor.store.read(columns=["date", "tid", "price", "amount"])
+            fitur = df[predictor.feature_names].iloc[-1].tolist()
+            bot = SimulationBotAI(api, pair, stop_loss_pct=0.002, take_profit_pct=0.002)
+            hasil["micro"] = {
+                "calculate_indicators": ukur(lambda: predictor.calculate_indicators(raw.copy()), jumlah // 10),
+                "predict_price": ukur(lambda: predictor.predict_price(*fitur), jumlah),
+                "latest_features": ukur(predictor.latest_features, jumlah),
+                "features_frame": ukur(predictor.features.frame, jumlah // 10),
+                "log_transaction": ukur(lambda: bot.collector.log_transaction("BENCH", fitur[0], 0.0001), jumlah)
+            }
+
+            api.reset()
+            METRICS.reset()
+            hasil["evaluate_entry"] = ukur(bot.evaluate_entry, jumlah // 10)
+            hasil["stages"] = {k: v for k, v in METRICS.summary().get("stage_seconds", {}).items()}
+
+            # Sesi live tersimulasi: posisi dibuka dari harga replay dan ditutup di TP/SL
+            api.reset()
+            harga = api.get_price(pair)
+            entry = (harga, bot.modal / harga, harga * (1 - bot.stop_loss_pct), harga * (1 + bot.take_profit_pct))
+            engine = MarketEngine(api, [pair], interval=0)
+            mulai = time.perf_counter()
+            closed = asyncio.run(engine.run(entry_fn=lambda p: entry))
+            durasi = time.perf_counter() - mulai
+            ticks = engine.latency_stats()[pair]["count"]
+            hasil["live_session"] = {"wall_s": round(durasi, 4), "ticks": ticks,
+                                     "ticks_per_s": round(ticks / durasi, 1), "status": closed[0].status,
+                                     "tick_latency": engine.latency_stats()[pair]}
+
+            mulai = time.perf_counter()
+            report = Backtester(predictor, n_jobs=1).run()
+            hasil["backtest"] = {"wall_s": round(time.perf_counter() - mulai, 4), "trades": report["trades"],
+                                 "pnl": round(report["pnl"], 2)}
+            bot.collector.journal.close()
+            hasil["import"] = bench_importtime(ulang=3)
+        finally:
+            os.chdir(cwd)
+    return hasil
+
+
+def simpan_hasil(hasil, folder="bench_results"):
+    """Menyimpan hasil beserta commit git supaya bisa dibandingkan antar commit"""
+    import platform
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = "unknown"
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, f"{commit}.json")
+    with open(path, "w") as f:
+        json.dump({"commit": commit, "created_at": int(time.time()), "python": platform.python_version(),
+                   "machine": platform.machine(), "results": hasil}, f, indent=2)
+    return path
+
+
+def _ratakan(data, prefix=""):
+    """{'micro': {'predict_price': {'p50_ms': 1}}} -> {'micro.predict_price.p50_ms': 1}"""
+    hasil = {}
+    for key, value in data.items():
+        nama = f"{prefix}{key}"
+        if isinstance(value, dict):
+            hasil.update(_ratakan(value, nama + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            hasil[nama] = value
+    return hasil
+
+
+def bandingkan(lama_file, baru_file, ambang=0.10):
+    """Membandingkan dua file hasil; metrik waktu yang naik lebih dari ambang ditandai regresi"""
+    with open(lama_file) as f:
+        lama = json.load(f)
+    with open(baru_file) as f:
+        baru = json.load(f)
+    a, b = _ratakan(lama["results"]), _ratakan(baru["results"])
+    print(f"{'metrik':55} {lama['commit']:>10} {baru['commit']:>10}  rasio")
+    regresi = []
+    for nama in sorted(set(a) & set(b)):
+        # Hanya metrik durasi (makin kecil makin baik); throughput *_per_s dilewati
+        if nama.endswith("_per_s") or not (nama.endswith("_ms") or nama.endswith("_s")):
+            continue
+        rasio = b[nama] / a[nama] if a[nama] else float("inf")
+        tanda = ""
+        if rasio > 1 + ambang:
+            tanda = "  ⚠️ regresi"
+            regresi.append(nama)
+        print(f"{nama:55} {a[nama]:>10} {b[nama]:>10}  {rasio:.2f}{tanda}")
+    return regresi
+
+
+if __name__ == "__main__":
+    perintah = sys.argv[1] if len(sys.argv) > 1 else "tick"
+    if perintah == "tick":
+        for nama, hasil in bench_tick().items():
+            print(f"{nama}: p50={hasil['p50_ms']} ms | p99={hasil['p99_ms']} ms")
+    elif perintah == "quote":
+        print(json.dumps(bench_quote(), indent=2))
+    elif perintah == "journal":
+        print(json.dumps(bench_journal(), indent=2))
+    elif perintah == "predict":
+        for nama, hasil in bench_predict().items():
+            print(f"{nama}: p50={hasil['p50_ms']} ms | p99={hasil['p99_ms']} ms")
+    elif perintah == "artifact":
+        print(json.dumps(bench_artifact(), indent=2))
+    elif perintah == "bars":
+        print(json.dumps(bench_bars(), indent=2))
+    elif perintah == "triggers":
+        print(json.dumps(bench_triggers(), indent=2))
+    elif perintah == "orders":
+        print(json.dumps(bench_orders(), indent=2))
+    elif perintah == "online":
+        print(json.dumps(bench_online(), indent=2))
+    elif perintah == "online-session":
+        hasil = bench_online_session()
+        print(json.dumps(hasil, indent=2))
+        assert hasil["trees_fitted"] > 0, "forest online tidak belajar selama sesi bot"
+        print("✅ Forest online belajar dari tick selama sesi bot")
+    elif perintah == "importtime":
+        print(json.dumps(bench_importtime(), indent=2))
+    elif perintah == "scan":
+        jumlah = int(sys.argv[2]) if len(sys.argv) > 2 else 150
+        print(json.dumps(bench_scan(jumlah), indent=2))
+    elif perintah == "suite":
+        # python benchmark.py suite [fixture.jsonl]
+        hasil = bench_suite(sys.argv[2] if len(sys.argv) > 2 else None)
+        print(json.dumps(hasil, indent=2))
+        print(f"📊 Hasil disimpan di {simpan_hasil(hasil)}")
+    elif perintah == "compare":
+        # python benchmark.py compare bench_results/<lama>.json bench_results/<baru>.json
+        sys.exit(1 if bandingkan(sys.argv[2], sys.argv[3]) else 0)
+    elif perintah == "store":
+        jumlah = int(sys.argv[2]) if len(sys.argv) > 2 else 10_000_000
+        print(json.dumps(bench_history_store(jumlah), indent=2))
@@ -1,146 +1,166 @@
-import time
+import asyncio
+import math
 from datetime import datetime
 import joblib
 import os
-import logging
 from api_utils import IndodaxAPI
-from analysis import TechnicalAnalysis
+from analysis import entry_signal
 from ai_model import PricePredictor
+from feature_pipeline import FEATURE_NAMES
 from data_collector import DataCollector
+from market_engine import MarketEngine
+from order_engine import OrderEngine
+from retrainer import get_scheduler
+from log_config import get_logger, setup_logging
+from metrics import timer
 
-# Konfigurasi Logging
-logging.basicConfig(filename='ai_trading_log.log', level=logging.INFO,
-                    format='%(asctime)s - %(levelname)s - %(message)s')
+log = get_logger("trading")
 
 class TradingBotAI:
-    def __init__(self, api, pair="btcidr", modal=20000, stop_loss_pct=0.007, take_profit_pct=0.001):
+    def __init__(self, api, pair="btcidr", modal=20000, stop_loss_pct=0.007, take_profit_pct=0.001, rsi_low=40, rsi_high=50,
+                 orders=None, fill_timeout=120, online=False):
         self.api = api
         self.pair = pair
         self.modal = modal
         self.stop_loss_pct = stop_loss_pct
         self.take_profit_pct = take_profit_pct
+        self.rsi_low = rsi_low
+        self.rsi_high = rsi_high
         self.riwayat_harga = []
         self.status = "Menunggu"
-        self.analysis = TechnicalAnalysis(api, pair)
-        self.model = PricePredictor(api, pair)
+        self.model = PricePredictor(api, pair, online=online)
         self.collector = DataCollector(api, pair)
-        
-    def get_historical_features(self):
-        """Mengambil data historis untuk price_change_3d, price_change_7d, dan price_change_30d"""
-        df = self.collector.get_historical_data()
-        if df is None or len(df) < 30:
-            print("[⚠️] Data historis tidak cukup. Menggunakan nilai default 0.")
-            return 0, 0, 0  # Jika tidak ada data, gunakan nilai default
-
-        df = df.sort_values(by=['date']).reset_index(drop=True)
-        price_change_3d = df['price'].pct_change(periods=3).iloc[-1]
-        price_change_7d = df['price'].pct_change(periods=7).iloc[-1]
-        price_change_30d = df['price'].pct_change(periods=30).iloc[-1]
-
-        return price_change_3d, price_change_7d, price_change_30d
-
-    def collect_and_train_data(self):
-        print("Mengumpulkan data historis dan melatih model AI...")
-        self.collector.log_transaction("DATA_COLLECTION", 0, 0)
-        self.model.train_model()
-        print("Model AI telah diperbarui dengan data terbaru.")
-        logging.info(f"Data dan model AI untuk {self.pair} diperbarui.")
+        # OrderEngine bisa dipakai bersama banyak bot; dijalankan di event loop execute_trade/run_multi_pair
+        self.orders = orders or OrderEngine(api)
+        self.fill_timeout = fill_timeout
+
+    def collect_and_train_data(self, reason="model belum tersedia"):
+        print("Mengumpulkan data historis dan melatih model AI di background...")
+        self.model.update_historical_data()
+        get_scheduler(self.pair).request(reason)
+        log.info("Data untuk %s diperbarui, pelatihan model berjalan di background.", self.pair, extra={"pair": self.pair})
 
     def ensure_model(self):
         if not self.model.is_model_trained():
             print("[⚠️] Model belum tersedia, melakukan pelatihan...")
-            logging.warning(f"Model untuk {self.pair} belum tersedia. Melakukan pelatihan...")
+            log.warning("Model untuk %s belum tersedia. Melakukan pelatihan...", self.pair, extra={"pair": self.pair})
             self.collect_and_train_data()
+        else:
+            get_scheduler(self.pair).maybe_retrain()
+
+    def evaluate_entry(self):
+        """Menganalisis pasar dan menentukan apakah posisi dibuka.
+
+        Order beli limit dikirim lewat OrderEngine dan posisi hanya dibuka
+        untuk jumlah yang benar-benar terisi, pada harga rata-rata fill.
+        Mengembalikan (harga_beli, jumlah_crypto, stop_loss, take_profit) atau None.
+        """
+        with timer("stage_seconds", stage="ensure_model", pair=self.pair):
+            self.ensure_model()
+
+        # Fitur live dibaca dari cache fitur yang sama dengan data latih model
+        with timer("stage_seconds", stage="features", pair=self.pair):
+            fitur = self.model.latest_features()
+        if fitur is None or any(math.isnan(v) for v in fitur.values()):
+            print("[❌] Data historis belum cukup untuk menghitung fitur. Tidak melakukan trading.")
+            return None
+        harga_beli = fitur['price']
+        rsi = fitur['RSI']
+        sma = fitur['SMA']
+        bb_upper = fitur['BB_Upper']
+        bb_lower = fitur['BB_Lower']
 
-    def execute_trade(self):
-        self.ensure_model()
-
-        analysis = self.analysis.analyze()
-        harga_beli = analysis['price']
-        rsi = analysis['RSI']
-        sma = analysis['SMA']
-        bb_upper = analysis['BB_Upper']
-        bb_lower = analysis['BB_Lower']
-
-        price_change_3d, price_change_7d, price_change_30d = self.get_historical_features()
-        
         jumlah_crypto = self.modal / harga_beli
-        prediksi_harga = self.model.predict_price(harga_beli, rsi, sma, bb_upper, bb_lower, price_change_3d, price_change_7d, price_change_30d)
-        stop_loss = harga_beli * (1 - self.stop_loss_pct)
-        take_profit = harga_beli * (1 + self.take_profit_pct)
+        with timer("stage_seconds", stage="predict", pair=self.pair):
+            prediksi_harga = self.model.predict_price(*(fitur[name] for name in FEATURE_NAMES))
 
-        logging.info(f"Prediksi AI untuk {self.pair}: {prediksi_harga} | Harga Saat Ini: {harga_beli} | RSI: {rsi} | SMA: {sma} | BB Upper: {bb_upper} | BB Lower: {bb_lower}")
+        log.info("Prediksi AI untuk %s: %s | Harga Saat Ini: %s | RSI: %s | SMA: %s | BB Upper: %s | BB Lower: %s",
+                 self.pair, prediksi_harga, harga_beli, rsi, sma, bb_upper, bb_lower,
+                 extra={"pair": self.pair, "price": harga_beli})
 
         print(f"\nPrediksi AI: Harga akan menjadi {prediksi_harga}")
         print(f"RSI: {rsi} | SMA: {sma} | BB Upper: {bb_upper} | BB Lower: {bb_lower}")
         if prediksi_harga is None:
             print("[❌] Gagal memprediksi harga. Tidak melakukan trading.")
-            logging.error(f"Gagal memprediksi harga untuk {self.pair}. Tidak melakukan trading.")
-            return
-        elif prediksi_harga < harga_beli and rsi < 40:  # RSI rendah, tren turun
+            log.error("Gagal memprediksi harga untuk %s. Tidak melakukan trading.", self.pair, extra={"pair": self.pair})
+            return None
+        sinyal = entry_signal(prediksi_harga, harga_beli, rsi, sma, self.rsi_low, self.rsi_high)
+        if sinyal == -1:  # RSI rendah, tren turun
             print("[❌] AI memprediksi harga akan turun. Tidak melakukan pembelian.")
-            logging.info(f"AI memprediksi harga akan turun untuk {self.pair}. Tidak melakukan pembelian.")
-            return
-        elif prediksi_harga > harga_beli and rsi > 50 and sma > harga_beli:  # Tren naik, AI lebih agresif
+            log.info("AI memprediksi harga akan turun untuk %s. Tidak melakukan pembelian.", self.pair, extra={"pair": self.pair})
+            return None
+        elif sinyal == 1:  # Tren naik, AI lebih agresif
             print("[✅] AI memprediksi harga akan naik dengan tren positif. Melanjutkan eksekusi trading.")
-            logging.info(f"AI memprediksi harga akan naik untuk {self.pair}. Melanjutkan eksekusi trading.")
+            log.info("AI memprediksi harga akan naik untuk %s. Melanjutkan eksekusi trading.", self.pair, extra={"pair": self.pair})
 
+        order = self.place_order("buy", harga_beli, jumlah_crypto)
+        if order.filled <= 0:
+            print(f"[❌] Order beli tidak terisi ({order.status}). Tidak membuka posisi.")
+            return None
+        harga_beli, jumlah_crypto = order.avg_price, order.filled
+        stop_loss = harga_beli * (1 - self.stop_loss_pct)
+        take_profit = harga_beli * (1 + self.take_profit_pct)
 
         print(f"Harga Beli: {harga_beli}")
         print(f"Stop Loss: {stop_loss}")
         print(f"Take Profit: {take_profit}")
 
         self.collector.log_transaction("BUY", harga_beli, jumlah_crypto)
+        return harga_beli, jumlah_crypto, stop_loss, take_profit
+
+    def place_order(self, side, harga, jumlah_crypto):
+        """Mengirim order limit lewat OrderEngine dan menunggu sampai selesai (blocking).
+
+        Jika belum selesai dalam fill_timeout detik, sisa order dibatalkan
+        dan bagian yang sudah terisi tetap dipakai.
+        """
+        with timer("stage_seconds", stage="order_submit", pair=self.pair):
+            order = self.orders.submit(self.pair, side, harga, jumlah_crypto)
+        if not order.wait(self.fill_timeout):
+            log.warning("Order %s %s belum terisi setelah %ss, dibatalkan", side, self.pair, self.fill_timeout,
+                        extra={"pair": self.pair, "price": harga})
+            self.orders.cancel_sync(order)
+        return order
 
-        while True:
-            harga_sekarang = self.api.get_ticker(self.pair)['price'].iloc[-1]
+    def execute_trade(self):
+        def on_tick(position, harga_sekarang):
+            self.model.observe_price(harga_sekarang)
             self.riwayat_harga.append((datetime.now(), harga_sekarang))
-            logging.info(f"Harga Sekarang: {harga_sekarang} | Stop Loss: {stop_loss} | Take Profit: {take_profit}")
-            print(f"\n[EKSEKUSI] Waktu: {datetime.now().strftime('%H:%M:%S')} | Harga Sekarang: {harga_sekarang}")
+            # Tick dicatat oleh MarketEngine lewat logger "tick" (bisa disampling), tidak di-print
 
-            if harga_sekarang >= take_profit:
-                self.status = "✅ Take Profit Tercapai"
+        def on_close(position, harga_sekarang):
+            self.status = position.status
+            if harga_sekarang >= position.take_profit:
                 print(f"[✅] Take Profit Tercapai pada harga {harga_sekarang}! Menjual aset...")
-                logging.info(f"Take Profit tercapai untuk {self.pair} pada harga {harga_sekarang}. Menjual aset...")
-                self.sell_trade(harga_sekarang, jumlah_crypto)
-                break
-            elif harga_sekarang <= stop_loss:
-                self.status = "❌ Stop Loss Terpenuhi"
-                print(f"[❌] Stop Loss Terpenuhi pada harga {harga_sekarang}! Menjual aset...")
-                logging.info(f"Stop Loss tercapai untuk {self.pair} pada harga {harga_sekarang}. Menjual aset...")
-                self.sell_trade(harga_sekarang, jumlah_crypto)
-                break
             else:
-                print("[⏳] Harga belum mencapai Take Profit atau Stop Loss...")
-                logging.info(f"Harga belum mencapai Take Profit atau Stop Loss untuk {self.pair}. Menunggu...")
-            time.sleep(2)
+                print(f"[❌] Stop Loss Terpenuhi pada harga {harga_sekarang}! Menjual aset...")
+            self.sell_trade(harga_sekarang, position.jumlah_crypto)
+
+        async def jalankan():
+            async with self.orders:
+                engine = MarketEngine(self.api, [self.pair], interval=2)
+                await engine.run(entry_fn=lambda pair: self.evaluate_entry(), on_close=on_close, on_tick=on_tick)
+
+        asyncio.run(jalankan())
 
     def sell_trade(self, harga_jual, jumlah_crypto):
         """Fungsi untuk menjual aset dan mengembalikan saldo ke dompet pengguna"""
         print(f"[SELL] Menjual {jumlah_crypto} unit {self.pair} pada harga {harga_jual}...")
-        order_payload = {
-            "method": "trade",
-            "pair": self.pair,
-            "type": "sell",
-            "price": harga_jual,
-            "btc": jumlah_crypto,
-            "timestamp": int(time.time() * 1000)
-        }
-        headers = {
-            "Key": self.api.api_key,
-            "Sign": self.api.generate_signature(order_payload)
-        }
-        response = self.api.send_request(order_payload, headers)
-        result = response.json()
-
-        if result["success"] == 1:
-            print("[✅] Order jual berhasil! Saldo telah diperbarui.")
-            logging.info(f"Order jual berhasil pada harga {harga_jual}. Saldo diperbarui.")
-        else:
-            print("[❌] Order jual gagal! Periksa saldo dan API.")
-            logging.error(f"Order jual gagal pada harga {harga_jual}. Respon: {result}")
+        order = self.place_order("sell", harga_jual, jumlah_crypto)
+
+        if order.filled > 0:
+            print(f"[✅] Order jual terisi {order.filled} pada harga rata-rata {order.avg_price} ({order.status}).")
+            log.info("Order jual terisi %s pada harga %s.", order.filled, order.avg_price,
+                     extra={"pair": self.pair, "price": order.avg_price, "status": order.status})
+            self.collector.log_transaction("SELL", order.avg_price, order.filled)
+        if order.status != "filled":
+            print("[❌] Order jual tidak terisi penuh! Periksa saldo dan API.")
+            log.error("Order jual %s pada harga %s: %s", order.status, harga_jual, order.error,
+                      extra={"pair": self.pair, "price": harga_jual, "status": order.status})
+        return order
 
 if __name__ == "__main__":
+    setup_logging("ai_trading.log")
     api = IndodaxAPI()
     bot = TradingBotAI(api)
     bot.execute_trade()
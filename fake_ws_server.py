@@ -0,0 +1,80 @@
+import asyncio
+import json
+import random
+import time
+import websockets
+
+
+class FakeIndodaxWS:
+    """Server WebSocket lokal yang meniru channel trade Indodax untuk pengujian offline.
+
+    drop_every > 0 melewati satu offset setiap sekian pesan (mensimulasikan
+    gap), disconnect_after > 0 memutus koneksi setelah sekian pesan.
+    """
+    def __init__(self, pairs=("btcidr",), interval=0.05, harga=1585000000.0, drop_every=0, disconnect_after=0, seed=42):
+        self.pairs = list(pairs)
+        self.interval = interval
+        self.harga = {pair: harga for pair in self.pairs}
+        self.drop_every = drop_every
+        self.disconnect_after = disconnect_after
+        self.rng = random.Random(seed)
+        self.offset = {pair: 0 for pair in self.pairs}
+        self.tid = {pair: 1000 for pair in self.pairs}
+        self.sent = 0
+
+    def next_trade(self, pair):
+        self.harga[pair] *= 1 + self.rng.gauss(0, 0.0005)
+        self.tid[pair] += 1
+        self.offset[pair] += 1
+        if self.drop_every and self.offset[pair] % self.drop_every == 0:
+            # Trade tetap terjadi tetapi pesannya hilang
+            self.harga[pair] *= 1 + self.rng.gauss(0, 0.0005)
+            self.tid[pair] += 1
+            self.offset[pair] += 1
+        harga = round(self.harga[pair])
+        volume = self.rng.uniform(0.0001, 0.05)
+        return {"result": {"channel": f"market:trade-activity-{pair}", "data": {
+            "data": {"pair": pair, "data": [[pair, int(time.time()), self.tid[pair], self.rng.choice(["buy", "sell"]),
+                                             harga, str(round(harga * volume)), f"{volume:.8f}"]]},
+            "offset": self.offset[pair]}}}
+
+    async def handler(self, ws):
+        await ws.recv()
+        await ws.send(json.dumps({"id": 1, "result": {"client": "fake", "version": "3.0.0"}}))
+        subscribed = set()
+        async def pushes():
+            while True:
+                for pair in list(subscribed):
+                    await ws.send(json.dumps(self.next_trade(pair)))
+                    self.sent += 1
+                    if self.disconnect_after and self.sent % self.disconnect_after == 0:
+                        await ws.close()
+                        return
+                await asyncio.sleep(self.interval)
+        task = asyncio.create_task(pushes())
+        try:
+            async for message in ws:
+                request = json.loads(message)
+                channel = request.get("params", {}).get("channel", "")
+                if channel.startswith("market:trade-activity-"):
+                    subscribed.add(channel[len("market:trade-activity-"):])
+                await ws.send(json.dumps({"id": request.get("id"), "result": {}}))
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            task.cancel()
+
+    async def start(self, host="127.0.0.1", port=0):
+        """Menjalankan server, mengembalikan (server, url)"""
+        server = await websockets.serve(self.handler, host, port)
+        port = next(iter(server.sockets)).getsockname()[1]
+        return server, f"ws://{host}:{port}/ws/"
+
+
+if __name__ == "__main__":
+    async def main():
+        server, url = await FakeIndodaxWS(interval=1).start(port=8765)
+        print(f"Fake WebSocket Indodax berjalan di {url}")
+        await server.wait_closed()
+
+    asyncio.run(main())
@@ -0,0 +1,188 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+import ta  # Library untuk perhitungan indikator teknikal
+
+# Naikkan setiap kali definisi fitur berubah; cache versi lama otomatis diabaikan
+FEATURE_VERSION = 1
+FEATURE_NAMES = ["price", "RSI", "SMA", "BB_Upper", "BB_Lower", "price_change_3d", "price_change_7d", "price_change_30d"]
+INDICATOR_COLUMNS = FEATURE_NAMES[1:]
+# Jumlah baris ekor yang dihitung ulang agar RSI (Wilder) dan pct_change 30 tetap akurat
+FEATURE_WARMUP = 500
+
+
+def compute_features(price):
+    """Satu-satunya definisi fitur model: dari deret harga ke DataFrame FEATURE_NAMES"""
+    price = pd.Series(price, dtype="float64").reset_index(drop=True)
+    bb = ta.volatility.BollingerBands(price, window=20)
+    return pd.DataFrame({
+        "price": price,
+        "RSI": ta.momentum.RSIIndicator(price, window=14).rsi(),
+        "SMA": ta.trend.SMAIndicator(price, window=20).sma_indicator(),
+        "BB_Upper": bb.bollinger_hband(),
+        "BB_Lower": bb.bollinger_lband(),
+        "price_change_3d": price.pct_change(periods=3),
+        "price_change_7d": price.pct_change(periods=7),
+        "price_change_30d": price.pct_change(periods=30)
+    })
+
+
+def compute_features_wide(prices):
+    """compute_features untuk banyak pair sekaligus.
+
+    prices berupa DataFrame (baris = waktu, kolom = pair); deret yang lebih
+    pendek diisi NaN di depan (rata kanan). Rumus sama persis dengan ta,
+    tetapi dihitung per kolom dalam satu operasi vektor. Mengembalikan
+    {nama fitur: DataFrame dengan bentuk yang sama seperti prices}.
+    """
+    prices = pd.DataFrame(prices, dtype="float64")
+    ada = prices.notna()
+    diff = prices.diff(1)
+    # ta mengisi diff pertama dengan 0; NaN di depan deret tetap NaN agar EMA mulai di titik yang sama
+    up = diff.where(diff > 0, 0.0).where(ada)
+    down = (-diff.where(diff < 0, 0.0)).where(ada)
+    emaup = up.ewm(alpha=1 / 14, min_periods=14, adjust=False).mean()
+    emadn = down.ewm(alpha=1 / 14, min_periods=14, adjust=False).mean()
+    rsi = (100 - 100 / (1 + emaup / emadn)).mask(emadn == 0, 100.0)
+    rolling = prices.rolling(20, min_periods=20)
+    sma = rolling.mean()
+    std = rolling.std(ddof=0)
+    return {
+        "price": prices,
+        "RSI": rsi,
+        "SMA": sma,
+        "BB_Upper": sma + 2 * std,
+        "BB_Lower": sma - 2 * std,
+        "price_change_3d": prices / prices.shift(3) - 1,
+        "price_change_7d": prices / prices.shift(7) - 1,
+        "price_change_30d": prices / prices.shift(30) - 1
+    }
+
+
+class FeaturePipeline:
+    """Matriks fitur per pair yang di-cache di samping HistoryStore.
+
+    Fitur disimpan sebagai matriks float64 baris-demi-baris di
+    `<store>/features_v<versi>.bin` dan hanya dihitung untuk baris store
+    yang belum ada di cache. Meta mencatat watermark (jumlah baris, tid
+    dan date baris terakhir); jika store tidak lagi cocok dengan watermark
+    itu, atau versi fitur berubah, cache dibangun ulang. Training,
+    backtest, dan prediksi live membaca dari cache yang sama. Penulisan
+    memakai kunci store pair dan membaca ulang meta di bawahnya, jadi
+    cache aman dipakai bersama beberapa proses.
+    """
+    def __init__(self, store, version=FEATURE_VERSION, names=FEATURE_NAMES, warmup=FEATURE_WARMUP):
+        self.store = store
+        self.version = version
+        self.names = list(names)
+        self.warmup = warmup
+        self.file = os.path.join(store.path, f"features_v{version}.bin")
+        self.meta_file = os.path.join(store.path, f"features_v{version}.json")
+        self.meta = self._read_meta()
+        self._matrix = None
+
+    def __len__(self):
+        return self.meta["rows"]
+
+    def _read_meta(self):
+        if os.path.exists(self.meta_file):
+            with open(self.meta_file) as f:
+                meta = json.load(f)
+            if meta.get("version") == self.version and meta.get("feature_names") == self.names:
+                return meta
+        return {"version": self.version, "feature_names": self.names, "rows": 0, "last_tid": None, "last_date": None}
+
+    def _write_meta(self):
+        tmp_file = f"{self.meta_file}.tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(self.meta, f)
+        os.replace(tmp_file, self.meta_file)
+
+    def _watermark_valid(self):
+        rows = self.meta["rows"]
+        if rows == 0:
+            return True
+        if rows > len(self.store):
+            return False
+        return (int(self.store.column("tid")[rows - 1]) == self.meta["last_tid"]
+                and int(self.store.column("date")[rows - 1]) == self.meta["last_date"])
+
+    def refresh(self):
+        """Menghitung fitur untuk baris store yang baru; mengembalikan jumlah baris yang dihitung"""
+        if self.meta["rows"] == len(self.store) and self._watermark_valid():
+            return 0
+        with self.store.lock():
+            # Proses lain mungkin sudah menghitung (sebagian) baris ini sejak meta terakhir dibaca
+            self.meta = self._read_meta()
+            return self._refresh_locked()
+
+    def _refresh_locked(self):
+        if not self._watermark_valid():
+            self.meta.update(rows=0, last_tid=None, last_date=None)
+        rows, total = self.meta["rows"], len(self.store)
+        if rows == total:
+            self._matrix = None
+            return 0
+        start = max(0, rows - self.warmup)
+        features = compute_features(self.store.column("price")[start:total])[self.names].to_numpy()[rows - start:]
+        row_bytes = len(self.names) * 8
+        with open(self.file, "ab") as f:
+            # Buang sisa append sebelumnya yang tidak sempat dicatat di meta
+            f.truncate(rows * row_bytes)
+            f.write(np.ascontiguousarray(features, dtype=np.float64).tobytes())
+        self.meta.update(rows=total, last_tid=int(self.store.column("tid")[total - 1]),
+                         last_date=int(self.store.column("date")[total - 1]))
+        self._write_meta()
+        self._matrix = None
+        return total - rows
+
+    @property
+    def matrix(self):
+        """Matriks fitur (baris x FEATURE_NAMES) sebagai memmap read-only"""
+        rows = self.meta["rows"]
+        if rows == 0:
+            return np.empty((0, len(self.names)))
+        if self._matrix is None or len(self._matrix) != rows:
+            self._matrix = np.memmap(self.file, dtype=np.float64, mode="r", shape=(rows, len(self.names)))
+        return self._matrix
+
+    def frame(self, start_date=None, end_date=None, dropna=True):
+        """Fitur beserta date dan tid untuk start_date <= date < end_date"""
+        self.refresh()
+        dates = self.store.column("date")[:len(self)]
+        start = 0 if start_date is None else int(np.searchsorted(dates, start_date, side="left"))
+        stop = len(self) if end_date is None else int(np.searchsorted(dates, end_date, side="left"))
+        df = pd.DataFrame(np.array(self.matrix[start:stop]), columns=self.names)
+        df.insert(0, "date", np.array(dates[start:stop]))
+        df.insert(1, "tid", np.array(self.store.column("tid")[start:stop]))
+        if dropna:
+            df = df.dropna(subset=self.names).reset_index(drop=True)
+        return df
+
+    def latest(self):
+        """Vektor fitur baris terakhir sebagai dict, atau None jika belum ada data"""
+        self.refresh()
+        if len(self) == 0:
+            return None
+        return dict(zip(self.names, self.matrix[-1].tolist()))
+
+
+if __name__ == "__main__":
+    # Membandingkan compute_features_wide (rata kanan, panjang berbeda) dengan compute_features per pair
+    rng = np.random.default_rng(0)
+    panjang = [300, 250, 120, 31, 10]
+    wide = pd.DataFrame(np.nan, index=range(max(panjang)), columns=[f"p{i}" for i in range(len(panjang))])
+    for kolom, n in zip(wide.columns, panjang):
+        harga = 1e6 * np.exp(np.cumsum(rng.normal(0, 1e-3, n)))
+        harga[n // 2:n // 2 + 20] = harga[n // 2]  # segmen datar: emadn == 0
+        wide.iloc[len(wide) - n:, wide.columns.get_loc(kolom)] = harga
+    hasil = compute_features_wide(wide)
+    for kolom, n in zip(wide.columns, panjang):
+        expected = compute_features(wide[kolom].dropna())
+        for name in FEATURE_NAMES:
+            actual = hasil[name][kolom].to_numpy()[len(wide) - n:]
+            assert (np.isnan(actual) == expected[name].isna().to_numpy()).all(), (kolom, name)
+            selisih = np.abs(actual - expected[name].to_numpy()) / np.maximum(np.abs(expected[name].to_numpy()), 1e-12)
+            assert np.nan_to_num(selisih).max() < 1e-9, (kolom, name, np.nanmax(selisih))
+    print("✅ compute_features_wide sesuai dengan compute_features")
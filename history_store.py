@@ -0,0 +1,207 @@
+import json
+import os
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # fcntl hanya ada di POSIX; tanpa itu append tidak dikunci antar-proses
+    fcntl = None
+
+DEFAULT_ROOT = "history"
+
+# Kolom trade mentah; fitur turunan disimpan terpisah oleh FeaturePipeline
+SCHEMA = {
+    "date": "int64",
+    "tid": "int64",
+    "price": "float64",
+    "amount": "float64"
+}
+
+
+class HistoryStore:
+    """Penyimpanan kolom bertipe per pair berbasis NumPy memmap.
+
+    Setiap kolom adalah file biner `<root>/<pair>/<kolom>.bin` yang hanya
+    ditambah di akhir. Jumlah baris yang valid dicatat di meta.json dan
+    diperbarui terakhir, sehingga append yang terputus tidak pernah terbaca.
+    Append dikunci dengan flock pada `<pair>/append.lock` dan membaca ulang
+    jumlah baris di bawah kunci itu, jadi beberapa instance atau proses
+    (mis. `main.py train` saat daemon berjalan) bisa menulis pair yang
+    sama; pembaca mengikuti meta.json setiap kali file itu berubah.
+    """
+    def __init__(self, pair, root=DEFAULT_ROOT, schema=None):
+        self.pair = pair
+        self.path = os.path.join(root, pair)
+        self.meta_file = os.path.join(self.path, "meta.json")
+        self.lock_file = os.path.join(self.path, "append.lock")
+        os.makedirs(self.path, exist_ok=True)
+        self.schema = dict(schema or SCHEMA)
+        self.rows = 0
+        self._meta_stat = None
+        self._cache = {}
+        with self.lock():
+            if os.path.exists(self.meta_file):
+                self.reload()
+            else:
+                self._write_meta()
+
+    def __len__(self):
+        return self.reload()
+
+    @contextmanager
+    def lock(self):
+        """Kunci eksklusif antar-proses untuk penulis pair ini (juga dipakai cache fitur dan bar)"""
+        with open(self.lock_file, "a") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            yield
+
+    def reload(self):
+        """Membaca ulang jumlah baris jika meta.json ditulis instance lain; mengembalikan jumlah baris"""
+        try:
+            st = os.stat(self.meta_file)
+        except FileNotFoundError:
+            return self.rows
+        versi = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if versi != self._meta_stat:
+            with open(self.meta_file) as f:
+                meta = json.load(f)
+            self.schema = meta["schema"]
+            self.rows = meta["rows"]
+            self._meta_stat = versi
+        return self.rows
+
+    def _write_meta(self):
+        tmp_file = f"{self.meta_file}.tmp"
+        with open(tmp_file, "w") as f:
+            json.dump({"schema": self.schema, "rows": self.rows}, f)
+        os.replace(tmp_file, self.meta_file)
+        st = os.stat(self.meta_file)
+        self._meta_stat = (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _column_file(self, name):
+        return os.path.join(self.path, f"{name}.bin")
+
+    def column(self, name):
+        """Kolom sebagai memmap read-only sepanjang jumlah baris yang valid"""
+        dtype = np.dtype(self.schema[name])
+        if self.rows == 0:
+            return np.empty(0, dtype=dtype)
+        cached = self._cache.get(name)
+        if cached is None or len(cached) != self.rows:
+            cached = np.memmap(self._column_file(name), dtype=dtype, mode="r", shape=(self.rows,))
+            self._cache[name] = cached
+        return cached
+
+    def append(self, df, key=None):
+        """Menambahkan baris baru; kolom yang tidak ada diisi NaN (atau -1 untuk integer).
+
+        key menamai kolom yang naik monoton (mis. "tid"): baris dengan nilai
+        <= baris terakhir yang sudah tersimpan dibuang, supaya dua penulis
+        yang menarik trade yang sama tidak menggandakannya. Mengembalikan
+        jumlah baris yang ditambahkan.
+        """
+        if df is None or len(df) == 0:
+            return 0
+        with self.lock():
+            # Baris yang di-commit penulis lain sejak instance ini terakhir membaca meta
+            self.reload()
+            if key is not None and self.rows > 0:
+                terakhir = self.column(key)[-1].item()
+                if terakhir >= 0:
+                    df = df[df[key] > terakhir]
+                    if len(df) == 0:
+                        return 0
+            self._append(df)
+        return len(df)
+
+    def _append(self, df):
+        for name, dtype in self.schema.items():
+            dtype = np.dtype(dtype)
+            if name in df.columns:
+                values = df[name].to_numpy()
+                if dtype.kind == "i":
+                    values = np.nan_to_num(values.astype("float64"), nan=-1) if values.dtype.kind == "f" else values
+            else:
+                values = np.full(len(df), -1 if dtype.kind == "i" else np.nan)
+            values = np.ascontiguousarray(values, dtype=dtype)
+            with open(self._column_file(name), "ab") as f:
+                # Buang sisa append sebelumnya yang tidak sempat dicatat di meta
+                f.truncate(self.rows * dtype.itemsize)
+                f.write(values.tobytes())
+        self.rows += len(df)
+        self._cache.clear()
+        self._write_meta()
+
+    def _frame(self, start, stop, columns):
+        columns = columns or list(self.schema)
+        return pd.DataFrame({name: np.array(self.column(name)[start:stop]) for name in columns}, copy=False)
+
+    def read(self, start_date=None, end_date=None, columns=None):
+        """Membaca baris dengan start_date <= date < end_date (detik epoch)"""
+        rows = self.reload()
+        dates = self.column("date")
+        start = 0 if start_date is None else int(np.searchsorted(dates, start_date, side="left"))
+        stop = rows if end_date is None else int(np.searchsorted(dates, end_date, side="left"))
+        return self._frame(start, stop, columns)
+
+    def tail(self, n, columns=None):
+        rows = self.reload()
+        return self._frame(max(0, rows - n), rows, columns)
+
+    def last(self):
+        """Baris terakhir sebagai dict, atau None jika store kosong"""
+        if self.reload() == 0:
+            return None
+        return {name: self.column(name)[-1].item() for name in self.schema}
+
+
+def migrate_csv(csv_file, pair, root=DEFAULT_ROOT, chunksize=1_000_000):
+    """Memindahkan historical_data_{pair}.csv ke HistoryStore.
+
+    Baris transaksi yang dulu ikut tertulis ke CSV oleh DataCollector
+    (harga/tanggal tidak numerik) dibuang. Kolom indikator lama tidak
+    dipindahkan; fitur dihitung ulang oleh FeaturePipeline.
+    """
+    store = HistoryStore(pair, root)
+    if len(store) > 0:
+        print(f"[⚠️] Store {pair} sudah berisi {len(store)} baris, migrasi dilewati.")
+        return store
+
+    frames = []
+    for chunk in pd.read_csv(csv_file, chunksize=chunksize, low_memory=False, on_bad_lines="skip"):
+        if "date" not in chunk.columns or "price" not in chunk.columns:
+            continue
+        for name in ("date", "price", "tid", "amount"):
+            if name in chunk.columns:
+                chunk[name] = pd.to_numeric(chunk[name], errors="coerce")
+        frames.append(chunk.dropna(subset=["date", "price"]))
+    if not frames:
+        print(f"[⚠️] {csv_file} tidak berisi data harga, migrasi dilewati.")
+        return store
+    df = pd.concat(frames).sort_values(by=["date"], kind="stable").reset_index(drop=True)
+    if "tid" in df.columns:
+        df = df[~(df["tid"].notna() & df.duplicated(subset=["tid"], keep="last"))]
+
+    df = df[[c for c in ("date", "tid", "price", "amount") if c in df.columns]].reset_index(drop=True)
+    store.append(df)
+    print(f"✅ {len(df)} baris dari {csv_file} dimigrasikan ke {store.path}")
+    return store
+
+
+def open_store(pair, root=DEFAULT_ROOT):
+    """Membuka store pair, memigrasikan CSV lama secara otomatis bila store masih kosong"""
+    store = HistoryStore(pair, root)
+    csv_file = f"historical_data_{pair}.csv"
+    if len(store) == 0 and os.path.exists(csv_file):
+        store = migrate_csv(csv_file, pair, root)
+    return store
+
+
+if __name__ == "__main__":
+    import sys
+
+    for pair in sys.argv[1:] or ["btcidr"]:
+        migrate_csv(f"historical_data_{pair}.csv", pair)
@@ -0,0 +1,146 @@
+import math
+from collections import deque
+
+
+class IndicatorState:
+    """Indikator teknikal inkremental per pair dengan biaya O(1) per trade.
+
+    Hasilnya sama dengan library `ta` yang dipakai di PricePredictor:
+    RSI Wilder (ewm alpha=1/window, adjust=False), SMA dan Bollinger Bands
+    (std ddof=0) dari jumlah dan jumlah kuadrat bergulir, serta pct_change
+    dari ring buffer harga.
+    """
+    def __init__(self, rsi_window=14, sma_window=20, bb_dev=2, change_periods=(3, 7, 30)):
+        self.rsi_window = rsi_window
+        self.sma_window = sma_window
+        self.bb_dev = bb_dev
+        self.change_periods = change_periods
+        self.alpha = 1 / rsi_window
+        self.count = 0
+        self.last_price = None
+        self.avg_gain = 0.0
+        self.avg_loss = 0.0
+        self.window = deque(maxlen=sma_window)
+        self.history = deque(maxlen=max(change_periods) + 1)
+        # Jumlah dihitung terhadap titik acuan agar varians harga besar
+        # (mis. 1.5e9 IDR) tidak kehilangan presisi
+        self.shift = None
+        self.sum = 0.0
+        self.sum_sq = 0.0
+        self.updates_since_resync = 0
+
+    def update(self, price):
+        price = float(price)
+        if self.last_price is None:
+            gain = loss = 0.0
+            self.shift = price
+        else:
+            diff = price - self.last_price
+            gain = diff if diff > 0 else 0.0
+            loss = -diff if diff < 0 else 0.0
+        if self.count == 0:
+            self.avg_gain, self.avg_loss = gain, loss
+        else:
+            self.avg_gain += self.alpha * (gain - self.avg_gain)
+            self.avg_loss += self.alpha * (loss - self.avg_loss)
+
+        if len(self.window) == self.sma_window:
+            keluar = self.window[0] - self.shift
+            self.sum -= keluar
+            self.sum_sq -= keluar * keluar
+        self.window.append(price)
+        masuk = price - self.shift
+        self.sum += masuk
+        self.sum_sq += masuk * masuk
+
+        self.updates_since_resync += 1
+        if self.updates_since_resync >= self.sma_window * 50:
+            self._resync()
+
+        self.history.append(price)
+        self.last_price = price
+        self.count += 1
+        return self
+
+    def update_many(self, prices):
+        for price in prices:
+            self.update(price)
+        return self
+
+    def _resync(self):
+        """Menghitung ulang jumlah bergulir secara eksak untuk membuang akumulasi galat"""
+        self.shift = sum(self.window) / len(self.window)
+        deviasi = [p - self.shift for p in self.window]
+        self.sum = sum(deviasi)
+        self.sum_sq = sum(d * d for d in deviasi)
+        self.updates_since_resync = 0
+
+    @property
+    def rsi(self):
+        if self.count < self.rsi_window:
+            return math.nan
+        if self.avg_loss == 0:
+            return 100.0
+        return 100 - 100 / (1 + self.avg_gain / self.avg_loss)
+
+    @property
+    def sma(self):
+        if len(self.window) < self.sma_window:
+            return math.nan
+        return self.shift + self.sum / self.sma_window
+
+    @property
+    def std(self):
+        if len(self.window) < self.sma_window:
+            return math.nan
+        mean = self.sum / self.sma_window
+        return math.sqrt(max(self.sum_sq / self.sma_window - mean * mean, 0.0))
+
+    def price_change(self, periods):
+        if len(self.history) <= periods:
+            return math.nan
+        return self.history[-1] / self.history[-1 - periods] - 1
+
+    def values(self):
+        """Vektor fitur terkini dengan nama kolom yang sama seperti calculate_indicators"""
+        sma = self.sma
+        std = self.std
+        hasil = {
+            "price": self.last_price,
+            "RSI": self.rsi,
+            "SMA": sma,
+            "BB_Upper": sma + self.bb_dev * std,
+            "BB_Lower": sma - self.bb_dev * std
+        }
+        for periods in self.change_periods:
+            hasil[f"price_change_{periods}d"] = self.price_change(periods)
+        return hasil
+
+
+if __name__ == "__main__":
+    # Membandingkan hasil streaming dengan library ta pada data acak
+    import numpy as np
+    import pandas as pd
+    import ta
+
+    rng = np.random.default_rng(0)
+    harga = pd.Series(1.5e9 * np.exp(np.cumsum(rng.normal(0, 1e-3, 20000))))
+    harga[5000:5040] = harga[5000]  # segmen datar: avg_loss == 0
+    expected = pd.DataFrame({
+        "RSI": ta.momentum.RSIIndicator(harga, window=14).rsi(),
+        "SMA": ta.trend.SMAIndicator(harga, window=20).sma_indicator()
+    })
+    bb = ta.volatility.BollingerBands(harga, window=20)
+    expected["BB_Upper"] = bb.bollinger_hband()
+    expected["BB_Lower"] = bb.bollinger_lband()
+    for periods in (3, 7, 30):
+        expected[f"price_change_{periods}d"] = harga.pct_change(periods=periods)
+
+    state = IndicatorState()
+    actual = pd.DataFrame([state.update(p).values() for p in harga])
+    for kolom in expected.columns:
+        selisih = np.abs(actual[kolom] - expected[kolom]) / np.maximum(np.abs(expected[kolom]), 1e-12)
+        assert (actual[kolom].isna() == expected[kolom].isna()).all(), kolom
+        print(f"{kolom}: selisih relatif maksimum {np.nanmax(selisih):.2e}")
+        assert np.nanmax(selisih) < 1e-6, kolom
+    print("✅ IndicatorState sesuai dengan library ta")
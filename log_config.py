@@ -0,0 +1,139 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+# Subsistem: trading, simulation, model, engine, stream, retrain, tick
+ROOT_LOGGER = "ai_bot"
+# Field tambahan (extra=...) yang ikut ditulis ke record JSON
+EXTRA_FIELDS = ["pair", "tick", "price", "latency_ms", "status", "reason"]
+
+_listener = None
+_lock = threading.Lock()
+
+
+def get_logger(subsystem):
+    """Logger per subsistem, mis. get_logger("trading") -> ai_bot.trading"""
+    return logging.getLogger(f"{ROOT_LOGGER}.{subsystem}")
+
+
+class JsonFormatter(logging.Formatter):
+    """Satu objek JSON per baris dengan field terstruktur pair/tick/latency"""
+    def format(self, record):
+        data = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage()
+        }
+        for field in EXTRA_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                data[field] = value
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data["exc"] = record.exc_text
+        return json.dumps(data, default=str, ensure_ascii=False)
+
+
+class FastQueueHandler(QueueHandler):
+    """QueueHandler tanpa copy/format penuh di thread pemanggil.
+
+    Pesan digabung dengan argumennya di sini (supaya objek yang berubah
+    belakangan tidak memengaruhi log), pemformatan JSON dilakukan listener.
+    """
+    def prepare(self, record):
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class SamplingFilter(logging.Filter):
+    """Meloloskan satu dari setiap `every` record per pair (untuk log tick)"""
+    def __init__(self, every=1):
+        super().__init__()
+        self.every = max(1, int(every))
+        self.counts = {}
+
+    def filter(self, record):
+        if self.every == 1:
+            return True
+        key = getattr(record, "pair", None)
+        count = self.counts.get(key, 0)
+        self.counts[key] = count + 1
+        return count % self.every == 0
+
+
+def parse_levels(spec):
+    """'tick=WARNING,model=DEBUG' -> {'tick': 'WARNING', 'model': 'DEBUG'}"""
+    levels = {}
+    for item in (spec or "").split(","):
+        if "=" in item:
+            name, level = item.split("=", 1)
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup_logging(filename="ai_bot.log", log_dir="logs", level=None, levels=None, json_format=True,
+                  max_bytes=10 * 1024 * 1024, backup_count=5, tick_sample=None, console=False):
+    """Mengonfigurasi logging terpusat untuk seluruh proses.
+
+    Semua logger hanya menaruh record ke antrean (QueueHandler); penulisan
+    ke file berotasi dilakukan oleh QueueListener di thread terpisah,
+    sehingga I/O disk tidak berada di jalur tick. Level per subsistem
+    bisa diatur lewat `levels` atau env LOG_LEVELS, dan log tick bisa
+    disampling lewat `tick_sample` atau env LOG_TICK_SAMPLE. Pemanggilan
+    berikutnya tidak mengubah konfigurasi yang sudah aktif.
+    """
+    global _listener
+    with _lock:
+        if _listener is not None:
+            return _listener
+        os.makedirs(log_dir, exist_ok=True)
+        file_handler = RotatingFileHandler(os.path.join(log_dir, filename), maxBytes=max_bytes,
+                                           backupCount=backup_count, encoding="utf-8")
+        file_handler.setFormatter(JsonFormatter() if json_format else
+                                  logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+        handlers = [file_handler]
+        if console:
+            stream_handler = logging.StreamHandler()
+            stream_handler.setFormatter(logging.Formatter('%(levelname)s - %(name)s - %(message)s'))
+            handlers.append(stream_handler)
+
+        log_queue = queue.SimpleQueue()
+        root = logging.getLogger()
+        root.addHandler(FastQueueHandler(log_queue))
+        root.setLevel(level or os.getenv("LOG_LEVEL", "INFO").upper())
+
+        for name, sub_level in {**parse_levels(os.getenv("LOG_LEVELS")), **(levels or {})}.items():
+            get_logger(name).setLevel(sub_level)
+        sample = tick_sample if tick_sample is not None else int(os.getenv("LOG_TICK_SAMPLE", "1"))
+        get_logger("tick").addFilter(SamplingFilter(sample))
+
+        _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+        return _listener
+
+
+def shutdown_logging():
+    """Menghentikan listener setelah semua record di antrean ditulis"""
+    global _listener
+    with _lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            if isinstance(handler, QueueHandler):
+                root.removeHandler(handler)
+        _listener = None
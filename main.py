@@ -1,37 +1,297 @@
-import requests
-import time
+import argparse
 import json
-import pandas as pd
-import ta
-from datetime import datetime
-from api_utils import IndodaxAPI
-from analysis import TechnicalAnalysis
-from simulation import SimulationBotAI
-from execute import TradingBotAI  # Tambahkan impor TradingBot
-
-api = IndodaxAPI()
-
-# Fungsi utama untuk menampilkan saldo dan kontrol trading
-def main():
-    saldo = api.get_balance()
+import signal
+import sys
+import time
+from log_config import get_logger, setup_logging
+from metrics import METRICS, profile_run
+
+# Modul berat (pandas, ta, scikit-learn, bot) hanya diimpor oleh subcommand
+# yang membutuhkannya, supaya `main.py --help` dan menu tetap cepat.
+
+log = get_logger("main")
+
+DAEMON_MODES = ("simulate", "trade", "backtest", "train", "scan")
+
+
+def create_api():
+    from api_utils import IndodaxAPI
+
+    return IndodaxAPI()
+
+
+def parse_pairs(values):
+    """['btcidr,ethidr', 'solidr'] -> ['btcidr', 'ethidr', 'solidr']"""
+    return [pair.strip() for value in values for pair in value.split(",") if pair.strip()]
+
+
+def cmd_simulate(args, api=None):
+    api = api or create_api()
+    pairs = parse_pairs(args.pairs)
+    if args.historical:
+        from simulation import SimulationBotAI
+
+        return [SimulationBotAI(api, pair).simulate_trade(mode="historical") for pair in pairs]
+    if len(pairs) == 1 and args.trail_pct is None:
+        from simulation import SimulationBotAI
+
+        return SimulationBotAI(api, pairs[0], online=args.online).simulate_trade()
+    from market_engine import run_multi_pair
+
+    return run_multi_pair(api, pairs, live=False, stream=args.stream, trail_pct=args.trail_pct, online=args.online)
+
+
+def cmd_trade(args, api=None):
+    api = api or create_api()
+    pairs = parse_pairs(args.pairs)
+    if len(pairs) == 1 and args.trail_pct is None:
+        from execute import TradingBotAI
+
+        return TradingBotAI(api, pairs[0], online=args.online).execute_trade()
+    from market_engine import run_multi_pair
+
+    return run_multi_pair(api, pairs, live=True, stream=args.stream, trail_pct=args.trail_pct, online=args.online)
+
+
+def cmd_backtest(args, api=None):
+    from ai_model import PricePredictor
+    from backtest import Backtester, print_report
+
+    api = api or create_api()
+    hasil = {}
+    for pair in parse_pairs(args.pairs):
+        report = Backtester(PricePredictor(api, pair), modal=args.modal, stop_loss_pct=args.stop_loss,
+                            take_profit_pct=args.take_profit, fee_pct=args.fee,
+                            slippage_pct=args.slippage).run()
+        if report is None:
+            print(f"[❌] Tidak ada data historis untuk {pair}.")
+            continue
+        print_report(report, pair)
+        hasil[pair] = report
+    return hasil
+
+
+def cmd_train(args, api=None):
+    from ai_model import PricePredictor
+
+    api = api or create_api()
+    for pair in parse_pairs(args.pairs):
+        print(f"🧠 Melatih model {pair}...")
+        predictor = PricePredictor(api, pair)
+        predictor.update_historical_data()
+        predictor.train_model()
+
+
+def cmd_scan(args, api=None):
+    from scanner import run_scanner
+
+    return run_scanner(api or create_api(), interval=args.interval, cycles=args.cycles, top_n=args.top,
+                       warmup_top=args.warmup_top)
+
+
+def cmd_balance(args, api=None):
+    saldo = (api or create_api()).get_balance()
     print(f"Saldo IDR: {saldo['idr']}" if saldo else "Gagal mengambil saldo!")
-    
+    return saldo
+
+
+_stopping = False
+
+
+def _stop(signum, frame):
+    # SIGTERM diperlakukan seperti Ctrl+C supaya posisi dan order ditutup dengan jalur yang sama.
+    # Flag dicatat karena sebagian mode (mis. scan) menangkap KeyboardInterrupt sendiri.
+    global _stopping
+    _stopping = True
+    raise KeyboardInterrupt
+
+
+def load_daemon_config(filename, parser):
+    """Membaca config JSON daemon menjadi Namespace subcommand.
+
+    Kunci config sama dengan nama opsi subcommand (mis. "trail_pct",
+    "warmup_top"); yang tidak diisi memakai default CLI. Kunci tambahan:
+    "mode" (wajib), "restart_delay" (detik antar-run, default 30),
+    dan "max_runs" (null = tanpa batas).
+    """
+    with open(filename) as f:
+        config = json.load(f)
+    mode = config.pop("mode", None)
+    if mode not in DAEMON_MODES:
+        raise ValueError(f"mode harus salah satu dari {', '.join(DAEMON_MODES)}, bukan {mode!r}")
+    args = parser.parse_args([mode])
+    daemon = {"restart_delay": config.pop("restart_delay", 30.0), "max_runs": config.pop("max_runs", None)}
+    if isinstance(config.get("pairs"), str):
+        config["pairs"] = [config["pairs"]]
+    tidak_dikenal = sorted(set(config) - set(vars(args)) | set(config) & {"command", "handler"})
+    if tidak_dikenal:
+        raise ValueError(f"Kunci config tidak dikenal untuk mode {mode}: {', '.join(tidak_dikenal)}")
+    vars(args).update(config)
+    return args, daemon
+
+
+def run_daemon(run_args, daemon):
+    """Menjalankan satu mode tanpa input(), diulang sampai dihentikan (SIGTERM/Ctrl+C) atau max_runs"""
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+    api = create_api()
+    run = 0
+    print(f"🤖 Daemon {run_args.command} dimulai")
+    try:
+        while not _stopping and (daemon["max_runs"] is None or run < daemon["max_runs"]):
+            run += 1
+            log.info("Daemon %s run ke-%d", run_args.command, run)
+            try:
+                run_args.handler(run_args, api)
+            except KeyboardInterrupt:
+                raise
+            except Exception as e:
+                log.exception("Daemon %s run ke-%d gagal: %s", run_args.command, run, e)
+            if not _stopping and (daemon["max_runs"] is None or run < daemon["max_runs"]):
+                time.sleep(daemon["restart_delay"])
+    except KeyboardInterrupt:
+        print(f"\n⏹️ Daemon {run_args.command} dihentikan")
+    finally:
+        api.close()
+
+
+def menu():
+    """Menu interaktif (tanpa subcommand); API dibuat saat opsi pertama dipilih"""
+    api = None
     while True:
         print("\n1. Simulasi Trading")
         print("2. Eksekusi Trading dengan Manajemen Risiko")
-        print("3. Keluar")
+        print("3. Simulasi Banyak Pair Sekaligus")
+        print("4. Scan Semua Pair")
+        print("5. Cek Saldo")
+        print("6. Keluar")
         pilihan = input("Pilih opsi: ")
-        
+
+        if pilihan == "6":
+            break
+        if pilihan not in ("1", "2", "3", "4", "5"):
+            print("Pilihan tidak valid!")
+            continue
+        api = api or create_api()
         if pilihan == "1":
-            bot = SimulationBotAI(api=api)
-            bot.simulate_trade()
+            from simulation import SimulationBotAI
+
+            SimulationBotAI(api=api).simulate_trade()
         elif pilihan == "2":
-            trading_bot = TradingBotAI(api=api)  # Buat instance TradingBot
-            trading_bot.execute_trade()  # Jalankan eksekusi trading
+            from execute import TradingBotAI
+
+            TradingBotAI(api=api).execute_trade()
         elif pilihan == "3":
-            break
+            pairs = parse_pairs([input("Daftar pair (pisahkan dengan koma, mis. btcidr,ethidr): ")])
+            if pairs:
+                from market_engine import run_multi_pair
+
+                run_multi_pair(api, pairs)
+        elif pilihan == "4":
+            from scanner import run_scanner
+
+            run_scanner(api)
+        elif pilihan == "5":
+            cmd_balance(None, api)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="AI trading bot Indodax",
+                                     epilog="Tanpa subcommand, menu interaktif dijalankan.")
+    parser.add_argument("--profile", nargs="?", const="profile.out", metavar="FILE",
+                        help="Jalankan di bawah cProfile dan simpan hasilnya (default: profile.out)")
+    parser.add_argument("--metrics-port", type=int, help="Sajikan metrik Prometheus di http://127.0.0.1:PORT/metrics")
+    parser.add_argument("--metrics-file", help="Tulis metrik Prometheus ke file secara berkala dan saat keluar")
+    parser.add_argument("--log-file", default="ai_bot.log", help="Nama file log di logs/ (default: ai_bot.log)")
+    parser.add_argument("--log-level", help="Level log root (default: env LOG_LEVEL atau INFO)")
+    sub = parser.add_subparsers(dest="command", metavar="COMMAND")
+
+    def pair_args(p):
+        p.add_argument("pairs", nargs="*", default=["btcidr"], metavar="PAIR",
+                       help="Pair, boleh dipisah koma (default: btcidr)")
+
+    def engine_args(p):
+        pair_args(p)
+        p.add_argument("--trail-pct", type=float, help="Trailing stop, mis. 0.01 untuk 1%%")
+        p.add_argument("--no-stream", dest="stream", action="store_false",
+                       help="Polling REST saja untuk banyak pair, tanpa WebSocket")
+        p.add_argument("--online", action="store_true",
+                       help="Model online: diperbarui dari fitur baru, refit penuh hanya saat drift")
+
+    p = sub.add_parser("simulate", help="Simulasi trading (live atau historis)")
+    engine_args(p)
+    p.add_argument("--historical", action="store_true", help="Simulasi di data historis (backtest cepat)")
+    p.set_defaults(handler=cmd_simulate)
+
+    p = sub.add_parser("trade", help="Eksekusi trading sungguhan dengan manajemen risiko")
+    engine_args(p)
+    p.set_defaults(handler=cmd_trade)
+
+    p = sub.add_parser("backtest", help="Backtest model di data historis")
+    pair_args(p)
+    p.add_argument("--modal", type=float, default=20000)
+    p.add_argument("--stop-loss", type=float, default=0.007)
+    p.add_argument("--take-profit", type=float, default=0.001)
+    p.add_argument("--fee", type=float, default=0.003)
+    p.add_argument("--slippage", type=float, default=0.0005)
+    p.set_defaults(handler=cmd_backtest)
+
+    p = sub.add_parser("train", help="Perbarui data historis dan latih ulang model")
+    pair_args(p)
+    p.set_defaults(handler=cmd_train)
+
+    p = sub.add_parser("scan", help="Scan dan ranking semua pair")
+    p.add_argument("--interval", type=float, default=2.0)
+    p.add_argument("--cycles", type=int, help="Jumlah siklus (default: tanpa batas)")
+    p.add_argument("--top", type=int, default=10)
+    p.add_argument("--warmup-top", type=int, default=0,
+                   help="Isi riwayat N pair dengan volume terbesar dari /api/trades")
+    p.set_defaults(handler=cmd_scan)
+
+    p = sub.add_parser("balance", help="Tampilkan saldo akun")
+    p.set_defaults(handler=cmd_balance)
+
+    p = sub.add_parser("daemon", help="Jalankan satu mode tanpa input() dari config JSON")
+    p.add_argument("--config", required=True, help="File config JSON (lihat daemon.example.json)")
+    p.set_defaults(handler=None)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    # .env dimuat sebelum logging dan stream membaca LOG_LEVEL, WS_URL, dst. (`--help` tidak memuatnya)
+    from api_utils import load_env
+
+    load_env()
+    setup_logging(args.log_file, level=args.log_level)
+    if args.metrics_port:
+        METRICS.serve(args.metrics_port)
+    if args.metrics_file:
+        METRICS.export_every(args.metrics_file)
+
+    if args.command is None:
+        run = menu
+    elif args.command == "daemon":
+        try:
+            run_args, daemon = load_daemon_config(args.config, parser)
+        except (OSError, ValueError) as e:
+            parser.error(f"config daemon {args.config}: {e}")
+        run = lambda: run_daemon(run_args, daemon)
+    else:
+        run = lambda: args.handler(args)
+    try:
+        if args.profile:
+            profile_run(run, args.profile)
+            print(json.dumps(METRICS.summary(), indent=2))
         else:
-            print("Pilihan tidak valid!")
+            run()
+    except KeyboardInterrupt:
+        print("\n⏹️ Dihentikan")
+    finally:
+        if args.metrics_file:
+            METRICS.write_prometheus(args.metrics_file)
+
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
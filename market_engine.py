@@ -0,0 +1,249 @@
+import asyncio
+import json
+import logging
+import time
+from collections import defaultdict, deque
+import numpy as np
+from market_stream import MarketStream
+from trigger_book import STOP, TARGET, TRAILING, TriggerBook
+from log_config import get_logger
+from metrics import METRICS, inc
+
+log = get_logger("engine")
+tick_log = get_logger("tick")
+
+
+class Position:
+    """Posisi terbuka yang menunggu Stop Loss, Take Profit, atau trailing stop"""
+    def __init__(self, pair, harga_beli, jumlah_crypto, stop_loss, take_profit, on_close=None, on_tick=None,
+                 trail_pct=None):
+        self.pair = pair
+        self.harga_beli = harga_beli
+        self.jumlah_crypto = jumlah_crypto
+        self.stop_loss = stop_loss
+        self.take_profit = take_profit
+        self.trail_pct = trail_pct
+        self.on_close = on_close
+        self.on_tick = on_tick
+        self.status = "Terbuka"
+        self.harga_jual = None
+        self.closed = None
+
+
+# Status penutupan per alasan trigger dari TriggerBook
+CLOSE_STATUS = {
+    TARGET: "✅ Take Profit Tercapai",
+    STOP: "❌ Stop Loss Terpenuhi",
+    TRAILING: "🔻 Trailing Stop Terpenuhi"
+}
+
+
+class MarketEngine:
+    """Memantau banyak pair sekaligus dalam satu event loop asyncio.
+
+    Satu coroutine polling per pair (atau MarketStream) berbagi satu
+    IndodaxAPI. Stop/target semua posisi terbuka disimpan di TriggerBook
+    per pair, jadi setiap tick hanya menyentuh trigger yang dilewati
+    harga, tanpa coroutine atau loop per posisi.
+    """
+    def __init__(self, api, pairs, interval=2, max_concurrency=10, latency_window=1000, stream=None, trail_pct=None):
+        self.api = api
+        self.pairs = list(pairs)
+        self.interval = interval
+        self.stream = stream
+        self.trail_pct = trail_pct
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.books = {}
+        self.tick_positions = defaultdict(set)
+        self.tick_count = defaultdict(int)
+        self.positions = set()
+        self.closed_positions = []
+        self.last_price = {}
+        self.latency = defaultdict(lambda: deque(maxlen=latency_window))
+        self.position_tasks = set()
+
+    async def fetch_price(self, pair):
+        # IndodaxAPI bersifat blocking, jadi dijalankan di thread pool
+        # dengan jumlah request paralel dibatasi sebesar connection pool
+        async with self.semaphore:
+            return await asyncio.to_thread(self.api.get_price, pair)
+
+    def book(self, pair):
+        if pair not in self.books:
+            self.books[pair] = TriggerBook(pair)
+        return self.books[pair]
+
+    def dispatch(self, pair, harga, date=None):
+        """Mengevaluasi tick terhadap trigger book pair dan menutup posisi yang terpicu"""
+        self.last_price[pair] = harga
+        book = self.books.get(pair)
+        pemantau = self.tick_positions.get(pair)
+        if not book and not pemantau:
+            return
+        mulai = time.perf_counter()
+        fired = book.on_price(harga) if book else ()
+        for position in list(pemantau or ()):
+            position.on_tick(position, harga)
+        for position, alasan in fired:
+            self.close_position(position, harga, CLOSE_STATUS[alasan])
+        latensi = time.perf_counter() - mulai
+        self.latency[pair].append(latensi)
+        METRICS.observe("tick_latency_seconds", latensi, pair=pair)
+        self.tick_count[pair] += 1
+        if tick_log.isEnabledFor(logging.INFO):
+            tick_log.info("tick", extra={"pair": pair, "tick": self.tick_count[pair], "price": harga,
+                                         "latency_ms": round(latensi * 1000, 4)})
+
+    async def poll_pair(self, pair):
+        while True:
+            try:
+                harga = await self.fetch_price(pair)
+            except Exception as e:
+                inc("price_fetch_errors_total", pair=pair)
+                log.error("Gagal mengambil harga %s: %s", pair, e, extra={"pair": pair})
+            else:
+                self.dispatch(pair, harga)
+            await asyncio.sleep(self.interval)
+
+    def start_feeds(self):
+        """Sumber tick: MarketStream (push) jika tersedia, selain itu polling per pair"""
+        if self.stream is not None:
+            self.stream.add_listener(self.dispatch)
+            return [asyncio.create_task(self.stream.run())]
+        return [asyncio.create_task(self.poll_pair(pair)) for pair in self.pairs]
+
+    def open_position(self, pair, harga_beli, jumlah_crypto, stop_loss, take_profit, on_close=None, on_tick=None,
+                      trail_pct=None):
+        """Membuka posisi dan mendaftarkan level-nya ke trigger book pair"""
+        trail_pct = self.trail_pct if trail_pct is None else trail_pct
+        position = Position(pair, harga_beli, jumlah_crypto, stop_loss, take_profit, on_close, on_tick, trail_pct)
+        position.closed = asyncio.get_running_loop().create_future()
+        self.positions.add(position)
+        self.position_tasks.add(position.closed)
+        position.closed.add_done_callback(self.position_tasks.discard)
+        self.book(pair).add(position, stop=stop_loss, target=take_profit, trail_pct=trail_pct, price=harga_beli)
+        if on_tick:
+            self.tick_positions[pair].add(position)
+        return position
+
+    def close_position(self, position, harga_sekarang, status):
+        """Menutup posisi (dari trigger atau manual) lalu menjalankan on_close di thread"""
+        if position not in self.positions:
+            return
+        self.book(position.pair).remove(position)
+        self.positions.discard(position)
+        self.tick_positions[position.pair].discard(position)
+        position.status = status
+        position.harga_jual = harga_sekarang
+        self.closed_positions.append(position)
+        log.info("%s untuk %s pada harga %s.", status, position.pair, harga_sekarang,
+                 extra={"pair": position.pair, "price": harga_sekarang, "status": status})
+        asyncio.get_running_loop().create_task(self._finish_position(position, harga_sekarang))
+
+    async def _finish_position(self, position, harga_sekarang):
+        try:
+            if position.on_close:
+                await asyncio.to_thread(position.on_close, position, harga_sekarang)
+        except Exception as e:
+            log.exception("on_close %s gagal: %s", position.pair, e, extra={"pair": position.pair})
+        finally:
+            position.closed.set_result(position)
+
+    async def open_from_entry(self, pair, entry_fn, on_close=None, on_tick=None):
+        entry = await asyncio.to_thread(entry_fn, pair)
+        if entry:
+            harga_beli, jumlah_crypto, stop_loss, take_profit = entry
+            self.open_position(pair, harga_beli, jumlah_crypto, stop_loss, take_profit, on_close, on_tick)
+
+    async def run(self, entry_fn=None, on_close=None, on_tick=None, until_closed=True):
+        """Menjalankan polling semua pair.
+
+        entry_fn(pair) dipanggil sekali per pair dan mengembalikan
+        (harga_beli, jumlah_crypto, stop_loss, take_profit) atau None.
+        Jika until_closed, engine berhenti setelah semua posisi tertutup.
+        """
+        pollers = self.start_feeds()
+        try:
+            if entry_fn:
+                await asyncio.gather(*(self.open_from_entry(pair, entry_fn, on_close, on_tick) for pair in self.pairs))
+            if until_closed:
+                while self.position_tasks:
+                    await asyncio.gather(*list(self.position_tasks))
+            else:
+                await asyncio.gather(*pollers)
+        finally:
+            for task in pollers:
+                task.cancel()
+            await asyncio.gather(*pollers, return_exceptions=True)
+        return self.closed_positions
+
+    def latency_stats(self):
+        """Latensi tick-ke-keputusan per pair (milidetik)"""
+        stats = {}
+        for pair, latensi in self.latency.items():
+            if not latensi:
+                continue
+            ms = np.array(latensi) * 1000
+            stats[pair] = {
+                "count": len(ms),
+                "p50_ms": round(float(np.percentile(ms, 50)), 4),
+                "p99_ms": round(float(np.percentile(ms, 99)), 4)
+            }
+        return stats
+
+    def export_latency(self, filename="latency_stats.json"):
+        with open(filename, "w") as f:
+            json.dump(self.latency_stats(), f, indent=2)
+        print(f"📊 Statistik latensi per pair disimpan di {filename}")
+
+
+def run_multi_pair(api, pairs, live=False, stream=True, trail_pct=None, online=False):
+    """Menjalankan bot untuk banyak pair sekaligus dari satu proses.
+
+    live=False memakai SimulationBotAI, live=True memakai TradingBotAI.
+    stream=True memakai MarketStream (WebSocket dengan fallback REST).
+    trail_pct (mis. 0.01) menambahkan trailing stop ke setiap posisi.
+    online=True memakai model online per pair (lihat online_model).
+    """
+    if live:
+        from execute import TradingBotAI as Bot
+        from order_engine import OrderEngine
+        interval = 2
+        # Satu OrderEngine (antrean, nonce, dan poller order) dipakai bersama semua pair
+        orders = OrderEngine(api)
+        bots = {pair: Bot(api, pair, orders=orders, online=online) for pair in pairs}
+    else:
+        from simulation import SimulationBotAI as Bot
+        interval = 1
+        orders = None
+        bots = {pair: Bot(api, pair, online=online) for pair in pairs}
+
+    def entry(pair):
+        return bots[pair].evaluate_entry()
+
+    def on_close(position, harga_sekarang):
+        bot = bots[position.pair]
+        bot.status = position.status
+        print(f"[{position.status}] {position.pair} ditutup pada harga {harga_sekarang}")
+        if live:
+            bot.sell_trade(harga_sekarang, position.jumlah_crypto)
+        else:
+            bot.collector.log_transaction("SIMULATED_SELL", harga_sekarang, position.jumlah_crypto)
+
+    def on_tick(position, harga_sekarang):
+        # Model online belajar dari trade yang masuk selama posisi terbuka
+        bots[position.pair].model.observe_price(harga_sekarang)
+
+    engine = MarketEngine(api, pairs, interval=interval, trail_pct=trail_pct,
+                          stream=MarketStream(api, pairs, poll_interval=interval) if stream else None)
+
+    async def jalankan():
+        tick = on_tick if online else None
+        if orders is None:
+            return await engine.run(entry_fn=entry, on_close=on_close, on_tick=tick)
+        async with orders:
+            return await engine.run(entry_fn=entry, on_close=on_close, on_tick=tick)
+
+    asyncio.run(jalankan())
+    engine.export_latency()
+    return engine
@@ -0,0 +1,193 @@
+import asyncio
+import json
+import os
+import time
+import numpy as np
+from log_config import get_logger
+
+try:
+    import websockets
+except ImportError:  # websockets opsional; tanpa itu klien memakai polling REST
+    websockets = None
+
+# Default jika env WS_URL kosong; WS_URL/WS_TOKEN dibaca saat MarketStream dibuat, setelah .env dimuat
+WS_URL = "wss://ws3.indodax.com/ws/"
+TRADE_CHANNEL = "market:trade-activity-"
+SUMMARY_CHANNEL = "market:summary-24h"
+
+log = get_logger("stream")
+
+
+class RingBuffer:
+    """Buffer trade berkapasitas tetap (tid, date, price, amount) per pair"""
+    def __init__(self, capacity=10000):
+        self.capacity = capacity
+        self.tid = np.zeros(capacity, dtype=np.int64)
+        self.date = np.zeros(capacity, dtype=np.int64)
+        self.price = np.zeros(capacity, dtype=np.float64)
+        self.amount = np.zeros(capacity, dtype=np.float64)
+        self.count = 0
+        self.last_tid = None
+        self.received_at = None
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def append(self, tid, date, price, amount):
+        """Menambahkan trade; trade dengan tid lama (duplikat) diabaikan"""
+        if self.last_tid is not None and tid <= self.last_tid:
+            return False
+        i = self.count % self.capacity
+        self.tid[i], self.date[i], self.price[i], self.amount[i] = tid, date, price, amount
+        self.count += 1
+        self.last_tid = tid
+        self.received_at = time.perf_counter()
+        return True
+
+    @property
+    def last_price(self):
+        return self.price[(self.count - 1) % self.capacity] if self.count else None
+
+    def latest(self, n=None):
+        """n trade terakhir berurutan dari yang terlama, sebagai dict array"""
+        n = len(self) if n is None else min(n, len(self))
+        idx = (np.arange(self.count - n, self.count)) % self.capacity
+        return {"tid": self.tid[idx], "date": self.date[idx], "price": self.price[idx], "amount": self.amount[idx]}
+
+
+class MarketStream:
+    """Klien data pasar streaming dari WebSocket Indodax (protokol Centrifugo).
+
+    Trade yang masuk ditaruh di RingBuffer per pair dan diteruskan ke
+    listener. Lompatan offset channel dianggap sebagai pesan yang hilang
+    dan diisi ulang lewat REST (get_trades sejak tid terakhir). Selama
+    socket tidak tersedia, atau paket websockets tidak terpasang, klien
+    memakai polling REST dan terus mencoba menyambung ulang.
+    """
+    def __init__(self, api, pairs, ws_url=None, token=None, capacity=10000,
+                 poll_interval=2, reconnect_delay=1, max_reconnect_delay=30):
+        self.api = api
+        self.pairs = list(pairs)
+        from api_utils import load_env
+
+        load_env()
+        self.ws_url = ws_url or os.getenv("WS_URL", WS_URL)
+        self.token = token or os.getenv("WS_TOKEN")
+        self.poll_interval = poll_interval
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.buffers = {pair: RingBuffer(capacity) for pair in self.pairs}
+        self.offsets = {}
+        self.tickers = {}
+        self.listeners = []
+        self.mode = "disconnected"
+        self.stats = {"messages": 0, "bytes": 0, "gaps": 0, "reconnects": 0, "rest_polls": 0}
+
+    def add_listener(self, callback):
+        """callback(pair, price, date) dipanggil untuk setiap trade baru"""
+        self.listeners.append(callback)
+
+    def last_price(self, pair):
+        return self.buffers[pair].last_price
+
+    def _push(self, pair, tid, date, price, amount, notify=True):
+        if self.buffers[pair].append(tid, date, price, amount) and notify:
+            for callback in self.listeners:
+                callback(pair, price, date)
+
+    async def backfill(self, pair):
+        """Mengisi trade yang terlewat lewat REST.
+
+        Snapshot pertama (buffer masih kosong) berisi trade historis, jadi
+        hanya mengisi RingBuffer tanpa memanggil listener; posisi yang
+        sudah terbuka tidak boleh dievaluasi terhadap harga lama. Setelah
+        itu hanya trade dengan tid lebih baru dari yang terakhir dilihat
+        yang diteruskan.
+        """
+        buffer = self.buffers[pair]
+        snapshot = buffer.last_tid is None
+        try:
+            trades = await asyncio.to_thread(self.api.get_trades, pair, since=buffer.last_tid)
+        except Exception as e:
+            log.error("Backfill REST %s gagal: %s", pair, e, extra={"pair": pair})
+            return
+        for t in sorted(trades, key=lambda t: int(t['tid'])):
+            self._push(pair, int(t['tid']), int(t['date']), float(t['price']), float(t['amount']),
+                       notify=not snapshot)
+
+    async def handle_message(self, raw):
+        self.stats["messages"] += 1
+        self.stats["bytes"] += len(raw)
+        # Centrifugo bisa mengirim beberapa pesan JSON dalam satu frame
+        for line in raw.splitlines():
+            if not line.strip():
+                continue
+            result = json.loads(line).get("result", {})
+            channel = result.get("channel")
+            if not channel:
+                continue
+            data = result.get("data", {})
+            if channel.startswith(TRADE_CHANNEL):
+                await self.handle_trades(channel[len(TRADE_CHANNEL):], data)
+            elif channel == SUMMARY_CHANNEL:
+                self.handle_summary(data)
+
+    async def handle_trades(self, pair, data):
+        if pair not in self.buffers:
+            return
+        offset = data.get("offset")
+        last = self.offsets.get(pair)
+        if offset is not None:
+            if last is not None and offset > last + 1:
+                self.stats["gaps"] += 1
+                log.warning("Gap sequence %s: offset %s -> %s, backfill via REST", pair, last, offset, extra={"pair": pair})
+                await self.backfill(pair)
+            self.offsets[pair] = offset if last is None else max(last, offset)
+        # Format item: [pair, timestamp, sequence (tid), side, price, volume_idr, volume_coin]
+        for item in data.get("data", {}).get("data", []):
+            self._push(pair, int(item[2]), int(item[1]), float(item[4]), float(item[6]))
+
+    def handle_summary(self, data):
+        # Format item: [pair, timestamp, last, ...]
+        for item in data.get("data", {}).get("data", []):
+            self.tickers[item[0]] = {"last": float(item[2]), "time": int(item[1])}
+
+    async def ws_session(self):
+        async with websockets.connect(self.ws_url, max_size=None) as ws:
+            await ws.send(json.dumps({"params": {"token": self.token}, "id": 1}))
+            await ws.recv()
+            channels = [f"{TRADE_CHANNEL}{pair}" for pair in self.pairs] + [SUMMARY_CHANNEL]
+            for i, channel in enumerate(channels, start=2):
+                await ws.send(json.dumps({"method": 1, "params": {"channel": channel}, "id": i}))
+            self.mode = "websocket"
+            # Snapshot awal dan trade yang terjadi selama terputus diambil lewat REST
+            await asyncio.gather(*(self.backfill(pair) for pair in self.pairs))
+            async for message in ws:
+                await self.handle_message(message if isinstance(message, str) else message.decode())
+
+    async def poll_rest(self):
+        """Satu putaran polling REST untuk semua pair"""
+        self.stats["rest_polls"] += 1
+        await asyncio.gather(*(self.backfill(pair) for pair in self.pairs))
+
+    async def run(self):
+        delay = self.reconnect_delay
+        while True:
+            if websockets is not None and self.ws_url and self.token:
+                try:
+                    await self.ws_session()
+                    delay = self.reconnect_delay
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    log.warning("WebSocket terputus: %s", e)
+                self.stats["reconnects"] += 1
+            # Socket tidak tersedia: polling REST sampai waktunya menyambung ulang
+            self.mode = "rest"
+            batas = time.monotonic() + delay
+            while True:
+                await self.poll_rest()
+                if websockets is not None and self.ws_url and self.token and time.monotonic() >= batas:
+                    break
+                await asyncio.sleep(self.poll_interval)
+            delay = min(delay * 2, self.max_reconnect_delay)
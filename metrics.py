@@ -0,0 +1,186 @@
+import cProfile
+import os
+import pstats
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Batas bucket histogram (detik), gaya Prometheus
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=None):
+    items = list(key) + list((extra or {}).items())
+    if not items:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in items) + "}"
+
+
+class Histogram:
+    """Histogram bucket kumulatif untuk ekspor, ditambah jendela sampel terakhir untuk persentil"""
+    def __init__(self, buckets=DEFAULT_BUCKETS, window=2048):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.samples = deque(maxlen=window)
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        self.samples.append(value)
+
+    def percentiles(self, qs=(50, 95, 99)):
+        if not self.samples:
+            return {f"p{q}": None for q in qs}
+        # numpy diimpor di sini supaya `import metrics` tetap ringan untuk CLI
+        import numpy as np
+
+        values = np.percentile(np.fromiter(self.samples, dtype=np.float64), qs)
+        return {f"p{q}": float(v) for q, v in zip(qs, values)}
+
+
+class MetricsRegistry:
+    """Timer/span, histogram, dan counter dalam proses dengan ekspor format teks Prometheus"""
+    def __init__(self, prefix="ai_bot", buckets=DEFAULT_BUCKETS, window=2048):
+        self.prefix = prefix
+        self.bucket_bounds = buckets
+        self.window = window
+        self.histograms = defaultdict(dict)
+        self.counters = defaultdict(lambda: defaultdict(float))
+        self.lock = threading.Lock()
+
+    def observe(self, name, seconds, **labels):
+        key = _label_key(labels)
+        with self.lock:
+            hist = self.histograms[name].get(key)
+            if hist is None:
+                hist = self.histograms[name][key] = Histogram(self.bucket_bounds, self.window)
+            hist.observe(seconds)
+
+    def inc(self, name, value=1, **labels):
+        with self.lock:
+            self.counters[name][_label_key(labels)] += value
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Span: mencatat durasi blok ke histogram `name`, juga jika blok melempar exception"""
+        mulai = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - mulai, **labels)
+
+    def timed(self, name, **labels):
+        """Dekorator versi timer()"""
+        def decorator(fn):
+            def wrapper(*args, **kwargs):
+                with self.timer(name, **labels):
+                    return fn(*args, **kwargs)
+            wrapper.__name__ = fn.__name__
+            wrapper.__doc__ = fn.__doc__
+            return wrapper
+        return decorator
+
+    def summary(self):
+        """{nama: {label: {count, p50_ms, p95_ms, p99_ms}}} dan nilai counter"""
+        with self.lock:
+            hasil = {}
+            for name, series in self.histograms.items():
+                hasil[name] = {}
+                for key, hist in series.items():
+                    ringkas = {"count": hist.count}
+                    ringkas.update({f"{p}_ms": round(v * 1000, 3) if v is not None else None
+                                    for p, v in hist.percentiles().items()})
+                    hasil[name][_format_labels(key) or "total"] = ringkas
+            for name, series in self.counters.items():
+                hasil[name] = {_format_labels(key) or "total": value for key, value in series.items()}
+            return hasil
+
+    def to_prometheus(self):
+        lines = []
+        with self.lock:
+            for name, series in sorted(self.histograms.items()):
+                metric = f"{self.prefix}_{name}"
+                lines.append(f"# TYPE {metric} histogram")
+                for key, hist in series.items():
+                    kumulatif = 0
+                    for bound, count in zip(self.bucket_bounds, hist.counts):
+                        kumulatif += count
+                        lines.append(f"{metric}_bucket{_format_labels(key, {'le': bound})} {kumulatif}")
+                    lines.append(f"{metric}_bucket{_format_labels(key, {'le': '+Inf'})} {hist.count}")
+                    lines.append(f"{metric}_sum{_format_labels(key)} {hist.sum}")
+                    lines.append(f"{metric}_count{_format_labels(key)} {hist.count}")
+            for name, series in sorted(self.counters.items()):
+                metric = f"{self.prefix}_{name}"
+                lines.append(f"# TYPE {metric} counter")
+                for key, value in series.items():
+                    lines.append(f"{metric}{_format_labels(key)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """Menulis snapshot secara atomik (untuk node_exporter textfile collector)"""
+        tmp = f"{path}.tmp-{os.getpid()}"
+        with open(tmp, "w") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp, path)
+
+    def serve(self, port=9108, host="127.0.0.1"):
+        """Endpoint HTTP /metrics di thread terpisah; mengembalikan server"""
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.to_prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        return server
+
+    def export_every(self, path, interval=15):
+        """Menulis file Prometheus secara berkala di thread latar"""
+        def loop():
+            while True:
+                time.sleep(interval)
+                self.write_prometheus(path)
+        threading.Thread(target=loop, name="metrics-file", daemon=True).start()
+
+    def reset(self):
+        with self.lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+
+METRICS = MetricsRegistry()
+timer = METRICS.timer
+inc = METRICS.inc
+
+
+def profile_run(fn, output="profile.out", top=25):
+    """Menjalankan fn di bawah cProfile, menyimpan stats ke output dan mencetak fungsi terberat"""
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(fn)
+    finally:
+        profiler.dump_stats(output)
+        print(f"📊 Profil cProfile disimpan di {output} (lihat dengan: python -m pstats {output})")
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(top)
@@ -0,0 +1,178 @@
+import hashlib
+import hmac
+import itertools
+import threading
+import time
+from urllib.parse import parse_qsl, urlparse
+from mock_server import MockIndodaxHandler, start_mock_server
+
+
+class MockExchange:
+    """Bursa lokal yang meniru API private Indodax untuk pengujian eksekusi.
+
+    Mendukung trade (limit), openOrders, getOrder, orderHistory,
+    cancelOrder, dan getInfo. Tanda tangan HMAC diverifikasi, dan
+    timestamp yang sama dipakai dua kali atau di luar recvWindow ditolak
+    seperti di Indodax. Order dicocokkan terhadap harga pasar yang diatur
+    lewat set_price(): buy terisi jika harga order >= pasar, sell jika
+    <= pasar. fill_ratio < 1 mengisi order sebagian per langkah pencocokan.
+    """
+    def __init__(self, api_key="mock", secret_key="mock", prices=None, fill_ratio=1.0, latency=0.0):
+        self.api_key = api_key
+        self.secret_key = secret_key
+        self.prices = dict(prices or {"btcidr": 1585000000.0})
+        self.fill_ratio = fill_ratio
+        self.latency = latency
+        self.orders = {}
+        self.balance = {"idr": 10_000_000_000.0, "btc": 10.0}
+        self.seen = set()
+        self.requests = 0
+        self.ids = itertools.count(1000)
+        self.lock = threading.Lock()
+
+    def set_price(self, pair, price):
+        """Mengubah harga pasar pair lalu mencocokkan order terbuka"""
+        with self.lock:
+            self.prices[pair] = float(price)
+            self._match(pair)
+
+    def step(self):
+        """Satu langkah pencocokan untuk semua pair (berguna untuk fill_ratio < 1)"""
+        with self.lock:
+            for pair in list(self.prices):
+                self._match(pair)
+
+    def _match(self, pair):
+        harga = self.prices.get(pair)
+        if harga is None:
+            return
+        for order in self.orders.values():
+            if order["pair"] != pair or order["status"] != "open":
+                continue
+            if (order["type"] == "buy" and order["price"] >= harga) or (order["type"] == "sell" and order["price"] <= harga):
+                jumlah = order["remain"] if self.fill_ratio >= 1 else max(order["remain"] * self.fill_ratio, 1e-8)
+                jumlah = min(jumlah, order["remain"])
+                order["remain"] -= jumlah
+                tanda = 1 if order["type"] == "buy" else -1
+                self.balance[order["coin"]] = self.balance.get(order["coin"], 0.0) + tanda * jumlah
+                self.balance["idr"] -= tanda * jumlah * order["price"]
+                if order["remain"] <= 1e-12:
+                    order.update(remain=0.0, status="filled", finish_time=int(time.time()))
+
+    def _order_view(self, order):
+        coin = order["coin"]
+        return {
+            "order_id": order["order_id"],
+            "client_order_id": order["client_order_id"],
+            "price": str(order["price"]),
+            "type": order["type"],
+            "order_type": "limit",
+            f"order_{coin}": f"{order['amount']:.8f}",
+            f"remain_{coin}": f"{order['remain']:.8f}",
+            "submit_time": order["submit_time"],
+            "finish_time": order["finish_time"],
+            "status": order["status"]
+        }
+
+    def _verify(self, payload, headers):
+        if headers.get("Key") != self.api_key:
+            return "invalid_credentials", "Invalid credentials. API not found or session has expired."
+        query = "&".join(f"{key}={value}" for key, value in payload)
+        sign = hmac.new(self.secret_key.encode(), query.encode(), hashlib.sha512).hexdigest()
+        if not hmac.compare_digest(sign, headers.get("Sign", "")):
+            return "invalid_credentials", "Invalid credentials. Bad sign."
+        params = dict(payload)
+        timestamp = int(params.get("timestamp", 0))
+        window = int(params.get("recvWindow", 5000))
+        if abs(time.time() * 1000 - timestamp) > window:
+            return "invalid_timestamp", "Timestamp outside recvWindow."
+        if timestamp in self.seen:
+            return "invalid_nonce", f"Invalid nonce. Timestamp {timestamp} already used."
+        self.seen.add(timestamp)
+        return None
+
+    def handle(self, payload, headers):
+        """payload berupa list (key, value) sesuai urutan body; mengembalikan dict respons"""
+        if self.latency:
+            time.sleep(self.latency)
+        with self.lock:
+            self.requests += 1
+            gagal = self._verify(payload, headers)
+            if gagal:
+                return {"success": 0, "error_code": gagal[0], "error": gagal[1]}
+            params = dict(payload)
+            method = params.get("method")
+            handler = getattr(self, f"_tapi_{method}", None)
+            if handler is None:
+                return {"success": 0, "error_code": "invalid_method", "error": f"Method {method} tidak didukung"}
+            try:
+                return {"success": 1, "return": handler(params)}
+            except KeyError as e:
+                return {"success": 0, "error_code": "invalid_request", "error": str(e)}
+
+    def _tapi_getInfo(self, params):
+        return {"balance": {name: f"{value:.8f}" for name, value in self.balance.items()},
+                "server_time": int(time.time())}
+
+    def _tapi_trade(self, params):
+        coin = params["pair"].split("_")[0]
+        order_id = str(next(self.ids))
+        order = {
+            "order_id": order_id, "client_order_id": params.get("client_order_id"),
+            "pair": params["pair"].replace("_", ""), "coin": coin, "type": params["type"],
+            "price": float(params["price"]), "amount": float(params[coin]), "remain": float(params[coin]),
+            "submit_time": int(time.time()), "finish_time": None, "status": "open"
+        }
+        self.orders[order_id] = order
+        self._match(order["pair"])
+        return {"order_id": order_id, "client_order_id": order["client_order_id"],
+                f"remain_{coin}": f"{order['remain']:.8f}"}
+
+    def _find(self, params):
+        order = self.orders.get(str(params["order_id"]))
+        if order is None or order["pair"] != params["pair"].replace("_", ""):
+            raise KeyError(f"Order {params['order_id']} tidak ditemukan")
+        return order
+
+    def _tapi_openOrders(self, params):
+        return {"orders": [self._order_view(o) for o in self.orders.values()
+                           if o["pair"] == params["pair"].replace("_", "") and o["status"] == "open"]}
+
+    def _tapi_getOrder(self, params):
+        return {"order": self._order_view(self._find(params))}
+
+    def _tapi_orderHistory(self, params):
+        pair = params["pair"].replace("_", "")
+        selesai = [o for o in self.orders.values() if o["pair"] == pair and o["status"] != "open"]
+        selesai.sort(key=lambda o: int(o["order_id"]), reverse=True)
+        return {"orders": [self._order_view(o) for o in selesai[:int(params.get("count", 100))]]}
+
+    def _tapi_cancelOrder(self, params):
+        order = self._find(params)
+        if order["status"] != "open":
+            raise KeyError(f"Order {order['order_id']} sudah {order['status']}")
+        order.update(status="cancelled", finish_time=int(time.time()))
+        return {"order_id": order["order_id"], "type": order["type"], "pair": params["pair"],
+                "balance": self._tapi_getInfo(params)["balance"]}
+
+
+def start_mock_exchange(exchange=None, port=0):
+    """Server mock (publik + private) di thread terpisah; mengembalikan (server, base_url, exchange)"""
+    exchange = exchange or MockExchange()
+
+    class Handler(MockIndodaxHandler):
+        def kirim_ticker(self):
+            # Ticker publik mengikuti harga pasar bursa mock supaya reprice konsisten
+            harga = exchange.prices.get(urlparse(self.path).path.rsplit("/", 1)[-1])
+            if harga is None:
+                return super().kirim_ticker()
+            self.kirim_json({"ticker": {"last": str(harga), "buy": str(harga), "sell": str(harga),
+                                        "server_time": int(time.time())}})
+
+        def do_POST(self):
+            panjang = int(self.headers.get("Content-Length", 0))
+            payload = parse_qsl(self.rfile.read(panjang).decode(), keep_blank_values=True)
+            self.kirim_json(exchange.handle(payload, self.headers))
+
+    server, base_url = start_mock_server(Handler, port)
+    return server, base_url, exchange
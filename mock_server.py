@@ -0,0 +1,124 @@
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+def buat_trades(jumlah=200, harga=1585000000.0, tid_awal=1, seed=42):
+    """Membuat data trade palsu dengan format yang sama seperti /api/trades"""
+    rng = random.Random(seed)
+    now = int(time.time())
+    trades = []
+    for i in range(jumlah):
+        harga *= 1 + rng.gauss(0, 0.0005)
+        trades.append({
+            "date": str(now - jumlah + i),
+            "price": str(round(harga)),
+            "amount": f"{rng.uniform(0.0001, 0.05):.8f}",
+            "tid": str(tid_awal + i),
+            "type": rng.choice(["buy", "sell"])
+        })
+    # Indodax mengembalikan trade terbaru lebih dulu
+    return trades[::-1]
+
+
+class PasarPalsu:
+    """Harga acak banyak pair untuk /api/ticker_all; setiap request menggerakkan sebagian pair"""
+    def __init__(self, jumlah_pair=150, seed=7, peluang_trade=0.5):
+        self.rng = random.Random(seed)
+        self.pairs = ["btc_idr", "eth_idr"] + [f"koin{i:03d}_idr" for i in range(max(0, jumlah_pair - 2))]
+        self.harga = [10 ** self.rng.uniform(1, 9) for _ in self.pairs]
+        self.volume = [10 ** self.rng.uniform(6, 11) for _ in self.pairs]
+        self.peluang_trade = peluang_trade
+        self.lock = threading.Lock()
+
+    def ticker_all(self):
+        now = int(time.time())
+        with self.lock:
+            tickers = {}
+            for i, pair in enumerate(self.pairs):
+                if self.rng.random() < self.peluang_trade:
+                    self.harga[i] *= 1 + self.rng.gauss(0, 0.002)
+                harga = self.harga[i]
+                tickers[pair] = {
+                    "high": f"{harga * 1.02:.8g}", "low": f"{harga * 0.98:.8g}",
+                    "vol_idr": str(round(self.volume[i])),
+                    "last": f"{harga:.8g}", "buy": f"{harga * 0.999:.8g}", "sell": f"{harga * 1.001:.8g}",
+                    "server_time": now
+                }
+        return {"tickers": tickers}
+
+
+class MockIndodaxHandler(BaseHTTPRequestHandler):
+    """Handler HTTP/1.1 (keep-alive) yang meniru endpoint Indodax"""
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    trades = buat_trades()
+    pasar = PasarPalsu()
+
+    def kirim_json(self, data, status=200, etag=None):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        if etag:
+            self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def kirim_ticker(self):
+        terakhir = self.trades[0]
+        harga = float(terakhir["price"])
+        ticker = {"ticker": {
+            "high": str(round(harga * 1.01)), "low": str(round(harga * 0.99)),
+            "vol_btc": "12.5", "vol_idr": str(round(harga * 12.5)),
+            "last": terakhir["price"], "buy": str(round(harga - 1000)), "sell": str(round(harga + 1000)),
+            "server_time": int(terakhir["date"])
+        }}
+        etag = f'"{terakhir["tid"]}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+        else:
+            self.kirim_json(ticker, etag=etag)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        if url.path.startswith("/api/trades/"):
+            limit = int(query.get("limit", ["1000"])[0])
+            if "since" in query:
+                since = int(query["since"][0])
+                baru = [t for t in reversed(self.trades) if int(t["tid"]) > since]
+                self.kirim_json(baru[:limit])
+            else:
+                self.kirim_json(self.trades[:limit])
+        elif url.path.startswith("/api/ticker/"):
+            self.kirim_ticker()
+        elif url.path == "/api/ticker_all":
+            self.kirim_json(self.pasar.ticker_all())
+        else:
+            self.kirim_json({"error": "not_found"}, status=404)
+
+    def do_POST(self):
+        panjang = int(self.headers.get("Content-Length", 0))
+        payload = parse_qs(self.rfile.read(panjang).decode())
+        method = payload.get("method", [""])[0]
+        if method == "getInfo":
+            self.kirim_json({"success": 1, "return": {"balance": {"idr": "1000000", "btc": "0.01"}}})
+        else:
+            self.kirim_json({"success": 0, "error": f"Method {method} tidak didukung"})
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_mock_server(handler=MockIndodaxHandler, port=0):
+    """Menjalankan server mock di thread terpisah, mengembalikan (server, base_url)"""
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
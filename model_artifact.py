@@ -0,0 +1,176 @@
+import hashlib
+import json
+import os
+import struct
+import time
+import numpy as np
+
+MAGIC = b"AIBOTMDL"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+# magic, versi format, panjang header JSON
+PREAMBLE = struct.Struct("<8sII")
+
+
+def tree_arrays(tree):
+    """Array node satu pohon sklearn (tree_) dengan indeks anak lokal, -1 untuk daun"""
+    return {
+        "left": tree.children_left.astype(np.int32),
+        "right": tree.children_right.astype(np.int32),
+        "feature": tree.feature.astype(np.int32),
+        "threshold": tree.threshold.astype(np.float64),
+        "value": tree.value[:, 0, 0].astype(np.float64)
+    }
+
+
+def join_trees(trees):
+    """Menggabungkan array node per pohon ke array forest dengan indeks node global"""
+    roots, left, right, feature, threshold, value = [], [], [], [], [], []
+    base = 0
+    for tree in trees:
+        roots.append(base)
+        left.append(np.where(tree["left"] == -1, -1, tree["left"] + base))
+        right.append(np.where(tree["right"] == -1, -1, tree["right"] + base))
+        feature.append(tree["feature"])
+        threshold.append(tree["threshold"])
+        value.append(tree["value"])
+        base += len(tree["left"])
+    return {
+        "roots": np.array(roots, dtype=np.int32),
+        "left": np.concatenate(left).astype(np.int32),
+        "right": np.concatenate(right).astype(np.int32),
+        "feature": np.concatenate(feature).astype(np.int32),
+        "threshold": np.concatenate(threshold),
+        "value": np.concatenate(value)
+    }
+
+
+def split_trees(arrays):
+    """Kebalikan join_trees: array forest -> list array node per pohon (salinan, bukan memmap)"""
+    roots = [int(root) for root in arrays["roots"]] + [len(arrays["left"])]
+    trees = []
+    for start, stop in zip(roots[:-1], roots[1:]):
+        tree = {name: np.array(arrays[name][start:stop]) for name in ("left", "right", "feature", "threshold", "value")}
+        for name in ("left", "right"):
+            tree[name] = np.where(tree[name] == -1, -1, tree[name] - start).astype(np.int32)
+        trees.append(tree)
+    return trees
+
+
+def _forest_arrays(model):
+    """Meratakan semua pohon RandomForestRegressor ke array node gabungan"""
+    return join_trees([tree_arrays(estimator.tree_) for estimator in model.estimators_])
+
+
+def predict_arrays(a, X, max_depth):
+    """Menelusuri semua pohon sekaligus untuk setiap baris, lalu merata-ratakan nilai daun"""
+    # sklearn membandingkan fitur float32 dengan threshold float64
+    X = np.atleast_2d(np.asarray(X, dtype=np.float32)).astype(np.float64)
+    rows = np.arange(len(X))[:, None]
+    nodes = np.broadcast_to(a["roots"], (len(X), len(a["roots"]))).copy()
+    for _ in range(max_depth):
+        left = a["left"][nodes]
+        internal = left != -1
+        if not internal.any():
+            break
+        feature = np.where(internal, a["feature"][nodes], 0)
+        go_left = X[rows, feature] <= a["threshold"][nodes]
+        nodes = np.where(internal, np.where(go_left, left, a["right"][nodes]), nodes)
+    return a["value"][nodes].mean(axis=1)
+
+
+def save_forest(model, feature_names, path, metadata=None):
+    """Menyimpan forest sebagai header JSON kecil diikuti array NumPy mentah.
+
+    metadata bisa berisi training_window, score, dsb. Header juga memuat
+    versi sklearn dan hash isi array sehingga model bisa dikenali tanpa
+    memuat pohonnya.
+    """
+    import sklearn
+
+    arrays = _forest_arrays(model)
+    sha = hashlib.sha256()
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        offset = -(-offset // ALIGNMENT) * ALIGNMENT
+        layout[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset += array.nbytes
+        sha.update(array.tobytes())
+    header = {
+        "format_version": FORMAT_VERSION,
+        "model_type": type(model).__name__,
+        "feature_names": list(feature_names),
+        "n_trees": len(model.estimators_),
+        "max_depth": int(max(e.tree_.max_depth for e in model.estimators_)),
+        "sklearn_version": sklearn.__version__,
+        "created_at": int(time.time()),
+        "content_hash": sha.hexdigest(),
+        "arrays": layout,
+        **(metadata or {})
+    }
+    header_bytes = json.dumps(header).encode()
+    data_start = -(-(PREAMBLE.size + len(header_bytes)) // ALIGNMENT) * ALIGNMENT
+    with open(path, "wb") as f:
+        f.write(PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        for name, array in arrays.items():
+            f.seek(data_start + layout[name]["offset"])
+            f.write(array.tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    return header
+
+
+def read_header(path):
+    """Membaca header artefak tanpa menyentuh array pohon"""
+    with open(path, "rb") as f:
+        magic, version, length = PREAMBLE.unpack(f.read(PREAMBLE.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} bukan artefak model AI_BOT")
+        if version > FORMAT_VERSION:
+            raise ValueError(f"Versi format {version} pada {path} tidak didukung")
+        header = json.loads(f.read(length))
+    header["data_start"] = -(-(PREAMBLE.size + length) // ALIGNMENT) * ALIGNMENT
+    return header
+
+
+class ModelArtifact:
+    """Forest yang dibaca dari artefak; array pohon di-memory-map saat pertama dipakai"""
+    def __init__(self, path, header=None):
+        self.path = path
+        self.header = header or read_header(path)
+        self.feature_names = self.header["feature_names"]
+        self._arrays = None
+
+    @property
+    def arrays(self):
+        if self._arrays is None:
+            start = self.header["data_start"]
+            self._arrays = {
+                name: np.memmap(self.path, dtype=np.dtype(info["dtype"]), mode="r",
+                                offset=start + info["offset"], shape=tuple(info["shape"]))
+                for name, info in self.header["arrays"].items()
+            }
+        return self._arrays
+
+    def predict(self, X):
+        """Menelusuri semua pohon sekaligus untuk setiap baris, lalu merata-ratakan nilai daun"""
+        return predict_arrays(self.arrays, X, self.header["max_depth"])
+
+    def score(self, X, y):
+        """Koefisien determinasi R^2, sama seperti RegressorMixin.score"""
+        if hasattr(X, "columns"):
+            X = X[self.feature_names].to_numpy()
+        y = np.asarray(y, dtype=np.float64)
+        residual = ((y - self.predict(X)) ** 2).sum()
+        total = ((y - y.mean()) ** 2).sum()
+        return 1 - residual / total if total else 0.0
+
+
+def convert_pickle(pkl_path, path, metadata=None):
+    """Mengubah model lama `(model, feature_names)` hasil joblib.dump ke format artefak"""
+    import joblib
+
+    model, feature_names = joblib.load(pkl_path)
+    return save_forest(model, feature_names, path, metadata)
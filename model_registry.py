@@ -0,0 +1,47 @@
+import os
+import threading
+from collections import OrderedDict
+from model_artifact import ModelArtifact, read_header
+
+
+class ModelRegistry:
+    """Cache model dalam proses dengan batas LRU.
+
+    Model hanya dimuat ulang jika mtime/ukuran file berubah dan hash isi
+    di header artefak memang berbeda, sehingga prediksi tidak lagi memuat
+    file model setiap kali.
+    """
+    def __init__(self, max_models=8):
+        self.max_models = max_models
+        self.models = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, path):
+        """Mengembalikan ModelArtifact terkini untuk path, atau None jika file tidak ada"""
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self.invalidate(path)
+            return None
+        with self.lock:
+            cached = self.models.get(path)
+            if cached is not None and cached[0] == (stat.st_mtime_ns, stat.st_size):
+                self.models.move_to_end(path)
+                return cached[1]
+            header = read_header(path)
+            if cached is None or cached[1].header["content_hash"] != header["content_hash"]:
+                artifact = ModelArtifact(path, header)
+            else:
+                artifact = cached[1]
+            self.models[path] = ((stat.st_mtime_ns, stat.st_size), artifact)
+            self.models.move_to_end(path)
+            while len(self.models) > self.max_models:
+                self.models.popitem(last=False)
+            return artifact
+
+    def invalidate(self, path):
+        with self.lock:
+            self.models.pop(path, None)
+
+
+REGISTRY = ModelRegistry()
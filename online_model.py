@@ -0,0 +1,308 @@
+import threading
+import time
+import numpy as np
+from feature_pipeline import FEATURE_NAMES, FEATURE_VERSION
+from model_artifact import join_trees, predict_arrays, split_trees, tree_arrays
+from model_registry import REGISTRY
+from retrainer import get_scheduler
+from log_config import get_logger
+from metrics import inc, timer
+
+log = get_logger("online")
+
+
+class OnlineForest:
+    """Random forest yang diperbarui bertahap dengan jendela geser.
+
+    Baris (fitur, target) terbaru disimpan di ring buffer berukuran
+    `window`. Setiap `update_every` baris baru, satu pohon dilatih pada
+    sampel bootstrap dari jendela itu dan menggantikan pohon tertua,
+    sehingga forest selalu mengikuti data terkini dan biaya pembaruan
+    per baris terbatas (paling banyak `max_fits` pohon per panggilan
+    learn, masing-masing dari paling banyak `max_samples` baris). Forest
+    bisa di-seed dari artefak model hasil train_model; pohon-pohon
+    artefak lalu tergantikan satu per satu. Prediksi memakai penelusuran
+    array yang sama dengan ModelArtifact, dari snapshot pohon, jadi aman
+    dipanggil selagi thread lain melatih pohon baru.
+    """
+    def __init__(self, feature_names=FEATURE_NAMES, n_trees=100, window=5000, update_every=100, max_depth=12,
+                 min_samples_leaf=5, max_samples=None, max_fits=2, seed=42):
+        self.feature_names = list(feature_names)
+        self.n_trees = n_trees
+        self.window = window
+        self.update_every = update_every
+        self.max_depth = max_depth
+        self.min_samples_leaf = min_samples_leaf
+        self.max_samples = max_samples
+        self.max_fits = max_fits
+        self.rng = np.random.default_rng(seed)
+        self.X = np.empty((window, len(self.feature_names)))
+        self.y = np.empty(window)
+        self.rows = 0
+        self.pending = 0
+        self.trees = []
+        self.fits = 0
+        self._compiled = None
+
+    def __len__(self):
+        """Jumlah baris di jendela"""
+        return min(self.rows, self.window)
+
+    @property
+    def ready(self):
+        return bool(self.trees)
+
+    def reset(self):
+        self.rows = self.pending = 0
+        self.trees = []
+        self._compiled = None
+
+    def seed(self, artifact):
+        """Memakai pohon-pohon artefak model sebagai forest awal (prediksi sama persis dengan artefak).
+
+        Jendela baris dikosongkan; pohon lama diganti sekaligus, jadi
+        prediksi tidak pernah melihat forest kosong.
+        """
+        if artifact.feature_names != self.feature_names:
+            raise ValueError(f"Fitur artefak {artifact.feature_names} tidak sama dengan {self.feature_names}")
+        depth = artifact.header["max_depth"]
+        self.rows = self.pending = 0
+        self.trees = [(tree, depth) for tree in split_trees(artifact.arrays)]
+        self._compiled = None
+
+    def add(self, X, y):
+        """Menambahkan baris ke jendela tanpa melatih pohon"""
+        X = np.atleast_2d(np.asarray(X, dtype=np.float64))[-self.window:]
+        y = np.asarray(y, dtype=np.float64)[-self.window:]
+        posisi = (self.rows + np.arange(len(X))) % self.window
+        self.X[posisi] = X
+        self.y[posisi] = y
+        self.rows += len(X)
+        self.pending += len(X)
+
+    def fit_tree(self):
+        """Melatih satu pohon pada bootstrap jendela dan mengganti pohon tertua"""
+        from sklearn.tree import DecisionTreeRegressor
+
+        n = len(self)
+        sampel = self.rng.integers(0, n, size=min(n, self.max_samples or n))
+        tree = DecisionTreeRegressor(max_depth=self.max_depth, min_samples_leaf=self.min_samples_leaf,
+                                     random_state=int(self.rng.integers(2 ** 31)))
+        tree.fit(self.X[sampel], self.y[sampel])
+        self.trees.append((tree_arrays(tree.tree_), tree.tree_.max_depth))
+        # Forest hasil seed bisa lebih besar dari n_trees: dua pohon tertua dibuang per pohon
+        # baru sampai ukurannya kembali n_trees, supaya prediksi tidak berubah mendadak
+        for _ in range(2 if len(self.trees) > self.n_trees + 1 else 1):
+            if len(self.trees) > self.n_trees:
+                self.trees.pop(0)
+        self.fits += 1
+        self._compiled = None
+
+    def learn(self, X, y):
+        """Menambahkan baris baru lalu mengganti pohon jika sudah cukup baris; mengembalikan jumlah pohon dilatih"""
+        self.add(X, y)
+        dilatih = 0
+        while self.pending >= self.update_every and dilatih < self.max_fits and len(self) >= self.min_samples_leaf * 2:
+            self.fit_tree()
+            self.pending -= self.update_every
+            dilatih += 1
+        # Sisa antrean dibatasi supaya batch besar tidak menumpuk biaya ke panggilan berikutnya
+        self.pending = min(self.pending, self.update_every)
+        return dilatih
+
+    def fit(self, X, y, n_trees=None):
+        """Melatih ulang forest dari nol pada jendela terakhir X, y dengan n_trees pohon (default: semua)"""
+        self.reset()
+        self.add(X, y)
+        for _ in range(self.n_trees if n_trees is None else n_trees):
+            self.fit_tree()
+        self.pending = 0
+
+    def grow(self):
+        """Menambah paling banyak max_fits pohon selama forest masih di bawah n_trees; mengembalikan jumlahnya"""
+        dilatih = 0
+        while len(self.trees) < self.n_trees and dilatih < self.max_fits and len(self) >= self.min_samples_leaf * 2:
+            self.fit_tree()
+            dilatih += 1
+        return dilatih
+
+    def _compile(self):
+        """(arrays gabungan, kedalaman maksimum) dari snapshot daftar pohon saat ini"""
+        compiled = self._compiled
+        if compiled is None:
+            trees = list(self.trees)
+            if not trees:
+                raise ValueError("OnlineForest belum punya pohon")
+            compiled = (join_trees([tree for tree, _ in trees]), max(depth for _, depth in trees))
+            self._compiled = compiled
+        return compiled
+
+    @property
+    def arrays(self):
+        return self._compile()[0]
+
+    def predict(self, X):
+        arrays, depth = self._compile()
+        return predict_arrays(arrays, X, depth)
+
+
+class OnlineLearner:
+    """Mode online PricePredictor: OnlineForest yang belajar dari baris fitur baru.
+
+    Sumber data adalah FeaturePipeline pair yang sama dengan training:
+    setiap baris fitur baru i memberi pasangan (fitur[i-1], harga[i]),
+    target yang sama seperti train_model. Sebelum dipelajari, baris itu
+    diprediksi dulu dan galat relatifnya dicatat di RetrainScheduler
+    (evaluasi prequential); begitu galat itu mengalir, refit penuh di
+    proses terpisah hanya dipicu saat drift, bukan lagi setiap interval.
+    Begitu model hasil refit tersedia (content_hash artefak berubah),
+    forest di-seed ulang dari artefak baru.
+
+    Selama posisi terbuka, on_tick() dipanggil per tick dari event loop
+    dan menjalankan refresh() (tarik trade baru lalu update()) di thread
+    latar, paling sering sekali per refresh_interval detik.
+    """
+    def __init__(self, predictor, forest=None, scheduler=None, min_rows=200, refresh_interval=2.0):
+        self.predictor = predictor
+        self.pair = predictor.pair
+        self.forest = forest or OnlineForest()
+        self.scheduler = scheduler or get_scheduler(self.pair)
+        self.min_rows = min_rows
+        self.refresh_interval = refresh_interval
+        self.rows = None
+        self.base_hash = None
+        self.price_col = self.forest.feature_names.index("price")
+        self.lock = threading.Lock()
+        self.last_refresh = float("-inf")
+        self._thread = None
+
+    @property
+    def ready(self):
+        return self.forest.ready
+
+    def _artifact(self):
+        if not self.predictor.is_model_trained():
+            return None
+        loaded = REGISTRY.get(self.predictor.model_file)
+        if loaded is None or loaded.header.get("feature_version", FEATURE_VERSION) != FEATURE_VERSION:
+            return None
+        return loaded
+
+    def _pairs(self, start, stop):
+        """(X, y) untuk baris fitur start..stop: fitur baris sebelumnya dan harga baris ini"""
+        matrix = self.predictor.features.matrix
+        start = max(start, 1)
+        X = np.array(matrix[start - 1:stop - 1])
+        y = np.array(matrix[start:stop, self.price_col])
+        valid = ~np.isnan(X).any(axis=1) & ~np.isnan(y)
+        return X[valid], y[valid]
+
+    def sync(self):
+        """Seed ulang forest dari artefak model jika ada model penuh baru; mengembalikan True jika di-seed"""
+        loaded = self._artifact()
+        total = len(self.predictor.features)
+        if loaded is not None and loaded.header["content_hash"] != self.base_hash:
+            self.forest.seed(loaded)
+            self.base_hash = loaded.header["content_hash"]
+            self.forest.add(*self._pairs(total - self.forest.window, total))
+            self.forest.pending = 0
+            self.rows = total
+            log.info("Forest online %s di-seed dari %s (%d pohon)", self.pair, self.predictor.model_file,
+                     len(self.forest.trees), extra={"pair": self.pair})
+            return True
+        if self.rows is None:
+            self.rows = total
+            if not self.forest.ready and total >= self.min_rows:
+                # Belum ada model penuh: hanya max_fits pohon pertama yang dilatih di sini,
+                # sisanya ditambah bertahap oleh update() supaya evaluate_entry tidak tertahan
+                with timer("online_update_seconds", pair=self.pair, stage="fit"):
+                    self.forest.fit(*self._pairs(total - self.forest.window, total), n_trees=self.forest.max_fits)
+                log.info("Forest online %s dilatih dari %d baris terakhir", self.pair, len(self.forest),
+                         extra={"pair": self.pair})
+        return False
+
+    def update(self):
+        """Mempelajari baris fitur yang masuk sejak panggilan terakhir; mengembalikan jumlah baris"""
+        self.sync()
+        total = len(self.predictor.features)
+        baris = dilatih = 0
+        with timer("online_update_seconds", pair=self.pair, stage="learn"):
+            if total > self.rows:
+                X, y = self._pairs(max(self.rows, total - self.forest.window), total)
+                self.rows = total
+                baris = len(X)
+                if baris:
+                    if self.forest.ready:
+                        self.scheduler.record_errors(self.forest.predict(X), y)
+                        # Galat prequential sudah mengalir: refit penuh cukup dipicu drift
+                        self.scheduler.interval = None
+                    dilatih = self.forest.learn(X, y)
+            dilatih += self.forest.grow()
+        if baris:
+            inc("online_rows_total", baris, pair=self.pair)
+        if dilatih:
+            inc("online_trees_replaced_total", dilatih, pair=self.pair)
+        return baris
+
+    def refresh(self):
+        """Menarik trade baru ke store lalu mempelajari baris fiturnya (blocking); mengembalikan jumlah baris"""
+        with self.lock:
+            self.last_refresh = time.monotonic()
+            self.predictor.update_historical_data(quiet=True)
+            return self.update()
+
+    def _refresh_background(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            log.exception("Update forest online %s gagal: %s", self.pair, e, extra={"pair": self.pair})
+
+    def on_tick(self):
+        """Menjadwalkan refresh() di thread latar tanpa menahan tick; True jika dijadwalkan"""
+        if time.monotonic() - self.last_refresh < self.refresh_interval or self.lock.locked():
+            return False
+        if self._thread is not None and self._thread.is_alive():
+            return False
+        self.last_refresh = time.monotonic()
+        self._thread = threading.Thread(target=self._refresh_background, name=f"online-{self.pair}", daemon=True)
+        self._thread.start()
+        return True
+
+    def predict(self, fitur):
+        """Prediksi satu vektor fitur (urutan FEATURE_NAMES), atau None jika forest belum siap"""
+        if not self.forest.ready:
+            return None
+        return float(self.forest.predict([fitur])[0])
+
+
+if __name__ == "__main__":
+    # Forest hasil seed harus memprediksi sama persis dengan artefaknya, lalu
+    # pohon tertua tergantikan dan ukuran forest kembali ke n_trees
+    import os
+    import tempfile
+    from sklearn.ensemble import RandomForestRegressor
+    from model_artifact import ModelArtifact, save_forest
+
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(3000, len(FEATURE_NAMES)))
+    y = X[:, 0] * 3 + X[:, 1] ** 2 + rng.normal(scale=0.1, size=len(X))
+    model = RandomForestRegressor(n_estimators=30, max_depth=8, random_state=0).fit(X[:2000], y[:2000])
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "model.model")
+        save_forest(model, FEATURE_NAMES, path)
+        artifact = ModelArtifact(path)
+        forest = OnlineForest(n_trees=20, window=1000, update_every=50)
+        forest.seed(artifact)
+        assert np.allclose(forest.predict(X[2000:]), artifact.predict(X[2000:]))
+        assert np.allclose(forest.predict(X[2000:]), model.predict(X[2000:]))
+
+    # Regime baru: target berbalik arah; forest online harus menyusul
+    y_baru = -X[:, 0] * 3 + X[:, 1] ** 2
+    galat_awal = np.abs(forest.predict(X[2000:]) - y_baru[2000:]).mean()
+    for mulai in range(0, 2000, 10):
+        forest.learn(X[mulai:mulai + 10], y_baru[mulai:mulai + 10])
+    assert len(forest.trees) == forest.n_trees, len(forest.trees)
+    galat_akhir = np.abs(forest.predict(X[2000:]) - y_baru[2000:]).mean()
+    assert galat_akhir < galat_awal / 3, (galat_awal, galat_akhir)
+    print(f"✅ OnlineForest: seed sama dengan artefak, MAE regime baru {galat_awal:.3f} -> {galat_akhir:.3f} "
+          f"setelah {forest.fits} pohon baru")
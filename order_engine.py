@@ -0,0 +1,476 @@
+import asyncio
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import requests
+from api_utils import IndodaxAPIError, split_pair
+from log_config import get_logger
+from metrics import METRICS, inc
+
+log = get_logger("orders")
+
+TERMINAL_STATUSES = {"filled", "cancelled", "rejected"}
+
+
+class Order:
+    """Order limit di sisi klien.
+
+    Objeknya tetap sama ketika order di-cancel/replace: order_id dan harga
+    berganti, sedangkan filled dan cost terakumulasi dari semua leg.
+    """
+    def __init__(self, pair, side, price, amount, client_order_id=None, stale_after=None):
+        self.pair = pair
+        self.side = side
+        self.price = price
+        self.amount = amount
+        self.client_order_id = client_order_id or f"ai-{uuid.uuid4().hex[:16]}"
+        self.stale_after = stale_after
+        self.status = "pending"
+        self.order_id = None
+        self.exchange_ids = []
+        self.leg_amount = amount
+        self.leg_filled = 0.0
+        self.filled = 0.0
+        self.cost = 0.0
+        self.replaces = 0
+        self.misses = 0
+        self.error = None
+        self.created = time.perf_counter()
+        self.acked = None
+        self.closed = None
+        self.done = threading.Event()
+
+    @property
+    def remaining(self):
+        return max(self.amount - self.filled, 0.0)
+
+    @property
+    def avg_price(self):
+        return self.cost / self.filled if self.filled else None
+
+    @property
+    def leg_client_id(self):
+        return self.client_order_id if self.replaces == 0 else f"{self.client_order_id}-r{self.replaces}"
+
+    def wait(self, timeout=None):
+        """Menunggu sampai order selesai (filled/cancelled/rejected); True jika selesai"""
+        return self.done.wait(timeout)
+
+    def __repr__(self):
+        return (f"Order({self.side} {self.pair} {self.filled:.8f}/{self.amount:.8f} @ {self.price}, "
+                f"status={self.status}, id={self.order_id})")
+
+
+class OrderEngine:
+    """Subsistem eksekusi: antrean order async, pelacakan fill, dan cancel/replace.
+
+    submit() aman dipanggil dari thread mana pun dan langsung mengembalikan
+    Order; worker di event loop mengirimkannya ke API private (tanda tangan
+    dan timestamp unik diurus IndodaxAPI.private). Poller membaca
+    openOrders per pair yang punya order aktif, dan order yang hilang dari
+    daftar itu dicocokkan dengan orderHistory (fallback getOrder) untuk
+    status akhirnya. Order yang belum terisi setelah stale_after detik
+    di-cancel lalu dikirim ulang untuk sisa jumlahnya pada harga reprice()
+    (default: sisi seberang quote terakhir), paling banyak max_replaces kali.
+    Leg yang statusnya tidak pasti (request trade gagal di jaringan) dicari
+    lewat client_order_id dan baru dianggap ditolak setelah max_misses kali
+    berturut-turut tidak ditemukan di openOrders maupun orderHistory.
+
+    Metrik: order_roundtrip_seconds (submit sampai ack bursa) dan
+    order_fill_seconds (submit sampai status akhir), keduanya per side.
+    """
+    def __init__(self, api, workers=2, poll_interval=1.0, stale_after=30.0, max_replaces=3, reprice=None,
+                 max_misses=3):
+        self.api = api
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self.max_replaces = max_replaces
+        self.max_misses = max_misses
+        self.reprice = reprice or self.reprice_to_touch
+        self.orders = {}
+        self.active = set()
+        self.lock = threading.Lock()
+        self.loop = None
+        self.queue = None
+        self.executor = None
+        self.waiters = {}
+        self.tasks = []
+        self.roundtrip = []
+
+    def _call(self, fn, *args):
+        # Executor sendiri: pemanggil yang menunggu order di thread pool default tidak bisa membuatnya macet
+        return self.loop.run_in_executor(self.executor, fn, *args)
+
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+        self.executor = ThreadPoolExecutor(max_workers=self.workers + 2, thread_name_prefix="orders")
+        self.tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self.tasks.append(asyncio.create_task(self._poller()))
+
+    async def stop(self, cancel_open=True):
+        """Menghentikan worker dan poller; cancel_open membatalkan order yang masih terbuka di bursa"""
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        if cancel_open:
+            for order in list(self.active):
+                await self._call(self.cancel_sync, order)
+        self.executor.shutdown(wait=True)
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    def submit(self, pair, side, price, amount, stale_after=None):
+        """Mengantrekan order limit; aman dipanggil dari thread lain"""
+        if self.loop is None:
+            raise RuntimeError("OrderEngine belum dijalankan (await engine.start())")
+        order = Order(pair, side, price, amount, stale_after=stale_after)
+        with self.lock:
+            self.orders[order.client_order_id] = order
+            self.active.add(order)
+        inc("orders_total", side=side)
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, order)
+        return order
+
+    async def wait(self, order, timeout=None):
+        """Menunggu order selesai di event loop tanpa memakai thread; mengembalikan order"""
+        if not order.done.is_set():
+            future = self.loop.create_future()
+            self.waiters.setdefault(order, []).append(future)
+            try:
+                await asyncio.wait_for(asyncio.shield(future), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return order
+
+    def _notify(self, order):
+        for future in self.waiters.pop(order, []):
+            if not future.done():
+                future.set_result(order)
+
+    def cancel_sync(self, order):
+        """Membatalkan order (blocking); sisa yang sudah terisi tetap tercatat"""
+        with self.lock:
+            if order.status in TERMINAL_STATUSES:
+                return order
+            order_id = order.order_id
+            unknown = order.status == "unknown"
+        if unknown:
+            # Request trade gagal di jaringan: order mungkin tetap sampai ke bursa
+            order_id = self._resolve_unknown(order)
+        if order_id is None:
+            if unknown:
+                log.warning("Order %s tidak ditemukan di bursa saat dibatalkan", order.leg_client_id,
+                            extra={"pair": order.pair})
+            self._finish(order, "cancelled")
+            return order
+        if order.status in TERMINAL_STATUSES:
+            return order
+        self._cancel_leg(order, order_id)
+        if order.status not in TERMINAL_STATUSES:
+            self._finish(order, "filled" if order.remaining <= order.amount * 1e-9 else "cancelled")
+        return order
+
+    async def cancel(self, order):
+        return await self._call(self.cancel_sync, order)
+
+    def _lookup_client(self, pair, client_id):
+        """Mencari leg lewat client_order_id di openOrders lalu orderHistory; None jika tidak ada"""
+        for daftar in (self.api.open_orders(pair), self.api.order_history(pair)):
+            for data in daftar:
+                if data.get("client_order_id") == client_id:
+                    return data
+        return None
+
+    def _resolve_unknown(self, order):
+        """Mengakui leg berstatus unknown yang ternyata ada di bursa; mengembalikan order_id atau None"""
+        data = self._lookup_client(order.pair, order.leg_client_id)
+        if data is None:
+            return None
+        order_id = str(data["order_id"])
+        self._ack(order, order_id)
+        if data.get("status") not in (None, "open"):
+            self._settle(order, data, split_pair(order.pair)[0])
+        return order_id
+
+    def reprice_to_touch(self, order):
+        """Harga baru untuk order basi: ask terakhir untuk buy, bid terakhir untuk sell"""
+        quote = self.api.get_quote(order.pair)
+        return quote["sell"] if order.side == "buy" else quote["buy"]
+
+    async def _worker(self):
+        while True:
+            order = await self.queue.get()
+            try:
+                await self._call(self._place, order)
+            except Exception as e:
+                log.exception("Order %s gagal diproses: %s", order.client_order_id, e, extra={"pair": order.pair})
+                self._finish(order, "rejected", error=str(e))
+
+    def _place(self, order):
+        with self.lock:
+            if order.status in TERMINAL_STATUSES:
+                return
+            order.leg_amount = order.remaining
+            order.leg_filled = 0.0
+        try:
+            hasil = self.api.create_order(order.pair, order.side, order.price, order.leg_amount, order.leg_client_id)
+        except IndodaxAPIError as e:
+            log.error("Order %s %s ditolak: %s", order.side, order.pair, e, extra={"pair": order.pair, "reason": e.code})
+            self._finish(order, "rejected", error=str(e))
+            return
+        except requests.RequestException as e:
+            # Tidak diketahui apakah order sampai ke bursa: poller mencarinya lewat client_order_id
+            log.warning("Status order %s tidak pasti: %s", order.leg_client_id, e, extra={"pair": order.pair})
+            with self.lock:
+                order.status = "unknown"
+            return
+        self._ack(order, str(hasil["order_id"]))
+
+    def _ack(self, order, order_id):
+        now = time.perf_counter()
+        # Pemeriksaan status dan pembukaan leg dalam satu lock: cancel_sync yang menutup order
+        # di antaranya tidak boleh membuat order terbuka lagi di luar self.active
+        with self.lock:
+            dibatalkan = order.status in TERMINAL_STATUSES
+            if not dibatalkan:
+                order.order_id = order_id
+                if order_id not in order.exchange_ids:
+                    order.exchange_ids.append(order_id)
+                order.status = "open"
+                order.acked = now
+                order.misses = 0
+        if dibatalkan:
+            # Order dibatalkan klien saat request trade masih berjalan
+            log.warning("Order %s diterima setelah dibatalkan, membatalkan di bursa", order_id, extra={"pair": order.pair})
+            try:
+                self.api.cancel_order(order.pair, order_id, order.side)
+            except IndodaxAPIError as e:
+                log.error("Cancel order %s gagal: %s", order_id, e, extra={"pair": order.pair, "reason": e.code})
+            return
+        if order.replaces == 0:
+            self.roundtrip.append(now - order.created)
+            METRICS.observe("order_roundtrip_seconds", now - order.created, side=order.side)
+        log.info("Order %s %s %s @ %s diterima (id %s)", order.side, order.leg_amount, order.pair, order.price, order_id,
+                 extra={"pair": order.pair, "price": order.price, "status": "open"})
+
+    def _finish(self, order, status, error=None):
+        with self.lock:
+            if order.status in TERMINAL_STATUSES:
+                return
+            order.status = status
+            order.error = error
+            order.closed = time.perf_counter()
+            self.active.discard(order)
+        METRICS.observe("order_fill_seconds", order.closed - order.created, side=order.side, status=status)
+        inc("orders_closed_total", side=order.side, status=status)
+        log.info("Order %s %s selesai: %s, terisi %s @ %s", order.side, order.pair, status, order.filled,
+                 order.avg_price, extra={"pair": order.pair, "status": status, "price": order.avg_price})
+        order.done.set()
+        self.loop.call_soon_threadsafe(self._notify, order)
+
+    def _update_fill(self, order, remain):
+        """Memperbarui fill leg berjalan dari sisa (remain) yang dilaporkan bursa"""
+        with self.lock:
+            leg_filled = max(order.leg_amount - remain, 0.0)
+            delta = leg_filled - order.leg_filled
+            if delta > 0:
+                order.leg_filled = leg_filled
+                order.filled += delta
+                order.cost += delta * float(order.price)
+                if order.status == "open":
+                    order.status = "partial"
+
+    async def _poller(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            pairs = {order.pair for order in list(self.active) if order.status != "pending"}
+            hasil = await asyncio.gather(*(self._call(self._reconcile, pair) for pair in pairs),
+                                         return_exceptions=True)
+            for pair, error in zip(pairs, hasil):
+                if isinstance(error, Exception):
+                    inc("order_poll_errors_total", pair=pair)
+                    log.warning("Gagal memeriksa order %s: %s", pair, error, extra={"pair": pair})
+
+    def _reconcile(self, pair):
+        """Mencocokkan order aktif pair dengan openOrders/orderHistory bursa"""
+        coin = split_pair(pair)[0]
+        terbuka = self.api.open_orders(pair)
+        by_id = {str(o["order_id"]): o for o in terbuka}
+        by_client = {o.get("client_order_id"): o for o in terbuka if o.get("client_order_id")}
+        hilang = []
+        for order in [o for o in list(self.active) if o.pair == pair]:
+            if order.status == "unknown":
+                data = by_client.get(order.leg_client_id)
+                if data is not None:
+                    self._ack(order, str(data["order_id"]))
+                else:
+                    hilang.append(order)
+                continue
+            if order.order_id is None:
+                continue
+            data = by_id.get(order.order_id)
+            if data is None:
+                hilang.append(order)
+                continue
+            self._update_fill(order, float(data[f"remain_{coin}"]))
+            batas = order.stale_after if order.stale_after is not None else self.stale_after
+            if batas and time.perf_counter() - order.acked > batas:
+                self._replace(order)
+        if not hilang:
+            return
+        riwayat = self.api.order_history(pair)
+        by_id = {str(o["order_id"]): o for o in riwayat}
+        by_client = {o.get("client_order_id"): o for o in riwayat if o.get("client_order_id")}
+        for order in hilang:
+            if order.status == "unknown":
+                data = by_client.get(order.leg_client_id)
+                if data is None:
+                    # Order yang diterima bisa belum muncul di daftar: baru ditolak setelah beberapa poll
+                    order.misses += 1
+                    if order.misses >= self.max_misses:
+                        self._finish(order, "rejected", error="order tidak ditemukan di bursa")
+                    continue
+                self._ack(order, str(data["order_id"]))
+            else:
+                data = by_id.get(order.order_id) or self.api.get_order(pair, order.order_id)
+            self._settle(order, data, coin)
+
+    def _settle(self, order, data, coin):
+        """Menutup leg yang sudah tidak terbuka di bursa sesuai status akhirnya"""
+        self._update_fill(order, float(data[f"remain_{coin}"]))
+        if data.get("status") == "open":
+            return
+        if order.remaining <= order.amount * 1e-9:
+            self._finish(order, "filled")
+        else:
+            # Dibatalkan dari luar engine (mis. lewat web); sisa tidak dikirim ulang
+            self._finish(order, "cancelled")
+
+    def _cancel_leg(self, order, order_id):
+        """Membatalkan leg berjalan lalu membaca fill akhirnya; True jika leg benar-benar dibatalkan"""
+        coin = split_pair(order.pair)[0]
+        try:
+            self.api.cancel_order(order.pair, order_id, order.side)
+            dibatalkan = True
+        except IndodaxAPIError as e:
+            # Biasanya order sudah terisi penuh sebelum cancel sampai
+            log.info("Cancel order %s gagal: %s", order_id, e, extra={"pair": order.pair, "reason": e.code})
+            dibatalkan = False
+        data = self.api.get_order(order.pair, order_id)
+        self._update_fill(order, float(data[f"remain_{coin}"]))
+        if not dibatalkan and data.get("status") != "open":
+            self._settle(order, data, coin)
+        return dibatalkan
+
+    def _replace(self, order):
+        """Cancel/replace order basi untuk sisa jumlahnya; melewati max_replaces berarti cancel"""
+        if not self._cancel_leg(order, order.order_id):
+            return
+        inc("order_cancels_total", side=order.side, reason="stale")
+        if order.remaining <= order.amount * 1e-9:
+            self._finish(order, "filled")
+            return
+        if order.replaces >= self.max_replaces:
+            self._finish(order, "cancelled", error="basi setelah batas replace")
+            return
+        harga = self.reprice(order)
+        with self.lock:
+            order.replaces += 1
+            order.price = harga if harga is not None else order.price
+            order.order_id = None
+            order.status = "pending"
+        inc("order_replaces_total", side=order.side)
+        log.info("Order %s %s diganti (ke-%d) pada harga %s untuk sisa %s", order.side, order.pair, order.replaces,
+                 order.price, order.remaining, extra={"pair": order.pair, "price": order.price})
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, order)
+
+    def latency_stats(self):
+        """Latensi round-trip order (submit sampai ack) dalam milidetik"""
+        if not self.roundtrip:
+            return {}
+        ms = np.array(self.roundtrip) * 1000
+        return {"count": len(ms), "p50_ms": round(float(np.percentile(ms, 50)), 3),
+                "p99_ms": round(float(np.percentile(ms, 99)), 3)}
+
+
+if __name__ == "__main__":
+    # Uji eksekusi terhadap bursa mock lokal: fill langsung, partial fill, cancel/replace, dan nonce konkuren
+    from api_utils import IndodaxAPI
+    from mock_exchange import start_mock_exchange
+
+    async def uji():
+        server, base_url, exchange = start_mock_exchange()
+        api = IndodaxAPI(api_url=f"{base_url}/tapi", public_url=f"{base_url}/api", quote_cache=None,
+                         public_rate_limit=(10000, 1), private_rate_limit=(10000, 1))
+        api.api_key, api.secret_key = exchange.api_key, exchange.secret_key
+        harga = exchange.prices["btcidr"]
+        async with OrderEngine(api, workers=4, poll_interval=0.05, stale_after=0.3) as engine:
+            # Order yang langsung marketable terisi penuh
+            beli = engine.submit("btcidr", "buy", harga + 1000, 0.001)
+            await engine.wait(beli, 5)
+            assert beli.status == "filled" and abs(beli.filled - 0.001) < 1e-12, beli
+
+            # Partial fill: dua langkah pencocokan masing-masing setengah sisa
+            exchange.fill_ratio = 0.5
+            jual = engine.submit("btcidr", "sell", harga + 5000, 0.002, stale_after=60)
+            await asyncio.sleep(0.2)
+            exchange.set_price("btcidr", harga + 5000)
+            await asyncio.sleep(0.2)
+            assert jual.status == "partial" and abs(jual.filled - 0.001) < 1e-12, jual
+            exchange.fill_ratio = 1.0
+            exchange.step()
+            await engine.wait(jual, 5)
+            assert jual.status == "filled" and abs(jual.filled - 0.002) < 1e-12, jual
+
+            # Order basi di bawah pasar di-cancel lalu diganti ke harga ask
+            basi = engine.submit("btcidr", "buy", harga - 10_000_000, 0.001)
+            await engine.wait(basi, 5)
+            assert basi.status == "filled" and basi.replaces == 1 and len(basi.exchange_ids) == 2, basi
+
+            # Banyak request bertanda tangan bersamaan tanpa ditolak sebagai nonce ganda
+            banyak = [engine.submit("btcidr", "buy", harga * 2, 0.0001) for _ in range(50)]
+            await asyncio.gather(*(engine.wait(o, 10) for o in banyak))
+            assert all(o.status == "filled" for o in banyak), [o for o in banyak if o.status != "filled"]
+            print(f"📊 Round-trip order: {engine.latency_stats()}")
+
+        # Status tidak pasti: request trade sampai ke bursa tapi responsnya hilang
+        create_order = api.create_order
+
+        def timeout_setelah_kirim(*args, **kwargs):
+            create_order(*args, **kwargs)
+            raise requests.ConnectionError("respons hilang")
+
+        async with OrderEngine(api, workers=2, poll_interval=60, stale_after=None) as engine:
+            api.create_order = timeout_setelah_kirim
+            hilang = engine.submit("btcidr", "buy", harga - 10_000_000, 0.001)
+            while hilang.status != "unknown":
+                await asyncio.sleep(0.01)
+            await engine.cancel(hilang)
+            assert hilang.status == "cancelled" and hilang.order_id is not None, hilang
+            assert exchange.orders[hilang.order_id]["status"] == "cancelled", exchange.orders[hilang.order_id]
+
+        # Request yang tidak pernah sampai: baru ditolak setelah max_misses poll
+        def gagal_kirim(*args, **kwargs):
+            raise requests.ConnectionError("koneksi putus")
+
+        async with OrderEngine(api, workers=2, poll_interval=0.05, stale_after=None, max_misses=3) as engine:
+            api.create_order = gagal_kirim
+            gagal = engine.submit("btcidr", "buy", harga - 10_000_000, 0.001)
+            await engine.wait(gagal, 5)
+            assert gagal.status == "rejected" and gagal.misses == 3, gagal
+        api.create_order = create_order
+        api.close()
+        server.shutdown()
+        print("✅ OrderEngine lolos uji terhadap bursa mock")
+
+    asyncio.run(uji())
@@ -0,0 +1,201 @@
+import itertools
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+import requests
+from requests.structures import CaseInsensitiveDict
+from api_utils import IndodaxAPI
+
+# Field payload private yang berubah setiap request dan tidak ikut direkam
+VOLATILE_FIELDS = {"timestamp", "nonce"}
+
+
+def _params_key(params):
+    return json.dumps({k: str(v) for k, v in sorted((params or {}).items())})
+
+
+class RecordingAPI(IndodaxAPI):
+    """IndodaxAPI yang merekam setiap respons publik dan private ke file fixture JSONL.
+
+    Header Key/Sign dan field timestamp/nonce tidak disimpan, jadi fixture
+    aman dibagikan dan bisa diputar ulang oleh ReplayAPI.
+    """
+    def __init__(self, fixture_file, **kwargs):
+        super().__init__(**kwargs)
+        self.fixture_file = fixture_file
+        self.fixture = open(fixture_file, "a")
+
+    def _record(self, entry, response):
+        try:
+            body = response.json()
+        except ValueError:
+            body = None
+        entry.update({"status": response.status_code, "etag": response.headers.get("ETag"), "body": body})
+        self.fixture.write(json.dumps(entry) + "\n")
+        self.fixture.flush()
+
+    def public_response(self, path, params=None, headers=None):
+        # Header If-None-Match tidak diteruskan supaya fixture selalu berisi body lengkap
+        response = super().public_response(path, params)
+        self._record({"kind": "GET", "path": path, "params": params or {}}, response)
+        return response
+
+    def send_request(self, payload, headers):
+        response = super().send_request(payload, headers)
+        stabil = {k: v for k, v in payload.items() if k not in VOLATILE_FIELDS}
+        self._record({"kind": "POST", "method": payload.get("method"), "payload": stabil}, response)
+        return response
+
+    def close(self):
+        self.fixture.close()
+        super().close()
+
+
+class ReplayAPI(IndodaxAPI):
+    """Pengganti IndodaxAPI yang melayani respons dari fixture secara deterministik.
+
+    - trades/{pair}: dilayani dari gabungan semua trade yang terekam per
+      pair, dengan semantik since/limit yang sama seperti API asli.
+    - ticker/{pair}: urutan quote terekam; jika tidak ada, jalur harga
+      disusun dari trade terekam (terlama lebih dulu). Dengan loop=True
+      jalur harga diulang dari awal setelah habis.
+    - POST: respons per method sesuai urutan rekaman, respons terakhir
+      diulang bila request lebih banyak dari rekaman.
+    Tidak ada koneksi jaringan dan rate limit tidak dipakai.
+    """
+    def __init__(self, fixture_file, loop=True, **kwargs):
+        kwargs.setdefault("public_url", "http://replay/api")
+        kwargs.setdefault("api_url", "http://replay/tapi")
+        kwargs.setdefault("public_rate_limit", (10 ** 9, 1))
+        kwargs.setdefault("private_rate_limit", (10 ** 9, 1))
+        kwargs.setdefault("quote_cache", None)
+        super().__init__(**kwargs)
+        # Tanda tangan tetap dihitung seperti biasa, meski tidak pernah dikirim
+        self.api_key = self.api_key or "replay"
+        self.secret_key = self.secret_key or "replay"
+        self.fixture_file = fixture_file
+        self.loop = loop
+        self.trades = defaultdict(dict)
+        self.tickers = defaultdict(list)
+        self.exact = defaultdict(list)
+        self.private = defaultdict(list)
+        self.calls = defaultdict(int)
+        self._load()
+        self.reset()
+
+    def _load(self):
+        with open(self.fixture_file) as f:
+            for line in f:
+                entry = json.loads(line)
+                if entry["kind"] == "POST":
+                    self.private[entry["method"]].append(entry)
+                    continue
+                endpoint, _, pair = entry["path"].partition("/")
+                if endpoint == "trades" and entry["status"] == 200:
+                    for trade in entry["body"]:
+                        self.trades[pair][int(trade["tid"])] = trade
+                elif endpoint == "ticker" and entry["status"] == 200:
+                    self.tickers[pair].append(entry)
+                self.exact[(entry["path"], _params_key(entry["params"]))].append(entry)
+        self.trades = {pair: [trades[tid] for tid in sorted(trades)] for pair, trades in self.trades.items()}
+
+    def reset(self):
+        """Mengulang jalur harga dan urutan respons dari awal"""
+        self.price_paths = {}
+        self.private_pos = defaultdict(int)
+        self.exact_pos = defaultdict(int)
+        self.calls.clear()
+
+    def _response(self, status, body, etag=None, url=""):
+        response = requests.Response()
+        response.status_code = status
+        response._content = json.dumps(body).encode() if body is not None else b""
+        response.headers = CaseInsensitiveDict({"Content-Type": "application/json"})
+        if etag:
+            response.headers["ETag"] = etag
+        response.url = url
+        response.encoding = "utf-8"
+        return response
+
+    def _next(self, entries, positions, key):
+        i = positions[key]
+        positions[key] = i + 1
+        return entries[min(i, len(entries) - 1)]
+
+    def _ticker(self, pair):
+        path = self.price_paths.get(pair)
+        if path is None:
+            if self.tickers.get(pair):
+                quotes = [(e["body"], e["etag"]) for e in self.tickers[pair]]
+            else:
+                quotes = [({"ticker": {"last": t["price"], "buy": t["price"], "sell": t["price"],
+                                       "server_time": int(t["date"])}}, f'"{t["tid"]}"')
+                          for t in self.trades.get(pair, [])]
+            if not quotes:
+                raise KeyError(f"Fixture {self.fixture_file} tidak memuat harga untuk {pair}")
+            path = self.price_paths[pair] = itertools.cycle(quotes) if self.loop else iter(quotes)
+        try:
+            return next(path)
+        except StopIteration:
+            raise EOFError(f"Jalur harga replay {pair} sudah habis")
+
+    def public_response(self, path, params=None, headers=None):
+        self.calls[path.split("/")[0]] += 1
+        endpoint, _, pair = path.partition("/")
+        url = f"{self.public_url}/{path}"
+        if endpoint == "trades" and pair in self.trades:
+            params = params or {}
+            limit = int(params.get("limit", 1000))
+            trades = self.trades[pair]
+            if params.get("since") is not None:
+                since = int(params["since"])
+                body = [t for t in trades if int(t["tid"]) > since][:limit]
+            else:
+                body = trades[::-1][:limit]
+            return self._response(200, body, url=url)
+        if endpoint == "ticker":
+            body, etag = self._ticker(pair)
+            return self._response(200, body, etag, url)
+        key = (path, _params_key(params))
+        if key in self.exact:
+            entry = self._next(self.exact[key], self.exact_pos, key)
+            response = self._response(entry["status"], entry["body"], entry["etag"], url)
+            response.raise_for_status()
+            return response
+        response = self._response(404, {"error": "not_in_fixture"}, url=url)
+        response.raise_for_status()
+
+    def send_request(self, payload, headers):
+        method = payload.get("method")
+        self.calls[method] += 1
+        if not self.private.get(method):
+            return self._response(200, {"success": 0, "error": f"Method {method} tidak ada di fixture"})
+        entry = self._next(self.private[method], self.private_pos, method)
+        return self._response(entry["status"], entry["body"], entry["etag"])
+
+
+def record_session(fixture_file, pairs=("btcidr",), trades_limit=1000, ticks=50, interval=1.0, api=None):
+    """Merekam snapshot trade, `ticks` quote ticker per pair, dan getInfo ke fixture_file"""
+    api = api or RecordingAPI(fixture_file)
+    try:
+        for pair in pairs:
+            api.get_trades(pair, limit=trades_limit)
+        if api.api_key and api.secret_key:
+            api.get_balance()
+        for i in range(ticks):
+            for pair in pairs:
+                api.fetch_quote(pair)
+            if i + 1 < ticks:
+                time.sleep(interval)
+    finally:
+        api.close()
+    print(f"✅ Fixture replay disimpan di {fixture_file}")
+
+
+if __name__ == "__main__":
+    # python replay.py <fixture.jsonl> [pair ...] : merekam pasar live ke fixture
+    fixture = sys.argv[1] if len(sys.argv) > 1 else os.path.join("fixtures", "market_btcidr.jsonl")
+    os.makedirs(os.path.dirname(fixture) or ".", exist_ok=True)
+    record_session(fixture, tuple(sys.argv[2:]) or ("btcidr",))
@@ -0,0 +1,115 @@
+import multiprocessing
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from log_config import get_logger, setup_logging
+
+log = get_logger("retrain")
+
+
+def _train_worker(pair):
+    """Dijalankan di proses terpisah: melatih ulang model dari HistoryStore"""
+    from ai_model import PricePredictor
+
+    # Proses spawn tidak mewarisi konfigurasi logging; file sendiri supaya
+    # rotasi tidak berebut file dengan proses utama
+    setup_logging(f"retrain_{pair}.log")
+    return PricePredictor(None, pair).train_model()
+
+
+class RetrainScheduler:
+    """Menjadwalkan pelatihan ulang model di proses terpisah.
+
+    Pelatihan dipicu saat model belum ada, setiap `interval` detik (None
+    menonaktifkan jadwal, mis. untuk model online), atau ketika rata-rata
+    galat prediksi bergulir naik melewati `drift_ratio` kali galat dasar. Model baru ditukar secara atomik oleh
+    PricePredictor.train_model, jadi bot tetap memakai model lama selama
+    pelatihan berjalan.
+    """
+    def __init__(self, pair="btcidr", interval=6 * 3600, drift_ratio=1.5, error_window=500):
+        self.pair = pair
+        self.interval = interval
+        self.drift_ratio = drift_ratio
+        self.errors = deque(maxlen=error_window)
+        self.baseline_error = None
+        self.last_started = time.monotonic()
+        self.future = None
+        self.executor = None
+        self.lock = threading.Lock()
+
+    def is_training(self):
+        return self.future is not None and not self.future.done()
+
+    def request(self, reason):
+        """Memulai pelatihan jika belum ada yang berjalan; tidak pernah memblokir"""
+        with self.lock:
+            if self.is_training():
+                return False
+            if self.executor is None:
+                # spawn: proses anak tidak mewarisi thread event loop / session HTTP
+                self.executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+            print(f"[🔄] Pelatihan ulang model {self.pair} dimulai di background ({reason}).")
+            log.info("Pelatihan ulang model %s dimulai: %s", self.pair, reason, extra={"pair": self.pair, "reason": reason})
+            self.last_started = time.monotonic()
+            self.future = self.executor.submit(_train_worker, self.pair)
+            self.future.add_done_callback(self._on_done)
+            return True
+
+    def _on_done(self, future):
+        try:
+            score = future.result()
+        except Exception as e:
+            log.error("Pelatihan ulang model %s gagal: %s", self.pair, e, extra={"pair": self.pair})
+            return
+        if score is not None:
+            log.info("Model %s diperbarui di background dengan score: %s", self.pair, score, extra={"pair": self.pair})
+            # Galat dasar diukur ulang untuk model baru
+            self.errors.clear()
+            self.baseline_error = None
+
+    def maybe_retrain(self):
+        """Memicu pelatihan sesuai jadwal interval"""
+        if self.interval is not None and time.monotonic() - self.last_started >= self.interval:
+            return self.request("jadwal berkala")
+        return False
+
+    def record_error(self, predicted, actual):
+        """Mencatat galat relatif prediksi dan memicu pelatihan saat drift terdeteksi"""
+        if actual:
+            self.errors.append(abs(predicted - actual) / abs(actual))
+        return self._check_drift()
+
+    def record_errors(self, predicted, actual):
+        """record_error untuk banyak pasangan sekaligus; drift diperiksa sekali di akhir"""
+        predicted = np.asarray(predicted, dtype=np.float64)
+        actual = np.asarray(actual, dtype=np.float64)
+        valid = actual != 0
+        self.errors.extend((np.abs(predicted[valid] - actual[valid]) / np.abs(actual[valid])).tolist())
+        return self._check_drift()
+
+    def _check_drift(self):
+        if len(self.errors) < self.errors.maxlen:
+            return False
+        error = float(np.mean(self.errors))
+        if self.baseline_error is None:
+            self.baseline_error = error
+            return False
+        if error > self.drift_ratio * self.baseline_error:
+            return self.request(f"drift: galat {error:.5f} vs dasar {self.baseline_error:.5f}")
+        return False
+
+    def shutdown(self, wait=False):
+        if self.executor is not None:
+            self.executor.shutdown(wait=wait, cancel_futures=True)
+
+
+_schedulers = {}
+
+
+def get_scheduler(pair):
+    """Satu scheduler per pair untuk seluruh proses"""
+    if pair not in _schedulers:
+        _schedulers[pair] = RetrainScheduler(pair)
+    return _schedulers[pair]
@@ -0,0 +1,196 @@
+import asyncio
+import time
+import numpy as np
+import pandas as pd
+from analysis import entry_signal
+from feature_pipeline import FEATURE_NAMES, FEATURE_VERSION, compute_features_wide
+from model_registry import ModelRegistry
+from log_config import get_logger
+from metrics import inc, timer
+
+log = get_logger("scanner")
+
+SCAN_COLUMNS = ["price", "prediction", "expected_return", "signal", "score", "model",
+                "RSI", "SMA", "spread", "vol_idr"]
+
+
+class MarketScanner:
+    """Meranking semua pair Indodax setiap siklus dari satu request ticker_all.
+
+    Harga setiap pair disimpan dalam satu matriks (pair x window) yang rata
+    kanan: baris pair hanya digeser jika harga terakhirnya berubah (ada
+    trade baru), sehingga deretnya mendekati deret trade yang dipakai saat
+    training. Fitur semua pair dihitung sekaligus dengan
+    compute_features_wide, lalu setiap model pair memprediksi barisnya
+    dalam satu pass. Pair tanpa model (atau model versi fitur lain) diberi
+    skor momentum price_change_7d dan ditandai model=False. Model disimpan
+    di ModelRegistry sendiri karena REGISTRY global hanya memuat 8 model.
+    """
+    def __init__(self, api, window=200, top_n=10, min_volume_idr=100_000_000, max_spread=0.01,
+                 model_pattern="price_predictor_{pair}.model", max_models=512):
+        self.api = api
+        self.window = window
+        self.top_n = top_n
+        self.min_volume_idr = min_volume_idr
+        self.max_spread = max_spread
+        self.model_pattern = model_pattern
+        self.registry = ModelRegistry(max_models=max_models)
+        self.pairs = []
+        self.index = {}
+        self.history = np.empty((0, window))
+        self.tickers = pd.DataFrame()
+        self.last_scan = None
+
+    def __len__(self):
+        return len(self.pairs)
+
+    def _rows(self, pairs):
+        """Indeks baris untuk pairs; pair baru mendapat baris NaN"""
+        baru = [pair for pair in pairs if pair not in self.index]
+        if baru:
+            for pair in baru:
+                self.index[pair] = len(self.pairs)
+                self.pairs.append(pair)
+            self.history = np.vstack([self.history, np.full((len(baru), self.window), np.nan)])
+        return np.fromiter((self.index[pair] for pair in pairs), dtype=np.int64, count=len(pairs))
+
+    def update(self, tickers):
+        """Menambahkan snapshot ticker ke matriks harga; mengembalikan jumlah pair yang berubah"""
+        pairs = list(tickers)
+        rows = self._rows(pairs)
+        last = np.fromiter((tickers[pair]["last"] for pair in pairs), dtype=np.float64, count=len(pairs))
+        berubah = self.history[rows, -1] != last
+        rows, last = rows[berubah], last[berubah]
+        self.history[rows, :-1] = self.history[rows, 1:]
+        self.history[rows, -1] = last
+        self.tickers = pd.DataFrame.from_dict(tickers, orient="index")
+        return len(rows)
+
+    def seed(self, pair, prices):
+        """Mengisi riwayat pair dari deret harga lama (terlama lebih dulu), mis. dari trade REST"""
+        row = self._rows([pair])[0]
+        prices = np.asarray(prices, dtype=np.float64)[-self.window:]
+        self.history[row] = np.nan
+        self.history[row, self.window - len(prices):] = prices
+
+    def warmup(self, pairs=None, limit=None):
+        """Mengisi riwayat dari /api/trades untuk pairs (default: semua pair yang sudah dikenal).
+
+        Satu request per pair dan tunduk pada rate limit publik, jadi
+        sebaiknya hanya untuk pair yang likuid; pair lain terisi sendiri
+        seiring siklus scan.
+        """
+        for pair in pairs if pairs is not None else list(self.pairs):
+            try:
+                trades = self.api.get_trades(pair, limit=limit or self.window)
+            except Exception as e:
+                log.warning("Warmup %s gagal: %s", pair, e, extra={"pair": pair})
+                continue
+            if trades:
+                trades = sorted(trades, key=lambda t: int(t["tid"]))
+                self.seed(pair, [float(t["price"]) for t in trades])
+
+    def features(self):
+        """Fitur baris terakhir semua pair sebagai DataFrame (index = pair, kolom = FEATURE_NAMES)"""
+        wide = compute_features_wide(pd.DataFrame(self.history.T, columns=self.pairs))
+        return pd.DataFrame({name: wide[name].iloc[-1] for name in FEATURE_NAMES})
+
+    def _model(self, pair):
+        loaded = self.registry.get(self.model_pattern.format(pair=pair))
+        if loaded is None or loaded.header.get("feature_version", FEATURE_VERSION) != FEATURE_VERSION:
+            return None
+        return loaded
+
+    def predict(self, fitur):
+        """Prediksi harga untuk setiap pair yang punya model dan fitur lengkap, selain itu NaN"""
+        X = fitur[FEATURE_NAMES].to_numpy(dtype=np.float64)
+        prediksi = np.full(len(X), np.nan)
+        # Baris dikelompokkan per artefak supaya setiap model memprediksi semua barisnya sekaligus
+        kelompok = {}
+        for row in np.flatnonzero(~np.isnan(X).any(axis=1)):
+            loaded = self._model(fitur.index[row])
+            if loaded is not None:
+                kelompok.setdefault(id(loaded), (loaded, []))[1].append(row)
+        for loaded, rows in kelompok.values():
+            kolom = [FEATURE_NAMES.index(name) for name in loaded.feature_names]
+            prediksi[rows] = loaded.predict(X[np.ix_(rows, kolom)])
+        return pd.Series(prediksi, index=fitur.index, name="prediction")
+
+    def score(self):
+        """Skor dan sinyal semua pair; DataFrame SCAN_COLUMNS urut dari kandidat terbaik"""
+        fitur = self.features()
+        hasil = fitur[["price", "RSI", "SMA"]].copy()
+        hasil["prediction"] = self.predict(fitur)
+        hasil["model"] = hasil["prediction"].notna()
+        hasil["expected_return"] = hasil["prediction"] / hasil["price"] - 1
+        hasil["signal"] = entry_signal(hasil["prediction"], hasil["price"], hasil["RSI"], hasil["SMA"])
+        hasil["score"] = hasil["expected_return"].where(hasil["model"], fitur["price_change_7d"])
+        tickers = self.tickers.reindex(hasil.index)
+        hasil["spread"] = (tickers["sell"] - tickers["buy"]) / tickers["last"]
+        hasil["vol_idr"] = tickers["vol_idr"]
+        hasil = hasil[SCAN_COLUMNS].dropna(subset=["score"])
+        return hasil.sort_values(["signal", "score"], ascending=False)
+
+    def candidates(self, ranked):
+        """Kandidat entry: likuid, spread sempit, dan tidak diveto sinyal AI"""
+        lolos = ((ranked["vol_idr"] >= self.min_volume_idr) & (ranked["spread"] <= self.max_spread)
+                 & (ranked["signal"] >= 0))
+        return ranked[lolos].head(self.top_n)
+
+    def scan(self):
+        """Satu siklus: ambil ticker_all, perbarui riwayat, ranking; mengembalikan kandidat"""
+        with timer("scan_seconds"):
+            with timer("scan_stage_seconds", stage="fetch"):
+                tickers = self.api.get_tickers()
+            with timer("scan_stage_seconds", stage="update"):
+                berubah = self.update(tickers)
+            with timer("scan_stage_seconds", stage="score"):
+                ranked = self.score()
+            kandidat = self.candidates(ranked)
+        inc("scan_cycles_total")
+        self.last_scan = {"time": time.time(), "pairs": len(tickers), "changed": berubah,
+                          "scored": len(ranked), "candidates": len(kandidat)}
+        log.info("Scan %d pair: %d berubah, %d terskor, %d kandidat", len(tickers), berubah, len(ranked),
+                 len(kandidat))
+        return kandidat
+
+    async def run(self, interval=2.0, on_result=None, cycles=None):
+        """Scan berkala; on_result(kandidat) dipanggil setiap siklus"""
+        siklus = 0
+        while cycles is None or siklus < cycles:
+            mulai = time.perf_counter()
+            try:
+                kandidat = await asyncio.to_thread(self.scan)
+            except Exception as e:
+                inc("scan_errors_total")
+                log.error("Scan gagal: %s", e)
+            else:
+                if on_result is not None:
+                    on_result(kandidat)
+            siklus += 1
+            await asyncio.sleep(max(0.0, interval - (time.perf_counter() - mulai)))
+
+
+def run_scanner(api, interval=2.0, cycles=None, top_n=10, warmup_top=0):
+    """Menjalankan scanner dan mencetak kandidat setiap siklus.
+
+    warmup_top > 0 mengisi riwayat pair dengan volume terbesar dari
+    /api/trades, supaya fitur langsung tersedia tanpa menunggu siklus.
+    """
+    scanner = MarketScanner(api, top_n=top_n)
+    if warmup_top:
+        scanner.update(api.get_tickers())
+        teratas = scanner.tickers["vol_idr"].nlargest(warmup_top).index
+        scanner.warmup(list(teratas))
+
+    def tampilkan(kandidat):
+        info = scanner.last_scan
+        print(f"\n🔎 {info['pairs']} pair dipindai, {info['scored']} terskor, {info['candidates']} kandidat")
+        if not kandidat.empty:
+            print(kandidat[["price", "expected_return", "signal", "score", "model", "spread"]].to_string())
+
+    try:
+        asyncio.run(scanner.run(interval, tampilkan, cycles))
+    except KeyboardInterrupt:
+        print("\n⏹️ Scanner dihentikan")
+    return scanner
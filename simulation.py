@@ -1,19 +1,22 @@
-import time
+import asyncio
+import math
 from datetime import datetime
 import joblib
 import os
-import logging
 from api_utils import IndodaxAPI
-from analysis import TechnicalAnalysis
 from ai_model import PricePredictor
+from feature_pipeline import FEATURE_NAMES
 from data_collector import DataCollector
+from market_engine import MarketEngine
+from backtest import Backtester, print_report
+from retrainer import get_scheduler
+from log_config import get_logger, setup_logging
+from metrics import timer
 
-# Konfigurasi Logging
-logging.basicConfig(filename='simulation_log.log', level=logging.INFO,
-                    format='%(asctime)s - %(levelname)s - %(message)s')
+log = get_logger("simulation")
 
 class SimulationBotAI:
-    def __init__(self, api, pair="btcidr", modal=20000, stop_loss_pct=0.007, take_profit_pct=0.0001):
+    def __init__(self, api, pair="btcidr", modal=20000, stop_loss_pct=0.007, take_profit_pct=0.0001, online=False):
         self.api = api
         self.pair = pair
         self.modal = modal
@@ -21,57 +24,48 @@ class SimulationBotAI:
         self.take_profit_pct = take_profit_pct
         self.riwayat_harga = []
         self.status = "Menunggu"
-        self.analysis = TechnicalAnalysis(api, pair)
-        self.model = PricePredictor(api, pair)
+        self.model = PricePredictor(api, pair, online=online)
         self.collector = DataCollector(api, pair)
         
-    def get_historical_features(self):
-        """Mengambil data historis untuk price_change_3d, price_change_7d, dan price_change_30d"""
-        df = self.collector.get_historical_data()
-        if df is None or len(df) < 30:
-            print("[⚠️] Data historis tidak cukup. Menggunakan nilai default 0.")
-            return 0, 0, 0  # Jika tidak ada data, gunakan nilai default
-
-        df = df.sort_values(by=['date']).reset_index(drop=True)
-        price_change_3d = df['price'].pct_change(periods=3).iloc[-1]
-        price_change_7d = df['price'].pct_change(periods=7).iloc[-1]
-        price_change_30d = df['price'].pct_change(periods=30).iloc[-1]
-
-        return price_change_3d, price_change_7d, price_change_30d
-
     def ensure_model(self):
         if not self.model.is_model_trained():
             print("[⚠️] Model belum tersedia, melakukan pelatihan...")
-            logging.warning(f"Model untuk {self.pair} belum tersedia. Melakukan pelatihan...")
-            self.model.train_model()
+            log.warning("Model untuk %s belum tersedia. Melakukan pelatihan...", self.pair, extra={"pair": self.pair})
+            get_scheduler(self.pair).request("model belum tersedia")
+        else:
+            get_scheduler(self.pair).maybe_retrain()
 
-    def simulate_trade(self, mode="live"):
-        self.ensure_model()
+    def evaluate_entry(self):
+        """Menentukan apakah simulasi membuka posisi.
 
-        
-        analysis = self.analysis.analyze()
-        harga_beli = analysis['price']
-        rsi = analysis['RSI']
-        sma = analysis['SMA']
-        bb_upper = analysis['BB_Upper']
-        bb_lower = analysis['BB_Lower']
-        
-        price_change_3d, price_change_7d, price_change_30d = self.get_historical_features()
-        
+        Mengembalikan (harga_beli, jumlah_crypto, stop_loss, take_profit) atau None.
+        """
+        with timer("stage_seconds", stage="ensure_model", pair=self.pair):
+            self.ensure_model()
+
+        # Fitur live dibaca dari cache fitur yang sama dengan data latih model
+        with timer("stage_seconds", stage="features", pair=self.pair):
+            fitur = self.model.latest_features()
+        if fitur is None or any(math.isnan(v) for v in fitur.values()):
+            print("[❌] Data historis belum cukup untuk menghitung fitur. Tidak melakukan trading.")
+            return None
+        harga_beli = fitur['price']
         jumlah_crypto = self.modal / harga_beli
-        prediksi_harga = self.model.predict_price(harga_beli, rsi, sma, bb_upper, bb_lower, price_change_3d, price_change_7d, price_change_30d)
+        with timer("stage_seconds", stage="predict", pair=self.pair):
+            prediksi_harga = self.model.predict_price(*(fitur[name] for name in FEATURE_NAMES))
         stop_loss = harga_beli * (1 - self.stop_loss_pct)
         take_profit = harga_beli * (1 + self.take_profit_pct)
 
-        logging.info(f"Prediksi AI untuk {self.pair}: {prediksi_harga} | Harga Saat Ini: {harga_beli}")
+        log.info("Prediksi AI untuk %s: %s | Harga Saat Ini: %s", self.pair, prediksi_harga, harga_beli,
+                 extra={"pair": self.pair, "price": harga_beli})
 
         print(f"\nPrediksi AI: Harga akan menjadi {prediksi_harga}")
         if prediksi_harga is None:
             print("[❌] Gagal memprediksi harga. Simulasi dihentikan.")
-            return
+            return None
         elif prediksi_harga < harga_beli:
             print("[❌] AI memprediksi harga akan turun. Simulasi tidak melakukan pembelian.")
-            return
+            return None
         else:
             print("[✅] AI memprediksi harga akan naik. Melanjutkan simulasi trading.")
 
@@ -80,41 +74,39 @@ class SimulationBotAI:
         print(f"Take Profit: {take_profit}")
 
         self.collector.log_transaction("SIMULATED_BUY", harga_beli, jumlah_crypto)
+        return harga_beli, jumlah_crypto, stop_loss, take_profit
 
+    def simulate_trade(self, mode="live"):
         if mode == "historical":
-            df = self.collector.get_historical_data()
-            if df is None:
+            report = Backtester(self.model, self.modal, self.stop_loss_pct, self.take_profit_pct).run()
+            if report is None:
                 print("[❌] Tidak ada data historis.")
-                return
-            for _, row in df.iterrows():
-                harga_sekarang = row['price']
-                print(f"[SIMULASI HISTORIS] Harga Sekarang: {harga_sekarang}")
-                if harga_sekarang >= take_profit:
-                    self.collector.log_transaction("SIMULATED_SELL", harga_sekarang, jumlah_crypto)
-                    print(f"[✅] Take Profit Tercapai dalam simulasi historis di harga {harga_sekarang}!")
-                    return
-                elif harga_sekarang <= stop_loss:
-                    self.collector.log_transaction("SIMULATED_SELL", harga_sekarang, jumlah_crypto)
-                    print(f"[❌] Stop Loss Terpenuhi dalam simulasi historis di harga {harga_sekarang}!")
-                    return
-                time.sleep(0.5)
+                return None
+            print_report(report, self.pair)
+            return report
 
-        else:
-            while True:
-                harga_sekarang = self.api.get_ticker(self.pair)['price'].iloc[-1]
-                print(f"[SIMULASI LIVE] Harga Sekarang: {harga_sekarang}")
+        entry = self.evaluate_entry()
+        if entry is None:
+            return
+        harga_beli, jumlah_crypto, stop_loss, take_profit = entry
+
+        def on_tick(position, harga_sekarang):
+            self.model.observe_price(harga_sekarang)
+            # Tick dicatat oleh MarketEngine lewat logger "tick" (bisa disampling), tidak di-print
+
+        def on_close(position, harga_sekarang):
+            self.collector.log_transaction("SIMULATED_SELL", harga_sekarang, jumlah_crypto)
+            if harga_sekarang >= take_profit:
+                print(f"[✅] Take Profit Tercapai dalam simulasi live di harga {harga_sekarang}!")
+            else:
+                print(f"[❌] Stop Loss Terpenuhi dalam simulasi live di harga {harga_sekarang}!")
 
-                if harga_sekarang >= take_profit:
-                    self.collector.log_transaction("SIMULATED_SELL", harga_sekarang, jumlah_crypto)
-                    print(f"[✅] Take Profit Tercapai dalam simulasi live di harga {harga_sekarang}!")
-                    break
-                elif harga_sekarang <= stop_loss:
-                    self.collector.log_transaction("SIMULATED_SELL", harga_sekarang, jumlah_crypto)
-                    print(f"[❌] Stop Loss Terpenuhi dalam simulasi live di harga {harga_sekarang}!")
-                    break
-                time.sleep(1)
+        engine = MarketEngine(self.api, [self.pair], interval=1)
+        asyncio.run(engine.run(entry_fn=lambda pair: entry, on_close=on_close, on_tick=on_tick))
+        self.status = engine.closed_positions[-1].status
 
 if __name__ == "__main__":
+    setup_logging("simulation.log")
     api = IndodaxAPI()
     bot = SimulationBotAI(api)
     bot.simulate_trade(mode="historical")  # Ubah ke "live" untuk simulasi real-time
@@ -0,0 +1,101 @@
+import itertools
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+from analysis import entry_signal
+from backtest import run_arrays
+
+DEFAULT_GRID = {
+    "stop_loss_pct": [0.003, 0.005, 0.007, 0.01, 0.02],
+    "take_profit_pct": [0.0001, 0.001, 0.005, 0.01, 0.02],
+    "rsi_low": [30, 40, 50],
+    "rsi_high": [50, 60, 70],
+    "min_signal": [0, 1]
+}
+
+# Array harga milik proses worker, menunjuk ke shared memory milik proses induk
+_arrays = {}
+_segments = []
+
+
+def _attach(spec):
+    for name, (shm_name, dtype, length) in spec.items():
+        shm = shared_memory.SharedMemory(name=shm_name)
+        _segments.append(shm)
+        _arrays[name] = np.ndarray((length,), dtype=dtype, buffer=shm.buf)
+
+
+def _evaluate(params):
+    signal = entry_signal(_arrays["prediction"], _arrays["price"], _arrays["RSI"], _arrays["SMA"],
+                          params["rsi_low"], params["rsi_high"])
+    report = run_arrays(_arrays["price"], _arrays["date"], signal, params["modal"],
+                        params["stop_loss_pct"], params["take_profit_pct"], params["fee_pct"],
+                        params["slippage_pct"], params["min_signal"])
+    report.pop("detail")
+    return {**params, **report}
+
+
+def grid_params(grid):
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+
+def random_params(space, n, seed=42):
+    """Sampel acak: nilai berupa list dipilih salah satu, tuple (min, max) diambil uniform"""
+    rng = random.Random(seed)
+    hasil = []
+    for _ in range(n):
+        params = {}
+        for key, value in space.items():
+            params[key] = rng.uniform(*value) if isinstance(value, tuple) else rng.choice(value)
+        hasil.append(params)
+    return hasil
+
+
+class ParameterSweep:
+    """Mengevaluasi banyak kombinasi parameter risiko dan sinyal secara paralel.
+
+    Array harga, prediksi, RSI dan SMA ditaruh sekali di shared memory,
+    sehingga worker hanya menerima dict parameter, bukan salinan data.
+    """
+    def __init__(self, data, modal=20000, fee_pct=0.003, slippage_pct=0.0005, max_workers=None):
+        self.data = data
+        self.fixed = {"modal": modal, "fee_pct": fee_pct, "slippage_pct": slippage_pct}
+        self.max_workers = max_workers or os.cpu_count()
+
+    def run(self, param_list, sort_by="pnl"):
+        segments = []
+        spec = {}
+        try:
+            for name in ("price", "date", "prediction", "RSI", "SMA"):
+                array = np.ascontiguousarray(self.data[name])
+                shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+                segments.append(shm)
+                np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[:] = array
+                spec[name] = (shm.name, array.dtype.str, len(array))
+
+            tasks = [{**self.fixed, **params} for params in param_list]
+            chunksize = max(1, len(tasks) // (self.max_workers * 4))
+            with ProcessPoolExecutor(max_workers=self.max_workers, initializer=_attach, initargs=(spec,)) as pool:
+                results = list(pool.map(_evaluate, tasks, chunksize=chunksize))
+        finally:
+            for shm in segments:
+                shm.close()
+                shm.unlink()
+        return pd.DataFrame(results).sort_values(by=sort_by, ascending=False).reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    from api_utils import IndodaxAPI
+    from ai_model import PricePredictor
+    from backtest import Backtester
+
+    predictor = PricePredictor(IndodaxAPI())
+    data = Backtester(predictor).prepare()
+    if data is not None:
+        results = ParameterSweep(data).run(grid_params(DEFAULT_GRID))
+        results.to_csv(f"sweep_results_{predictor.pair}.csv", index=False)
+        print(results.head(20).to_string())
@@ -0,0 +1,148 @@
+import atexit
+import json
+import os
+import threading
+import time
+import numpy as np
+import pandas as pd
+from log_config import get_logger
+
+log = get_logger("journal")
+
+JOURNAL_COLUMNS = ["ts", "seq", "pair", "action", "price", "jumlah_crypto", "profit_loss", "profit_loss_pct"]
+
+
+class TradeJournal:
+    """Jurnal transaksi append-only dalam format JSON per baris (JSONL).
+
+    record() hanya menaruh event di buffer memori; penulisan ke disk
+    dilakukan per batch oleh thread latar ketika buffer mencapai
+    flush_size, setiap flush_interval detik, atau saat close(). Dengan
+    fsync=True setiap flush di-fsync, jadi proses yang mati mendadak
+    kehilangan paling banyak satu jendela flush. Baris terakhir yang
+    terpotong akibat crash dibuang saat jurnal dibuka kembali. Event
+    di-serialisasi di record(), jadi nilai yang tidak bisa ditulis ditolak
+    di pemanggil; batch yang gagal ditulis (OSError) dikembalikan ke
+    buffer dan dicoba lagi pada flush berikutnya.
+    """
+    def __init__(self, path, flush_size=256, flush_interval=1.0, fsync=True):
+        self.path = path
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.buffer = []
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.closed = False
+        self.seq = self._recover()
+        self.file = open(path, "ab")
+        self.thread = threading.Thread(target=self._flush_loop, name=f"journal-{os.path.basename(path)}", daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def _recover(self):
+        """Memotong baris terakhir yang tidak lengkap dan mengembalikan seq berikutnya"""
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            return 0
+        with open(self.path, "rb+") as f:
+            ukuran = f.seek(0, os.SEEK_END)
+            awal = max(0, ukuran - 65536)
+            f.seek(awal)
+            ekor = f.read()
+            batas = ekor.rfind(b"\n") + 1
+            if awal + batas < ukuran:
+                f.truncate(awal + batas)
+            baris = ekor[:batas].splitlines()
+        for line in reversed(baris):
+            try:
+                return json.loads(line)["seq"] + 1
+            except (ValueError, KeyError):
+                continue
+        return 0
+
+    def record(self, pair, action, price, jumlah_crypto, profit_loss=None, profit_loss_pct=None):
+        """Mencatat satu event transaksi; tidak menyentuh disk di thread pemanggil"""
+        with self.lock:
+            if self.closed:
+                raise ValueError(f"Jurnal {self.path} sudah ditutup")
+            event = (time.time(), self.seq, pair, action, price, jumlah_crypto, profit_loss, profit_loss_pct)
+            self.buffer.append(json.dumps(dict(zip(JOURNAL_COLUMNS, event)), default=_json_default) + "\n")
+            self.seq += 1
+            penuh = len(self.buffer) >= self.flush_size
+        if penuh:
+            self.wakeup.set()
+
+    def flush(self):
+        """Menulis isi buffer ke file sebagai satu batch"""
+        with self.write_lock:
+            with self.lock:
+                batch, self.buffer = self.buffer, []
+            if not batch:
+                return 0
+            try:
+                self.file.write("".join(batch).encode())
+                self.file.flush()
+                if self.fsync:
+                    os.fsync(self.file.fileno())
+            except OSError:
+                # Batch dikembalikan ke depan buffer supaya urutan seq tetap terjaga
+                with self.lock:
+                    self.buffer[:0] = batch
+                raise
+            return len(batch)
+
+    def _flush_loop(self):
+        while not self.closed:
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                log.exception("Flush jurnal %s gagal: %s", self.path, e)
+
+    def close(self):
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+        self.wakeup.set()
+        self.thread.join()
+        self.flush()
+        self.file.close()
+        atexit.unregister(self.close)
+
+
+def _json_default(value):
+    """Skalar NumPy (mis. float32, int64 dari DataFrame) ditulis sebagai angka Python"""
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} tidak bisa ditulis ke jurnal")
+
+
+def read_journal(path):
+    """Membaca jurnal ke DataFrame; baris rusak dilewati"""
+    rows = []
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            for line in f:
+                try:
+                    rows.append(json.loads(line))
+                except ValueError:
+                    continue
+    df = pd.DataFrame(rows, columns=JOURNAL_COLUMNS)
+    df["ts"] = pd.to_datetime(df["ts"], unit="s")
+    return df
+
+
+_journals = {}
+_journals_lock = threading.Lock()
+
+
+def get_journal(pair, root="journal"):
+    """Satu jurnal per pair untuk seluruh proses"""
+    with _journals_lock:
+        if pair not in _journals or _journals[pair].closed:
+            os.makedirs(root, exist_ok=True)
+            _journals[pair] = TradeJournal(os.path.join(root, f"transactions_{pair}.jsonl"))
+        return _journals[pair]
@@ -0,0 +1,224 @@
+import heapq
+import itertools
+
+# Alasan trigger yang dikembalikan on_price()
+STOP, TARGET, TRAILING = "stop", "target", "trailing"
+
+
+class Trigger:
+    """Level stop/target (dan trailing stop opsional) milik satu posisi"""
+    __slots__ = ("key", "stop", "target", "trail_pct", "entry", "active")
+
+    def __init__(self, key, stop=None, target=None, trail_pct=None, entry=None):
+        self.key = key
+        self.stop = stop
+        self.target = target
+        self.trail_pct = trail_pct
+        self.entry = entry
+        self.active = True
+
+
+class _Bucket:
+    """Kelompok trailing stop dengan high-water mark yang sama"""
+    __slots__ = ("high", "triggers", "alive")
+
+    def __init__(self, high, triggers):
+        self.high = high
+        self.triggers = triggers
+        self.alive = True
+
+
+class _TrailingGroup:
+    """Trailing stop dengan persentase yang sama.
+
+    Setelah harga P, semua posisi yang high-water mark-nya < P punya
+    high-water mark P, jadi bucket-bucket itu digabung menjadi satu
+    bucket. Heap min (untuk menaikkan high) dan heap max (untuk memicu,
+    harga <= high * (1 - pct)) berisi bucket, dengan lazy deletion.
+    """
+    def __init__(self, pct):
+        self.pct = pct
+        self.by_low = []
+        self.by_high = []
+        self.seq = itertools.count()
+        self.dead = 0
+
+    def push(self, bucket):
+        n = next(self.seq)
+        heapq.heappush(self.by_low, (bucket.high, n, bucket))
+        heapq.heappush(self.by_high, (-bucket.high, n, bucket))
+
+    def add(self, trigger, high):
+        self.push(_Bucket(high, [trigger]))
+
+    def raise_to(self, harga):
+        gabung = []
+        while self.by_low and self.by_low[0][0] < harga:
+            bucket = heapq.heappop(self.by_low)[2]
+            if bucket.alive:
+                bucket.alive = False
+                gabung.append(bucket.triggers)
+        if gabung:
+            # Gabung kecil ke besar supaya total biaya penggabungan O(n log n)
+            gabung.sort(key=len, reverse=True)
+            triggers = gabung[0]
+            for lain in gabung[1:]:
+                triggers.extend(lain)
+            self.push(_Bucket(harga, triggers))
+            # Bucket yang digabung masih tertinggal di heap max
+            self.dead += len(gabung)
+            if self.dead > 64 and self.dead > 2 * len(self.by_low):
+                self.compact()
+
+    def fire(self, harga, hasil):
+        batas = harga / (1 - self.pct)
+        while self.by_high and -self.by_high[0][0] >= batas:
+            bucket = heapq.heappop(self.by_high)[2]
+            if not bucket.alive:
+                continue
+            bucket.alive = False
+            for trigger in bucket.triggers:
+                if trigger.active:
+                    trigger.active = False
+                    hasil.append((trigger.key, TRAILING))
+
+    def compact(self):
+        hidup = [entry for entry in self.by_low if entry[2].alive]
+        for _, _, bucket in hidup:
+            bucket.triggers = [t for t in bucket.triggers if t.active]
+        hidup = [entry for entry in hidup if entry[2].triggers]
+        self.by_low = hidup
+        heapq.heapify(self.by_low)
+        self.by_high = [(-high, n, bucket) for high, n, bucket in hidup]
+        heapq.heapify(self.by_high)
+        self.dead = 0
+
+
+class TriggerBook:
+    """Buku stop/target semua posisi terbuka satu pair.
+
+    Stop loss disimpan di heap max (terpicu jika harga <= stop) dan take
+    profit di heap min (terpicu jika harga >= target), sehingga satu harga
+    hanya menyentuh trigger yang dilewatinya: O(log n + k) per tick, tidak
+    bergantung pada jumlah posisi. Trailing stop dikelompokkan per
+    persentase (lihat _TrailingGroup). Trigger yang dihapus atau sudah
+    terpicu lewat sisi lain dibuang secara lazy dan heap dipadatkan jika
+    entri basi terlalu banyak.
+    """
+    def __init__(self, pair=None):
+        self.pair = pair
+        self.stops = []
+        self.targets = []
+        self.trailing = {}
+        self.triggers = {}
+        self.seq = itertools.count()
+        self.stale = 0
+
+    def __len__(self):
+        return len(self.triggers)
+
+    def __contains__(self, key):
+        return key in self.triggers
+
+    def add(self, key, stop=None, target=None, trail_pct=None, price=None):
+        """Mendaftarkan posisi `key`; price adalah harga awal high-water mark trailing stop"""
+        if key in self.triggers:
+            self.remove(key)
+        trigger = Trigger(key, stop, target, trail_pct, price)
+        n = next(self.seq)
+        if stop is not None:
+            heapq.heappush(self.stops, (-stop, n, trigger))
+        if target is not None:
+            heapq.heappush(self.targets, (target, n, trigger))
+        if trail_pct:
+            if price is None:
+                raise ValueError("Trailing stop membutuhkan price awal")
+            group = self.trailing.get(trail_pct)
+            if group is None:
+                group = self.trailing[trail_pct] = _TrailingGroup(trail_pct)
+            group.add(trigger, price)
+        self.triggers[key] = trigger
+        return trigger
+
+    def remove(self, key):
+        """Menghapus posisi (mis. ditutup manual); entri heap-nya dibuang secara lazy"""
+        trigger = self.triggers.pop(key, None)
+        if trigger is not None and trigger.active:
+            trigger.active = False
+            self._mark_stale()
+        return trigger
+
+    def _mark_stale(self, n=1):
+        self.stale += n
+        if self.stale > 64 and self.stale > 2 * len(self.triggers):
+            self.compact()
+
+    def compact(self):
+        """Membuang entri basi dari semua heap"""
+        self.stops = [entry for entry in self.stops if entry[2].active]
+        heapq.heapify(self.stops)
+        self.targets = [entry for entry in self.targets if entry[2].active]
+        heapq.heapify(self.targets)
+        for group in self.trailing.values():
+            group.compact()
+        self.stale = 0
+
+    def on_price(self, harga):
+        """Memproses satu harga; mengembalikan [(key, alasan)] untuk trigger yang terpicu"""
+        hasil = []
+        stops, targets = self.stops, self.targets
+        while stops and -stops[0][0] >= harga:
+            trigger = heapq.heappop(stops)[2]
+            if trigger.active:
+                trigger.active = False
+                hasil.append((trigger.key, STOP))
+        while targets and targets[0][0] <= harga:
+            trigger = heapq.heappop(targets)[2]
+            if trigger.active:
+                trigger.active = False
+                hasil.append((trigger.key, TARGET))
+        for group in self.trailing.values():
+            group.raise_to(harga)
+            group.fire(harga, hasil)
+        for key, _ in hasil:
+            del self.triggers[key]
+        if hasil:
+            # Setiap posisi yang terpicu meninggalkan entri basi di heap sisi lainnya
+            self._mark_stale(len(hasil))
+        return hasil
+
+
+if __name__ == "__main__":
+    # Membandingkan TriggerBook dengan pemeriksaan linear per posisi pada harga acak
+    import random
+
+    rng = random.Random(0)
+    book = TriggerBook("btcidr")
+    posisi = {}
+    harga = 1000.0
+    for langkah in range(20000):
+        if rng.random() < 0.3:
+            key = langkah
+            stop = harga * (1 - rng.uniform(0.001, 0.02)) if rng.random() < 0.8 else None
+            target = harga * (1 + rng.uniform(0.001, 0.02)) if rng.random() < 0.8 else None
+            trail = rng.choice([None, 0.005, 0.01])
+            book.add(key, stop, target, trail, harga)
+            posisi[key] = [stop, target, trail, harga]
+        if posisi and rng.random() < 0.02:
+            key = rng.choice(list(posisi))
+            book.remove(key)
+            del posisi[key]
+        harga *= 1 + rng.gauss(0, 0.002)
+        expected = set()
+        for key, (stop, target, trail, high) in posisi.items():
+            high = max(high, harga)
+            posisi[key][3] = high
+            if (stop is not None and harga <= stop) or (target is not None and harga >= target) \
+                    or (trail and harga <= high * (1 - trail)):
+                expected.add(key)
+        fired = {key for key, _ in book.on_price(harga)}
+        assert fired == expected, (langkah, fired ^ expected)
+        for key in fired:
+            del posisi[key]
+        assert len(book) == len(posisi)
+    print("✅ TriggerBook sesuai dengan pemeriksaan linear")